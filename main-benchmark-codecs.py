@@ -0,0 +1,27 @@
+import argparse
+import json
+
+from src.codec import jpeg_codec
+from src.codec_benchmark import benchmark_codecs, print_report
+from src.image_to_crop import DETECTOR_INPUT_SIZE
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Сравнение кодеков JPEG (turbojpeg / OpenCV / Pillow) на корпусе снимков")
+    parser.add_argument('source', help="Каталог, zip- или tar-архив со снимками")
+    parser.add_argument('--input-size', type=int, default=DETECTOR_INPUT_SIZE, help="Вход детектора для уменьшенного декодирования")
+    parser.add_argument('--repeat', type=int, default=3, help="Повторов на снимок (берётся лучший)")
+    parser.add_argument('--limit', type=int, default=None, help="Не больше N снимков")
+    parser.add_argument('--report', help="Сохранить отчёт в JSON")
+    args = parser.parse_args()
+
+    report = benchmark_codecs(args.source, input_size=args.input_size, repeat=args.repeat, limit=args.limit)
+    print_report(report)
+    print(f"Выбран при запуске: {jpeg_codec.name} (OCR_JPEG_CODEC)")
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
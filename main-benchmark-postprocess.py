@@ -0,0 +1,38 @@
+import argparse
+import json
+import sys
+
+from src.postprocess_benchmark import INPUT_SIZES, SAMPLES_PER_SIZE, benchmark_postprocess, print_report, regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Замеры и фаззинг разбора текстов OCR (get_info, validate_container)")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(INPUT_SIZES), help="Число кандидатов OCR на вызов")
+    parser.add_argument('--samples', type=int, default=SAMPLES_PER_SIZE, help="Выборок на каждый размер")
+    parser.add_argument('--seed', type=int, default=0, help="Зерно генератора (одинаковое — сравнимые отчёты)")
+    parser.add_argument('--confusion-rate', type=float, default=0.05, help="Вероятность путаницы символа номера")
+    parser.add_argument('--report', help="Сохранить отчёт в JSON")
+    parser.add_argument('--baseline', help="Сравнить с сохранённым отчётом; код 1 при ухудшении правильности")
+    args = parser.parse_args()
+
+    report = benchmark_postprocess(tuple(args.sizes), args.samples, args.seed, args.confusion_rate)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if baseline is not None:
+        problems = regressions(report, baseline)
+        for problem in problems:
+            print(f"⚠️ {problem}")
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import argparse
+
+from src.reprocess import reprocess
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Повторное распознавание архива снимков с возобновлением")
+    parser.add_argument('source', help="Каталог, zip- или tar-архив со снимками")
+    parser.add_argument('--output', required=True, help="Файл результатов: .csv, .sqlite или .parquet (каталог)")
+    parser.add_argument('--workers', type=int, default=None, help="Количество процессов (по умолчанию — все ядра)")
+    parser.add_argument('--profile', help="Профиль настроек: fast, balanced, accurate (по умолчанию OCR_PROFILE)")
+    parser.add_argument('--flush-every', type=int, default=100, help="Сохранять результаты каждые N изображений")
+    args = parser.parse_args()
+
+    counters = reprocess(
+        args.source,
+        args.output,
+        workers=args.workers,
+        profile=args.profile,
+        flush_every=args.flush_every,
+    )
+    print(f"Готово: обработано {counters['processed']}, пропущено {counters['skipped']}, ошибок {counters['errors']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,68 +1,35 @@
-import time
+import argparse
+import json
 from pathlib import Path
 
-from src.image_to_crop import image_to_crop
-from src.image_to_compress import image_to_compress
-from src.image_to_text import image_to_text
-from src.get_info import get_info
+from src.evaluate import evaluate, load_manifest, manifest_from_names, print_summary
 
 
 def main() -> None:
     base_dir = Path(__file__).resolve().parent
     test_dir = base_dir / "test"
-    
-    # files =['XINU1235818','WSCU9579646']
-    # files = ['XINU1235818','WSCU9579646','TWCU8009897','TLNU9101464','PCHU9115162','MSKU8074094','FCIU9332372','CCLU3834837','CAIU4032380']
-    files = ['XINU1235818','WSCU9579646','TWCU8009897','TLNU9101464','PCHU9115162','MSKU8074094','FCIU9332372','CCLU3834837','CAIU4032380','01Q2270C','10L161UA','70G876TA','01415FLA','01912CBA','20472AAA']
 
-    for base_name in files:
-        image_extensions = ['.jpg', '.jpeg', '.png', '.JPG', '.JPEG', '.PNG']
-        test_image = None
-        
-        for ext in image_extensions:
-            candidate = test_dir / f"{base_name}{ext}"
-            if candidate.exists():
-                test_image = candidate
-                break
-        
-        if test_image is None:
-            print(f"Файл {base_name} с расширениями {image_extensions} не найден в {test_dir}")
-            return
+    parser = argparse.ArgumentParser(description="Оценка точности и скорости OCR по эталонному манифесту")
+    parser.add_argument('--manifest', help="JSON/CSV манифест: image,number,type,car")
+    parser.add_argument('--workers', type=int, default=None, help="Количество процессов")
+    parser.add_argument('--report', help="Путь для сохранения полного отчёта в JSON")
+    parser.add_argument('--profile', help="Профиль настроек: fast, balanced, accurate (по умолчанию OCR_PROFILE)")
+    args = parser.parse_args()
 
-        crop_start = time.time()
-        crop_result = image_to_crop(test_image)
-        detect = crop_result['detect']
-        cropped_image = crop_result['image']
-        crop_time = time.time() - crop_start
-        # print(f"Время обрезки: {crop_time:.2f} сек")
+    if args.manifest:
+        entries = load_manifest(args.manifest)
+    else:
+        # files =['XINU1235818','WSCU9579646']
+        files = ['XINU1235818','WSCU9579646','TWCU8009897','TLNU9101464','PCHU9115162','MSKU8074094','FCIU9332372','CCLU3834837','CAIU4032380','01Q2270C','10L161UA','70G876TA','01415FLA','01912CBA','20472AAA']
+        entries = manifest_from_names(test_dir, files)
 
-        compress_start = time.time()
-        compressed_image = image_to_compress(cropped_image, target_size_kb=40)
-        compress_time = time.time() - compress_start
-        # print(f"Время сжатия: {compress_time:.2f} сек")
-        
-        ocr_start = time.time()
-        result = image_to_text(compressed_image, save_to_output=True, output_name=base_name)
-        info = get_info(result['texts'], detect=detect)
-        ocr_time = time.time() - ocr_start
-        # print(f"Время OCR: {ocr_time:.2f} сек")
-        
-        data = result['data']
-        texts = result['texts']
+    result = evaluate(entries, workers=args.workers, profile=args.profile)
+    print_summary(result['summary'])
 
-        # print(f"rec_texts: {data['rec_texts']}")
-        # print(f"rec_scores: {data['rec_scores']}")
-        print(f"texts: {texts}")
-        # print(f"info: {info}")
-        # print(f"Общее время: {crop_time + compress_time + ocr_time:.2f} сек")
-       
-       
-        text = info.get('number') if info.get('number') else info.get('car')
-        check_icon_text = "✅" if text == base_name else "❌"
-        print(f"{check_icon_text}: {base_name} - {text}")
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
 
 
 if __name__ == "__main__":
     main()
-
-
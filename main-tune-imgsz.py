@@ -0,0 +1,42 @@
+import argparse
+import json
+from pathlib import Path
+
+from src.config import CONFIG_PATH, DEFAULT_PROFILE, save_overrides
+from src.evaluate import load_manifest
+from src.imgsz_tune import RECALL_TOLERANCE, TUNE_SIZES, chosen_overrides, print_report, tune_imgsz
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Подбор размера входа (imgsz) детекторов по размеченному набору")
+    parser.add_argument('manifest', help="JSON/CSV манифест: image,number,type,car (как у main-test.py)")
+    parser.add_argument('--profile', default=DEFAULT_PROFILE, help="Профиль, в который записывается результат")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(TUNE_SIZES), help="Перебираемые размеры")
+    parser.add_argument('--tolerance', type=float, default=RECALL_TOLERANCE, help="Допустимая потеря полноты (доля)")
+    parser.add_argument('--repeat', type=int, default=1, help="Замеров на снимок (берётся лучший)")
+    parser.add_argument('--config', default=str(CONFIG_PATH), help="Файл настроек развёртывания")
+    parser.add_argument('--dry-run', action='store_true', help="Только показать результат, не записывать")
+    parser.add_argument('--report', help="Сохранить отчёт в JSON")
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("--repeat должен быть не меньше 1")
+
+    report = tune_imgsz(load_manifest(args.manifest), args.profile, tuple(args.sizes), args.tolerance, args.repeat)
+    print_report(report)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    overrides = chosen_overrides(report)
+    if not overrides:
+        print("\nНечего записывать: нет размеченных снимков для детекторов")
+    elif args.dry_run:
+        print(f"\nНе записано (--dry-run): {overrides}")
+    else:
+        save_overrides(args.profile, overrides, Path(args.config))
+        print(f"\n✅ Профиль {args.profile} в {args.config}: {overrides}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import io
+import json
+import os
+import queue
+import random
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from src.get_info import has_check_digit_failure
+
+
+# Каталог отладочных артефактов (пусто — запись выключена)
+ARTIFACTS_DIR = os.environ.get('OCR_ARTIFACTS_DIR', '')
+ARTIFACTS_MAX_BYTES = int(float(os.environ.get('OCR_ARTIFACTS_MAX_MB', 1024)) * 1024 * 1024)
+ARTIFACTS_MAX_AGE_SECONDS = int(float(os.environ.get('OCR_ARTIFACTS_MAX_AGE_HOURS', 72)) * 3600)
+ARTIFACTS_QUEUE_SIZE = 32
+
+# Доля сохраняемых запросов по причине: все ошибки контрольной цифры,
+# часть пустых результатов и 1% успешных
+SAMPLE_RATES = {
+    'check_digit': 1.0,
+    'empty': float(os.environ.get('OCR_ARTIFACTS_EMPTY_RATE', 0.1)),
+    'success': float(os.environ.get('OCR_ARTIFACTS_SUCCESS_RATE', 0.01)),
+}
+
+_RETENTION_INTERVAL_SECONDS = 60
+
+
+def sample_reason(detect: str, texts: List[str], info: Dict[str, str]) -> str:
+    if detect == 'car':
+        return 'success' if info.get('car') else 'empty'
+    if info.get('number'):
+        return 'success'
+    if has_check_digit_failure(texts):
+        return 'check_digit'
+    return 'empty'
+
+
+def _image_extension(data: bytes) -> str:
+    if data.startswith(b'\xff\xd8'):
+        return '.jpg'
+    if data.startswith(b'\x89PNG'):
+        return '.png'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return '.webp'
+    if data.startswith(b'BM'):
+        return '.bmp'
+    return '.img'
+
+
+def snapshot_image(image):
+    """
+    Копия входа, которая переживёт запрос: байты загрузки, путь к файлу
+    или копия кадра (буфер разделяемой памяти перезаписывается граббером).
+    """
+    if isinstance(image, np.ndarray):
+        return image.copy()
+    if isinstance(image, io.BytesIO):
+        return image.getvalue()
+    if hasattr(image, 'read'):
+        image.seek(0)
+        data = image.read()
+        image.seek(0)
+        return data
+    return Path(image)
+
+
+class ArtifactWriter:
+    """
+    Фоновая запись отладочных артефактов распознавания: исходное изображение,
+    кропы, улучшенные изображения и meta.json — каталог на каждый запрос.
+
+    Запрос только кладёт ссылки в ограниченную очередь; при переполнении
+    артефакт отбрасывается, а не задерживает ответ. Старые каталоги удаляются
+    по возрасту и по суммарному размеру.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        sample_rates: Optional[Dict[str, float]] = None,
+        max_bytes: int = ARTIFACTS_MAX_BYTES,
+        max_age_seconds: int = ARTIFACTS_MAX_AGE_SECONDS,
+        queue_size: int = ARTIFACTS_QUEUE_SIZE,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.sample_rates = {**SAMPLE_RATES, **(sample_rates or {})}
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._entries: List[List] = self._scan()
+        self._last_retention = 0.0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+
+        self._thread = threading.Thread(target=self._run, name='ocr-artifacts', daemon=True)
+        self._thread.start()
+
+    def _scan(self) -> List[List]:
+        entries = []
+        for path in self.directory.iterdir():
+            if not path.is_dir():
+                continue
+            size = sum(item.stat().st_size for item in path.iterdir() if item.is_file())
+            entries.append([path.stat().st_mtime, path, size])
+        entries.sort(key=lambda entry: entry[0])
+        return entries
+
+    def maybe_submit(self, image, analysis: Dict, capture: Dict) -> Optional[str]:
+        """Решает по правилам выборки, сохранять ли запрос; возвращает причину или None."""
+        reason = sample_reason(analysis['detect'], analysis['texts'], analysis['info'])
+        if random.random() >= self.sample_rates.get(reason, 0.0):
+            return None
+
+        record = {
+            'original': snapshot_image(image),
+            'crops': capture.get('crops', []),
+            'enhanced': capture.get('enhanced', []),
+            'meta': {
+                'reason': reason,
+                'created_at': time.time(),
+                'camera_id': capture.get('camera_id'),
+                'detect': analysis['detect'],
+                'found': analysis['found'],
+                'texts': analysis['texts'],
+                'scores': [float(score) for score in analysis['scores']],
+                'info': analysis['info'],
+                'timings': analysis['timings'],
+            },
+        }
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return None
+        return reason
+
+    def _run(self) -> None:
+        while True:
+            record = self._queue.get()
+            if record is None:
+                return
+            try:
+                self._write(record)
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                print(f"⚠️ Не удалось сохранить артефакт: {e}")
+            if time.time() - self._last_retention >= _RETENTION_INTERVAL_SECONDS:
+                self._enforce_retention()
+
+    def _write(self, record: Dict) -> None:
+        meta = record['meta']
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(meta['created_at']))
+        path = self.directory / f"{stamp}-{meta['reason']}-{uuid.uuid4().hex[:8]}"
+        path.mkdir()
+
+        original = record['original']
+        if isinstance(original, np.ndarray):
+            Image.fromarray(original).save(path / 'original.jpg', 'JPEG', quality=95)
+        elif isinstance(original, bytes):
+            (path / f'original{_image_extension(original)}').write_bytes(original)
+        elif original.exists():
+            shutil.copyfile(original, path / f'original{original.suffix}')
+
+        for i, crop in enumerate(record['crops']):
+            if isinstance(crop, np.ndarray):
+                Image.fromarray(crop).save(path / f'crop_{i}.jpg', 'JPEG', quality=95)
+            elif isinstance(crop, io.BytesIO):
+                data = crop.getvalue()
+                (path / f'crop_{i}{_image_extension(data)}').write_bytes(data)
+
+        for i, img in enumerate(record['enhanced']):
+            img.save(path / f'enhanced_{i}.jpg', 'JPEG', quality=95)
+
+        with (path / 'meta.json').open('w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        size = sum(item.stat().st_size for item in path.iterdir())
+        with self._lock:
+            self._entries.append([meta['created_at'], path, size])
+            self.written += 1
+            over_budget = sum(entry[2] for entry in self._entries) > self.max_bytes
+        if over_budget:
+            self._enforce_retention()
+
+    def _enforce_retention(self) -> None:
+        self._last_retention = time.time()
+        expire_before = self._last_retention - self.max_age_seconds
+        with self._lock:
+            total = sum(entry[2] for entry in self._entries)
+            removed = []
+            while self._entries and (self._entries[0][0] < expire_before or total > self.max_bytes):
+                entry = self._entries.pop(0)
+                total -= entry[2]
+                removed.append(entry[1])
+        for path in removed:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'written': self.written,
+                'dropped': self.dropped,
+                'errors': self.errors,
+                'queued': self._queue.qsize(),
+                'stored': len(self._entries),
+                'stored_bytes': sum(entry[2] for entry in self._entries),
+            }
+
+    def close(self) -> None:
+        # Writer может быть общим для нескольких движков: повторный close ничего не делает
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
@@ -0,0 +1,208 @@
+import io
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from src.reprocess import IMAGE_EXTENSIONS
+from src.test_speed import find_test_image
+
+
+# Интервал прогона эталонных снимков, сек (0 — канарейка выключена)
+CANARY_INTERVAL_SECONDS = float(os.environ.get('OCR_CANARY_SECONDS', 60))
+# Каталог эталонных снимков; по умолчанию — снимок из src, как у /test-speed
+CANARY_DIR = os.environ.get('OCR_CANARY_DIR', '')
+# Деградация: медиана задержки за окно выше базовой в это число раз
+CANARY_LATENCY_FACTOR = float(os.environ.get('OCR_CANARY_LATENCY_FACTOR', 2.0))
+# Сколько последних прогонов каждого снимка входит в скользящую статистику
+CANARY_WINDOW = 20
+# Прогоны сразу после старта, по медиане которых считается базовая задержка
+CANARY_BASELINE_RUNS = 3
+CANARY_TIMEOUT_SECONDS = 60.0
+
+
+def reference_images(directory: str = CANARY_DIR) -> List[Path]:
+    if not directory:
+        test_image = find_test_image()
+        return [test_image] if test_image else []
+    return sorted(
+        path for path in Path(directory).iterdir()
+        if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS
+    )
+
+
+def service_seconds(timings: Dict[str, float]) -> float:
+    # Время работы этапов без ожидания в очередях: под нагрузкой не растёт само по себе
+    return sum(value for name, value in timings.items() if name != 'total')
+
+
+class _Reference:
+    def __init__(self, path: Path):
+        self.path = path
+        self.data = path.read_bytes()
+        # Ожидаемый ответ и базовая задержка фиксируются по первым прогонам
+        self.expected: Optional[Dict] = None
+        self.baseline: List[float] = []
+        self.latency: deque = deque(maxlen=CANARY_WINDOW)
+        self.runs = 0
+        self.matches = 0
+        self.errors = 0
+        self.last: Optional[Dict] = None
+        self.last_error: Optional[str] = None
+
+    def baseline_seconds(self) -> Optional[float]:
+        if len(self.baseline) < CANARY_BASELINE_RUNS:
+            return None
+        return float(np.median(self.baseline))
+
+    def stats(self) -> Dict:
+        latency = list(self.latency)
+        return {
+            'runs': self.runs,
+            'matches': self.matches,
+            'errors': self.errors,
+            'expected': self.expected,
+            'baseline_seconds': self.baseline_seconds(),
+            'latency': {
+                'median': float(np.median(latency)) if latency else None,
+                'p95': float(np.percentile(latency, 95)) if latency else None,
+            },
+            'last_info': self.last['info'] if self.last else None,
+            'last_error': self.last_error,
+        }
+
+
+class Canary:
+    """
+    Фоновая канарейка: эталонные снимки периодически проходят через движок
+    с низким приоритетом, копится скользящая статистика задержки и ответов.
+    Узел считается деградировавшим, если медиана задержки за окно выше базовой
+    в CANARY_LATENCY_FACTOR раз, ответ отличается от ожидаемого или прогон упал.
+
+    Ожидаемый ответ — первый ответ после старта, базовая задержка — медиана первых
+    CANARY_BASELINE_RUNS прогонов; reset() фиксирует их заново (например, после
+    намеренной замены модели).
+    """
+
+    def __init__(
+        self,
+        engine_getter: Callable,
+        images: Optional[List[Path]] = None,
+        interval: float = CANARY_INTERVAL_SECONDS,
+        latency_factor: float = CANARY_LATENCY_FACTOR,
+    ):
+        self.engine_getter = engine_getter
+        self.interval = interval
+        self.latency_factor = latency_factor
+        self._references = [_Reference(path) for path in (reference_images() if images is None else images)]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._rounds = 0
+        self._last_round_at: Optional[float] = None
+
+    def start(self) -> None:
+        if self.interval <= 0 or not self._references or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name='ocr-canary', daemon=True)
+        self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            self.run_once()
+            if self._stop.wait(self.interval):
+                return
+
+    def run_once(self) -> None:
+        for reference in self._references:
+            if self._stop.is_set():
+                return
+            self._run(reference)
+        with self._lock:
+            self._rounds += 1
+            self._last_round_at = time.time()
+
+    def _run(self, reference: _Reference) -> None:
+        engine = self.engine_getter()
+        try:
+            # Без camera_id: память областей камер не трогается
+            result = engine.submit(io.BytesIO(reference.data), priority='low', synthetic=True).result(timeout=CANARY_TIMEOUT_SECONDS)
+        except Exception as e:
+            with self._lock:
+                reference.runs += 1
+                reference.errors += 1
+                reference.last = None
+                reference.last_error = f"{type(e).__name__}: {e}"
+            print(f"⚠️ Канарейка: ошибка на {reference.path.name}: {e}")
+            return
+
+        seconds = service_seconds(result['timings'])
+        with self._lock:
+            reference.runs += 1
+            reference.last = result
+            reference.last_error = None
+            if reference.expected is None:
+                reference.expected = result['info']
+            if len(reference.baseline) < CANARY_BASELINE_RUNS:
+                reference.baseline.append(seconds)
+            reference.latency.append(seconds)
+            if result['info'] == reference.expected:
+                reference.matches += 1
+
+    def _reasons(self) -> List[str]:
+        reasons = []
+        for reference in self._references:
+            name = reference.path.name
+            if reference.last_error is not None:
+                reasons.append(f"{name}: ошибка прогона")
+                continue
+            if reference.last is None:
+                continue
+            if reference.last['info'] != reference.expected:
+                reasons.append(f"{name}: ответ изменился")
+            baseline = reference.baseline_seconds()
+            if baseline and reference.latency:
+                median = float(np.median(reference.latency))
+                if median > baseline * self.latency_factor:
+                    reasons.append(f"{name}: задержка {median:.2f} с при базовой {baseline:.2f} с")
+        return reasons
+
+    def degraded(self) -> List[str]:
+        """Причины деградации; пустой список — узел в норме."""
+        with self._lock:
+            return self._reasons()
+
+    def reset(self) -> None:
+        with self._lock:
+            for reference in self._references:
+                reference.expected = None
+                reference.baseline = []
+                reference.latency.clear()
+                reference.last = None
+                reference.last_error = None
+
+    def last_result(self) -> Optional[Dict]:
+        with self._lock:
+            if not self._references:
+                return None
+            return self._references[0].last
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'enabled': self._thread is not None,
+                'interval_seconds': self.interval,
+                'rounds': self._rounds,
+                'last_round_at': self._last_round_at,
+                'degraded': self._reasons(),
+                'images': {reference.path.name: reference.stats() for reference in self._references},
+            }
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,184 @@
+import io
+import os
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Union
+
+import numpy as np
+from PIL import Image
+
+
+# Кодек JPEG: auto — самый быстрый из установленных (turbojpeg → opencv → pillow)
+JPEG_CODEC = os.environ.get('OCR_JPEG_CODEC', 'auto')
+# Порядок предпочтения для auto; подтверждается src.codec_benchmark на своём корпусе
+CODEC_PREFERENCE = ('turbojpeg', 'opencv', 'pillow')
+# Масштабы, которые JPEG умеет декодировать напрямую (DCT-масштабирование)
+JPEG_REDUCTIONS = (1, 2, 4, 8)
+_EXIF_ORIENTATION = 0x0112
+
+
+class PillowCodec:
+    name = 'pillow'
+
+    def decode_jpeg(self, data: bytes, reduction: int = 1) -> np.ndarray:
+        img = Image.open(io.BytesIO(data))
+        if reduction > 1:
+            img.draft('RGB', (img.width // reduction, img.height // reduction))
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        return np.array(img)
+
+    def encode_jpeg(self, array: np.ndarray, quality: int, optimize: bool = False) -> bytes:
+        buffer = io.BytesIO()
+        Image.fromarray(array).save(buffer, "JPEG", quality=quality, optimize=optimize)
+        return buffer.getvalue()
+
+
+class TurboJpegCodec:
+    name = 'turbojpeg'
+
+    def __init__(self):
+        from turbojpeg import TJPF_RGB, TJSAMP_420, TurboJPEG
+        self._jpeg = TurboJPEG()
+        self._pixel_format = TJPF_RGB
+        self._subsample = TJSAMP_420
+
+    def decode_jpeg(self, data: bytes, reduction: int = 1) -> np.ndarray:
+        scaling_factor = (1, reduction) if reduction > 1 else None
+        return self._jpeg.decode(data, pixel_format=self._pixel_format, scaling_factor=scaling_factor)
+
+    def encode_jpeg(self, array: np.ndarray, quality: int, optimize: bool = False) -> bytes:
+        # Оптимизация таблиц Хаффмана здесь недоступна: файл чуть крупнее, чем у Pillow
+        return self._jpeg.encode(
+            np.ascontiguousarray(array),
+            quality=quality,
+            pixel_format=self._pixel_format,
+            jpeg_subsample=self._subsample,
+        )
+
+
+class OpenCvCodec:
+    name = 'opencv'
+
+    def __init__(self):
+        import cv2
+        self._cv2 = cv2
+        # EXIF-поворот не применяется: размеры и рамки должны совпадать с Pillow
+        self._flags = {
+            1: cv2.IMREAD_COLOR,
+            2: cv2.IMREAD_REDUCED_COLOR_2,
+            4: cv2.IMREAD_REDUCED_COLOR_4,
+            8: cv2.IMREAD_REDUCED_COLOR_8,
+        }
+
+    def decode_jpeg(self, data: bytes, reduction: int = 1) -> np.ndarray:
+        cv2 = self._cv2
+        flags = self._flags[reduction] | cv2.IMREAD_IGNORE_ORIENTATION
+        bgr = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+        if bgr is None:
+            raise ValueError("OpenCV не смог декодировать JPEG")
+        return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+
+    def encode_jpeg(self, array: np.ndarray, quality: int, optimize: bool = False) -> bytes:
+        cv2 = self._cv2
+        params = [cv2.IMWRITE_JPEG_QUALITY, int(quality), cv2.IMWRITE_JPEG_OPTIMIZE, int(optimize)]
+        ok, encoded = cv2.imencode('.jpg', cv2.cvtColor(array, cv2.COLOR_RGB2BGR), params)
+        if not ok:
+            raise ValueError("OpenCV не смог закодировать JPEG")
+        return encoded.tobytes()
+
+
+CODECS = {
+    'turbojpeg': TurboJpegCodec,
+    'opencv': OpenCvCodec,
+    'pillow': PillowCodec,
+}
+
+
+def available_codecs() -> Dict[str, object]:
+    """Кодеки, которые удалось создать в этом окружении (Pillow есть всегда)."""
+    codecs = {}
+    for name, codec_class in CODECS.items():
+        try:
+            codecs[name] = codec_class()
+        except Exception:
+            # Нет пакета или нативной библиотеки (libturbojpeg)
+            continue
+    return codecs
+
+
+def select_codec(name: str = JPEG_CODEC):
+    """Кодек по имени или самый быстрый из доступных (auto); ValueError для неизвестного имени."""
+    if name != 'auto':
+        if name not in CODECS:
+            raise ValueError(f"Неизвестный кодек JPEG: {name}")
+        return CODECS[name]()
+    codecs = available_codecs()
+    for candidate in CODEC_PREFERENCE:
+        if candidate in codecs:
+            return codecs[candidate]
+    return PillowCodec()
+
+
+jpeg_codec = select_codec()
+_pillow = PillowCodec()
+
+
+def jpeg_reduction(size: tuple, target: Optional[int]) -> int:
+    """Наибольший масштаб 1/2..1/8, при котором длинная сторона не меньше target (как Image.draft)."""
+    if target is None:
+        return 1
+    long_side = max(size)
+    reduction = 1
+    for candidate in JPEG_REDUCTIONS:
+        if long_side // candidate >= target:
+            reduction = candidate
+    return reduction
+
+
+def read_source(image_path: Union[str, Path, BinaryIO]) -> bytes:
+    if isinstance(image_path, io.BytesIO):
+        # getvalue не копирует буфер, пока в него не пишут
+        return image_path.getvalue()
+    if hasattr(image_path, 'read'):
+        image_path.seek(0)
+        data = image_path.read()
+        image_path.seek(0)
+        return data
+    return Path(image_path).read_bytes()
+
+
+def decode_jpeg(data: bytes, reduction: int = 1) -> np.ndarray:
+    """RGB-массив через выбранный кодек; при ошибке кодека (CMYK и т.п.) — через Pillow."""
+    try:
+        return jpeg_codec.decode_jpeg(data, reduction)
+    except Exception:
+        if jpeg_codec.name == 'pillow':
+            raise
+        return _pillow.decode_jpeg(data, reduction)
+
+
+def encode_jpeg(image: Union[np.ndarray, Image.Image], quality: int, optimize: bool = False) -> io.BytesIO:
+    """JPEG выбранным кодеком, готовый к чтению BytesIO."""
+    if isinstance(image, Image.Image):
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image = np.asarray(image)
+    buffer = io.BytesIO(jpeg_codec.encode_jpeg(image, quality, optimize))
+    buffer.seek(0)
+    return buffer
+
+
+def open_image(image_path: Union[str, Path, BinaryIO, np.ndarray]) -> Image.Image:
+    """Изображение для обработки в Pillow; JPEG декодируется выбранным кодеком."""
+    if isinstance(image_path, np.ndarray):
+        return Image.fromarray(image_path)
+    if hasattr(image_path, 'read'):
+        image_path.seek(0)
+    img = Image.open(image_path)
+    if img.format != 'JPEG' or jpeg_codec.name == 'pillow':
+        return img
+    # Массив из кодека теряет EXIF: снимок с поворотом остаётся в Pillow,
+    # чтобы exif_transpose перед OCR развернул его
+    if img.getexif().get(_EXIF_ORIENTATION, 1) != 1:
+        return img
+    return Image.fromarray(decode_jpeg(read_source(image_path)))
@@ -0,0 +1,102 @@
+import io
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+from PIL import Image
+
+from src.codec import available_codecs, jpeg_reduction
+from src.image_to_crop import DETECTOR_INPUT_SIZE
+from src.reprocess import iter_sources, open_source
+
+
+# Операции, из которых состоит работа с изображением в конвейере
+OPERATIONS = ('decode_full', 'decode_scaled', 'encode_crop')
+# Кроп для замера кодирования: центральная полоса, как у номера контейнера
+_CROP_FRACTION = (0.25, 0.4, 0.75, 0.6)
+
+
+def _timed(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {
+        'mean_ms': float(np.mean(values)) * 1000,
+        'p50_ms': float(np.percentile(values, 50)) * 1000,
+        'p95_ms': float(np.percentile(values, 95)) * 1000,
+    }
+
+
+def benchmark_codecs(
+    source: Union[str, Path],
+    input_size: int = DETECTOR_INPUT_SIZE,
+    repeat: int = 3,
+    limit: Optional[int] = None,
+    codecs: Optional[List[str]] = None,
+) -> Dict:
+    """
+    Сравнивает доступные кодеки на JPEG-снимках корпуса (каталог, zip или tar):
+    полное декодирование, декодирование с уменьшением под вход детектора и
+    кодирование кропа с качеством 95. Для каждого снимка берётся лучшее из repeat.
+    """
+    backends = available_codecs()
+    if codecs:
+        backends = {name: codec for name, codec in backends.items() if name in codecs}
+
+    timings = {name: {operation: [] for operation in OPERATIONS} for name in backends}
+    encoded_bytes = {name: 0 for name in backends}
+    images = 0
+    for _, item in iter_sources(source):
+        if limit is not None and images >= limit:
+            break
+        opened = open_source(item)
+        data = opened.getvalue() if isinstance(opened, io.BytesIO) else Path(opened).read_bytes()
+        with Image.open(io.BytesIO(data)) as img:
+            if img.format != 'JPEG':
+                continue
+            size = img.size
+        images += 1
+
+        reduction = jpeg_reduction(size, input_size)
+        reference = backends.get('pillow', next(iter(backends.values()))).decode_jpeg(data)
+        height, width = reference.shape[:2]
+        x1, y1, x2, y2 = _CROP_FRACTION
+        crop = np.ascontiguousarray(reference[int(height * y1):int(height * y2), int(width * x1):int(width * x2)])
+
+        for name, codec in backends.items():
+            timings[name]['decode_full'].append(_timed(lambda: codec.decode_jpeg(data), repeat))
+            timings[name]['decode_scaled'].append(_timed(lambda: codec.decode_jpeg(data, reduction), repeat))
+            timings[name]['encode_crop'].append(_timed(lambda: codec.encode_jpeg(crop, 95), repeat))
+            encoded_bytes[name] += len(codec.encode_jpeg(crop, 95))
+
+    return {
+        'images': images,
+        'input_size': input_size,
+        'codecs': {
+            name: {
+                **{operation: _summary(values) for operation, values in operations.items() if values},
+                'encoded_bytes_mean': encoded_bytes[name] / images if images else 0,
+            }
+            for name, operations in timings.items()
+        },
+    }
+
+
+def print_report(report: Dict) -> None:
+    print(f"Снимков JPEG: {report['images']}, вход детектора: {report['input_size']}")
+    if not report['images']:
+        return
+    print(f"{'кодек':<10}" + ''.join(f"{operation:>23}" for operation in OPERATIONS) + f"{'кроп, KB':>12}")
+    for name, stats in report['codecs'].items():
+        row = f"{name:<10}"
+        for operation in OPERATIONS:
+            row += f"{stats[operation]['mean_ms']:>10.2f} / p95 {stats[operation]['p95_ms']:>6.2f}"
+        row += f"{stats['encoded_bytes_mean'] / 1024:>12.1f}"
+        print(row)
@@ -0,0 +1,142 @@
+import json
+import os
+from dataclasses import dataclass, field, fields, replace
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from src.artifacts import ARTIFACTS_DIR
+from src.image_to_compress import COMPRESS_QUALITY, COMPRESS_TARGET_SIZE_KB
+from src.image_to_crop import (
+    CAR_INPUT_SIZE,
+    CONTAINER_INPUT_SIZE,
+    DETECTOR_CONFIDENCE,
+    DETECTOR_INPUT_SIZE,
+    TILE_OVERLAP,
+    TILE_SIZE,
+)
+from src.image_to_text import ENHANCE_STRENGTH, MIN_SCORE, OCR_SHAPE_BUCKETS
+from src.pipeline import PIPELINE_QUEUE_SIZE, STAGE_WORKERS
+from src.roi_memory import ROI_MEMORY_PATH
+
+
+_base_dir = Path(__file__).resolve().parent.parent
+
+DEFAULT_PROFILE = os.environ.get('OCR_PROFILE', 'balanced')
+
+# Файл настроек развёртывания: переопределения профилей поверх значений из кода,
+# например {"profiles": {"fast": {"detector_input_size": 416}}}
+CONFIG_PATH = Path(os.environ.get('OCR_CONFIG_PATH', _base_dir / "ocr_config.json"))
+
+
+@dataclass(frozen=True)
+class OcrConfig:
+    confidence: float = DETECTOR_CONFIDENCE
+    detector_input_size: int = DETECTOR_INPUT_SIZE
+    # Вход детекторов номера машины и контейнера на полном кадре (None — detector_input_size)
+    car_input_size: Optional[int] = CAR_INPUT_SIZE
+    container_input_size: Optional[int] = CONTAINER_INPUT_SIZE
+    # Сжатие кропа перед OCR (target_size_kb=0 — без сжатия)
+    target_size_kb: int = COMPRESS_TARGET_SIZE_KB
+    quality: int = COMPRESS_QUALITY
+    min_score: float = MIN_SCORE
+    group_by_line: bool = True
+    line_threshold: float = 0.5
+    # Вариант моделей PaddleOCR (см. OCR_VARIANTS) и улучшение изображения перед OCR
+    ocr_variant: str = 'server'
+    enhance: bool = True
+    enhance_strength: int = ENHANCE_STRENGTH
+    car_model_path: Optional[str] = field(default_factory=lambda: os.environ.get('YOLO_LICENSE_PLATE_MODEL'))
+    container_model_path: Optional[str] = field(default_factory=lambda: os.environ.get('YOLO_CONTAINER_MODEL'))
+    # Потоки по этапам конвейера (см. src.pipeline) и ёмкость очередей между этапами.
+    # На сервере конвейер общий для всех профилей: действуют значения профиля по умолчанию
+    stage_workers: Tuple[Tuple[str, int], ...] = STAGE_WORKERS
+    pipeline_queue_size: int = PIPELINE_QUEUE_SIZE
+    # Память областей по камерам: путь к JSON (None — выключено) и вход детектора для области
+    roi_memory_path: Optional[str] = ROI_MEMORY_PATH
+    roi_input_size: int = 320
+    # Плиточная детекция включается, если длинная сторона кадра не меньше tiling_min_side (0 — выключено)
+    tiling_min_side: int = field(default_factory=lambda: int(os.environ.get('OCR_TILING_MIN_SIDE', 0)))
+    tile_size: int = TILE_SIZE
+    tile_overlap: float = TILE_OVERLAP
+    # Канонические размеры входа PaddleOCR (None — без дополнения до размеров)
+    ocr_shape_buckets: Optional[Tuple[Tuple[int, int], ...]] = OCR_SHAPE_BUCKETS
+    # Бюджет памяти на декодирование одного запроса, МБ (0 — без ограничения)
+    memory_budget_mb: int = field(default_factory=lambda: int(os.environ.get('OCR_MEMORY_BUDGET_MB', 0)))
+    # Сколько областей контейнера распознавать узкими кропами одним пакетом (1 — один широкий кроп)
+    top_k_regions: int = field(default_factory=lambda: int(os.environ.get('OCR_TOP_K_REGIONS', 1)))
+    # Каталог выборочных отладочных артефактов (None — выключено)
+    artifacts_dir: Optional[str] = ARTIFACTS_DIR or None
+
+
+# Именованные профили: отличия от значений OcrConfig по умолчанию.
+# fast — полосы въезда с жёстким временем ответа, accurate — повторная обработка в бэк-офисе.
+PROFILES: Dict[str, Dict] = {
+    'fast': {
+        'detector_input_size': 480,
+        'roi_input_size': 256,
+        'ocr_variant': 'mobile',
+        'enhance': False,
+        'target_size_kb': 30,
+        'quality': 80,
+    },
+    'balanced': {},
+    'accurate': {
+        'detector_input_size': 960,
+        'ocr_variant': 'server',
+        'target_size_kb': 0,
+        'top_k_regions': 2,
+    },
+}
+
+
+def _as_tuples(value):
+    # JSON не различает списки и кортежи; поля конфигурации хранят кортежи
+    if isinstance(value, list):
+        return tuple(_as_tuples(item) for item in value)
+    return value
+
+
+def load_overrides(path: Path = CONFIG_PATH) -> Dict[str, Dict]:
+    """Переопределения профилей из файла развёртывания (пустой словарь, если файла нет)."""
+    if not path.exists():
+        return {}
+    with path.open('r', encoding='utf-8') as f:
+        data = json.load(f)
+    return data.get('profiles', {})
+
+
+def get_config(profile: Optional[str] = None, path: Path = CONFIG_PATH) -> OcrConfig:
+    """Настройки профиля: значения по умолчанию ← PROFILES ← файл развёртывания."""
+    name = profile or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise KeyError(f"Неизвестный профиль: {name}")
+
+    known = {item.name for item in fields(OcrConfig)}
+    overrides = {**PROFILES[name], **load_overrides(path).get(name, {})}
+    unknown = set(overrides) - known
+    if unknown:
+        raise ValueError(f"Неизвестные параметры профиля {name}: {', '.join(sorted(unknown))}")
+
+    return replace(OcrConfig(), **{key: _as_tuples(value) for key, value in overrides.items()})
+
+
+def save_overrides(profile: str, values: Dict, path: Path = CONFIG_PATH) -> None:
+    """Записывает параметры профиля в файл развёртывания, сохраняя остальное содержимое."""
+    if profile not in PROFILES:
+        raise KeyError(f"Неизвестный профиль: {profile}")
+    known = {item.name for item in fields(OcrConfig)}
+    unknown = set(values) - known
+    if unknown:
+        raise ValueError(f"Неизвестные параметры профиля {profile}: {', '.join(sorted(unknown))}")
+
+    data = {}
+    if path.exists():
+        with path.open('r', encoding='utf-8') as f:
+            data = json.load(f)
+    data.setdefault('profiles', {}).setdefault(profile, {}).update(values)
+
+    # Через временный файл: узел, читающий настройки при старте, не увидит половину файла
+    tmp_path = path.with_name(path.name + '.tmp')
+    with tmp_path.open('w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
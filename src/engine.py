@@ -0,0 +1,592 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import replace
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from src.config import DEFAULT_PROFILE, OcrConfig, get_config
+from src.image_to_crop import (
+    CAR_MODEL_DEFAULT_PATH,
+    CONTAINER_MODEL_DEFAULT_PATH,
+    crop_region,
+    crop_regions,
+    image_size,
+    load_detection_frame,
+    load_yolo_model,
+    roi_frame,
+    select_region,
+    tiled_frame,
+)
+from src.image_to_compress import image_to_compress
+from src.image_to_text import create_ocr, prepare_ocr_inputs, read_ocr_inputs, warmup_ocr
+from src.get_info import get_info
+from src.artifacts import ArtifactWriter
+from src.roi_memory import RoiMemory
+from src.memory_profile import MemoryProfiler, memory_profiler
+from src.pipeline import StagedPipeline
+from src.scheduler import DEFAULT_PRIORITY, check_deadline
+from src.stack_profile import stack_profiler
+
+
+ImageSource = Union[str, Path, BinaryIO, np.ndarray]
+
+# Этапы конвейера по порядку; у каждого метод OcrEngine._<name>_stage
+ENGINE_STAGES = ('decode', 'detect', 'prepare', 'ocr', 'info')
+
+
+def _run_stage(name: str) -> Callable[[Dict], Dict]:
+    # Этап вызывает метод движка из задачи: один конвейер обслуживает движки всех профилей
+    method = f'_{name}_stage'
+
+    def run(job: Dict) -> Dict:
+        if not job['profiled']:
+            return getattr(job['engine'], method)(job)
+        # Стеки снимаются только с потоков, занятых профилируемым запросом
+        with stack_profiler.track(name, id(job)):
+            try:
+                return getattr(job['engine'], method)(job)
+            except Exception as e:
+                stack_profiler.record_request(id(job), {
+                    'camera_id': job['camera_id'],
+                    'error': f"{name}: {type(e).__name__}: {e}",
+                    'timings': dict(job['timings']),
+                })
+                raise
+
+    return run
+
+
+def build_pipeline(config: OcrConfig) -> StagedPipeline:
+    workers = dict(config.stage_workers)
+    unknown = set(workers) - set(ENGINE_STAGES)
+    if unknown:
+        raise ValueError(f"Неизвестные этапы конвейера: {', '.join(sorted(unknown))}")
+    return StagedPipeline(
+        [(name, _run_stage(name), workers.get(name, 1)) for name in ENGINE_STAGES],
+        queue_size=config.pipeline_queue_size,
+    )
+
+
+class OcrEngine:
+    """
+    Полный конвейер распознавания: декодирование → детекция (YOLO) → обрезка,
+    сжатие и улучшение → OCR (PaddleOCR) → get_info. Каждый экземпляр владеет
+    своими моделями и настройками; модели можно передать явно, чтобы разделить
+    их между экземплярами.
+
+    analyze выполняет этапы подряд в вызывающем потоке; submit отправляет запрос
+    в конвейер (src.pipeline), где этапы разных запросов идут одновременно.
+    """
+
+    def __init__(
+        self,
+        config: Optional[OcrConfig] = None,
+        car_model=None,
+        container_model=None,
+        ocr=None,
+        roi_memory: Optional[RoiMemory] = None,
+        memory: Optional[MemoryProfiler] = None,
+        artifacts: Optional[ArtifactWriter] = None,
+        detector_lock: Optional[threading.Lock] = None,
+        ocr_lock: Optional[threading.Lock] = None,
+        pipeline: Optional[StagedPipeline] = None,
+    ):
+        self.config = config or get_config()
+        # Набор моделей заменяется целиком (swap_models); запрос берёт набор
+        # при постановке и доходит до конца на тех моделях, с которыми начал
+        self.models = {
+            'car': car_model if car_model is not None else load_yolo_model(
+                self.config.car_model_path, CAR_MODEL_DEFAULT_PATH,
+            ),
+            'container': container_model if container_model is not None else load_yolo_model(
+                self.config.container_model_path, CONTAINER_MODEL_DEFAULT_PATH,
+            ),
+            'ocr': ocr if ocr is not None else create_ocr(self.config.ocr_variant),
+        }
+        if roi_memory is None and self.config.roi_memory_path:
+            roi_memory = RoiMemory(self.config.roi_memory_path)
+        self.roi_memory = roi_memory
+        self.memory = memory if memory is not None else memory_profiler
+        if artifacts is None and self.config.artifacts_dir:
+            artifacts = ArtifactWriter(self.config.artifacts_dir)
+        self.artifacts = artifacts
+        # RGB: 3 байта на пиксель полного разрешения
+        self._max_decode_pixels = self.config.memory_budget_mb * 1024 * 1024 // 3 or None
+
+        # Модели не потокобезопасны: инференс каждой модели идёт последовательно,
+        # но детекция и OCR разных запросов перекрываются. Экземпляры с общими
+        # моделями должны разделять и блокировки
+        self._detector_lock = detector_lock or threading.Lock()
+        self._ocr_lock = ocr_lock or threading.Lock()
+        # Асинхронные запросы идут по этапам с приоритетом и сроком (см. src.pipeline)
+        self.pipeline = pipeline or build_pipeline(self.config)
+        # Теневой прогон новой модели на выборке запросов (см. src.model_swap)
+        self.shadow = None
+
+    @property
+    def car_model(self):
+        return self.models['car']
+
+    @property
+    def container_model(self):
+        return self.models['container']
+
+    @property
+    def ocr(self):
+        return self.models['ocr']
+
+    def swap_models(self, **models) -> Dict:
+        """Атомарно подменяет модели (car / container / ocr); возвращает прежний набор."""
+        unknown = set(models) - set(self.models)
+        if unknown:
+            raise ValueError(f"Неизвестные модели: {', '.join(sorted(unknown))}")
+        previous = self.models
+        self.models = {**previous, **models}
+        return previous
+
+    def with_models(self, **models) -> 'OcrEngine':
+        """
+        Копия движка для пробных прогонов: те же настройки и блокировки, но
+        без памяти областей, артефактов и профайлера, чтобы не влиять на боевые запросы.
+        """
+        models = {**self.models, **models}
+        return OcrEngine(
+            replace(self.config, roi_memory_path=None, artifacts_dir=None),
+            car_model=models['car'],
+            container_model=models['container'],
+            ocr=models['ocr'],
+            memory=MemoryProfiler(enabled=False),
+            detector_lock=self._detector_lock,
+            ocr_lock=self._ocr_lock,
+            pipeline=self.pipeline,
+        )
+
+    def _full_frame_sizes(self) -> tuple:
+        # Вход детекторов машины и контейнера на полном кадре
+        config = self.config
+        return (
+            config.car_input_size or config.detector_input_size,
+            config.container_input_size or config.detector_input_size,
+        )
+
+    def detector_sizes(self) -> set:
+        """Все размеры входа детектора, которые встречаются в этом профиле."""
+        config = self.config
+        sizes = {config.roi_input_size, *self._full_frame_sizes()}
+        if config.tiling_min_side:
+            sizes.add(config.tile_size)
+        return sizes
+
+    def warmup(self) -> None:
+        """Прогрев моделей на всех используемых размерах входа до первого запроса."""
+        config = self.config
+        models = self.models
+        with self._detector_lock:
+            for size in self.detector_sizes():
+                frame = {
+                    'array': np.zeros((size, size, 3), dtype=np.uint8),
+                    'size': (size, size),
+                    'scale': (1.0, 1.0),
+                }
+                select_region(frame, config.confidence, models['car'], models['container'], imgsz=size)
+        with self._ocr_lock:
+            if config.ocr_shape_buckets:
+                warmup_ocr(models['ocr'], config.ocr_shape_buckets)
+
+    def _load_frame(self, image: ImageSource) -> Optional[dict]:
+        config = self.config
+        if config.tiling_min_side:
+            size = image_size(image)
+            fits_budget = size is not None and (
+                self._max_decode_pixels is None or size[0] * size[1] <= self._max_decode_pixels
+            )
+            if fits_budget and max(size) >= config.tiling_min_side:
+                frame = load_detection_frame(image, None)
+                return tiled_frame(frame, config.tile_size, config.tile_overlap)
+        # Кадр уменьшается до большего из входов детекторов
+        return load_detection_frame(image, max(self._full_frame_sizes()))
+
+    def _select_region(self, frame: dict, camera_id: Optional[str], models: Dict) -> dict:
+        config = self.config
+        roi_memory = self.roi_memory if camera_id else None
+
+        if 'tiles' in frame:
+            region = select_region(
+                frame,
+                config.confidence,
+                models['car'],
+                models['container'],
+                imgsz=config.tile_size,
+                top_k=config.top_k_regions,
+            )
+            if roi_memory and region['box'] is not None:
+                roi_memory.update(camera_id, region['detect'], region['raw_box'], frame['size'])
+            return region
+
+        # Сначала ищем в выученной области камеры с уменьшенным входом детектора
+        prior = roi_memory.prior(camera_id) if roi_memory else None
+        if prior is not None:
+            region = select_region(
+                roi_frame(frame, prior),
+                config.confidence,
+                models['car'],
+                models['container'],
+                imgsz=config.roi_input_size,
+                top_k=config.top_k_regions,
+            )
+            roi_memory.record(camera_id, region['box'] is not None)
+            if region['box'] is not None:
+                roi_memory.update(camera_id, region['detect'], region['raw_box'], frame['size'])
+                return region
+
+        car_imgsz, container_imgsz = self._full_frame_sizes()
+        region = select_region(
+            frame,
+            config.confidence,
+            models['car'],
+            models['container'],
+            imgsz=config.detector_input_size,
+            top_k=config.top_k_regions,
+            car_imgsz=car_imgsz,
+            container_imgsz=container_imgsz,
+        )
+        if roi_memory and region['box'] is not None:
+            roi_memory.update(camera_id, region['detect'], region['raw_box'], frame['size'])
+        return region
+
+    @contextmanager
+    def _stage(self, name: str, timings: Dict[str, float], deadline: Optional[float] = None):
+        # Перед каждым этапом: просроченный запрос дальше не считаем
+        check_deadline(deadline, name)
+        start = time.perf_counter()
+        with self.memory.stage(name):
+            yield
+        timings[name] = time.perf_counter() - start
+
+    # Этапы конвейера работают со словарём задачи: каждый забирает из него
+    # свой вход и кладёт результат. Промежуточный буфер удаляется сразу после
+    # следующего этапа, чтобы пик памяти запроса был близок к самому крупному этапу
+
+    def _new_job(
+        self,
+        image: ImageSource,
+        camera_id: Optional[str],
+        deadline: Optional[float],
+        profiled: bool = False,
+        synthetic: bool = False,
+    ) -> Dict:
+        return {
+            'engine': self,
+            'image': image,
+            'camera_id': camera_id,
+            'deadline': deadline,
+            'profiled': profiled,
+            'synthetic': synthetic,
+            'timings': {},
+            'start': time.perf_counter(),
+            'models': self.models,
+            # Ссылки на промежуточные изображения для артефактов (только если запись включена)
+            'capture': (
+                {'camera_id': camera_id, 'crops': [], 'enhanced': []}
+                if self.artifacts and not synthetic else None
+            ),
+        }
+
+    def _decode_stage(self, job: Dict) -> Dict:
+        with self._stage('decode', job['timings'], job['deadline']):
+            job['frame'] = self._load_frame(job['image'])
+        return job
+
+    def _detect_stage(self, job: Dict) -> Dict:
+        with self._stage('detect', job['timings'], job['deadline']):
+            frame = job.pop('frame')
+            if frame is None:
+                job['region'] = {'detect': 'container', 'box': None, 'raw_box': None, 'confidence': 0.0, 'orientation': None}
+            else:
+                with self._detector_lock:
+                    job['region'] = self._select_region(frame, job['camera_id'], job['models'])
+            del frame
+        return job
+
+    def _prepare_stage(self, job: Dict) -> Dict:
+        config = self.config
+        timings, deadline, capture = job['timings'], job['deadline'], job['capture']
+        region = job['region']
+
+        if 'regions' in region:
+            # Узкие кропы нескольких строк: без сжатия, одним пакетом в OCR
+            with self._stage('crop', timings, deadline):
+                crop_result = crop_regions(job['image'], region, self._max_decode_pixels)
+            timings['compress'] = 0.0
+            images = crop_result['images']
+            orientations = crop_result['orientations']
+            if capture is not None:
+                capture['crops'].extend(images)
+        else:
+            with self._stage('crop', timings, deadline):
+                crop_result = crop_region(job['image'], region, self._max_decode_pixels)
+            if capture is not None and region['box'] is not None:
+                capture['crops'].append(crop_result['image'])
+
+            with self._stage('compress', timings, deadline):
+                if config.target_size_kb:
+                    compressed_buffer = image_to_compress(
+                        crop_result['image'],
+                        target_size_kb=config.target_size_kb,
+                        quality=config.quality,
+                    )
+                else:
+                    compressed_buffer = crop_result['image']
+            images = [compressed_buffer]
+            orientations = [crop_result['orientation']]
+        job['detect'] = crop_result['detect']
+        del crop_result
+
+        with self._stage('enhance', timings, deadline):
+            job['ocr_inputs'] = prepare_ocr_inputs(
+                images,
+                orientations,
+                shape_buckets=config.ocr_shape_buckets,
+                capture=capture,
+                enhance=config.enhance,
+                enhance_strength=config.enhance_strength,
+            )
+        del images
+        return job
+
+    def _ocr_stage(self, job: Dict) -> Dict:
+        config = self.config
+        with self._stage('ocr', job['timings'], job['deadline']):
+            prepared = job.pop('ocr_inputs')
+            with self._ocr_lock:
+                job['ocr_result'] = read_ocr_inputs(
+                    prepared,
+                    job['models']['ocr'],
+                    min_score=config.min_score,
+                    group_by_line=config.group_by_line,
+                    line_threshold=config.line_threshold,
+                )
+            del prepared
+        return job
+
+    def _info_stage(self, job: Dict) -> Dict:
+        timings = job['timings']
+        result = job['ocr_result']
+        texts = result.get("texts", [])
+        # Разбор по областям нужен только для нескольких узких кропов
+        regions = result['regions'] if 'regions' in job['region'] else None
+        with self._stage('info', timings):
+            info = get_info(texts, detect=job['detect'], regions=regions)
+        timings['total'] = time.perf_counter() - job['start']
+
+        analysis = {
+            'detect': job['detect'],
+            'found': job['region']['box'] is not None,
+            'texts': texts,
+            'scores': result['data']['rec_scores'],
+            'info': info,
+            'timings': timings,
+        }
+        if job['capture'] is not None:
+            # Запись на диск идёт в фоне; здесь только выборка и постановка в очередь
+            self.artifacts.maybe_submit(job['image'], analysis, job['capture'])
+        shadow = self.shadow
+        # Служебные прогоны (канарейка, теневые и прогревочные) не попадают в выборки
+        if shadow is not None and not job['synthetic']:
+            shadow.maybe_submit(job['image'], job['camera_id'])
+        if job['profiled']:
+            stack_profiler.record_request(id(job), {
+                'camera_id': job['camera_id'],
+                'detect': job['detect'],
+                'timings': dict(timings),
+            })
+        return analysis
+
+    def analyze(
+        self,
+        image: ImageSource,
+        camera_id: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> Dict:
+        """
+        Прогоняет изображение через все этапы в текущем потоке и возвращает результат
+        с деталями по этапам. deadline — срок по time.monotonic(); после него
+        бросается DeadlineExceeded.
+        """
+        job = self._new_job(image, camera_id, deadline)
+        for name in ENGINE_STAGES:
+            job = getattr(self, f'_{name}_stage')(job)
+        return job
+
+    def recognize(self, image: ImageSource, camera_id: Optional[str] = None) -> Dict[str, str]:
+        return self.analyze(image, camera_id)['info']
+
+    def recognize_many(self, images: Iterable[ImageSource]) -> List[Dict[str, str]]:
+        return [self.recognize(image) for image in images]
+
+    def submit(
+        self,
+        image: ImageSource,
+        camera_id: Optional[str] = None,
+        priority: str = DEFAULT_PRIORITY,
+        deadline: Optional[float] = None,
+        profiled: bool = False,
+        synthetic: bool = False,
+    ) -> Future:
+        """
+        Ставит анализ в конвейер этапов; результат — Future с ответом analyze.
+        profiled — снимать стеки этапов запроса (src.stack_profile);
+        synthetic — служебный прогон, не сохраняется в артефакты и теневой прогон.
+        """
+        job = self._new_job(image, camera_id, deadline, profiled, synthetic)
+        future = self.pipeline.submit(job, priority=priority, deadline=deadline)
+        if profiled:
+            # Запрос, просроченный в очереди, не доходит до записи в _info_stage или
+            # _run_stage; стеки, снятые после записи, тоже не должны копиться
+            key = id(job)
+            future.add_done_callback(lambda _: stack_profiler.discard(key))
+        return future
+
+    async def aanalyze(
+        self,
+        image: ImageSource,
+        camera_id: Optional[str] = None,
+        priority: str = DEFAULT_PRIORITY,
+        deadline: Optional[float] = None,
+        profiled: bool = False,
+    ) -> Dict:
+        return await asyncio.wrap_future(self.submit(image, camera_id, priority, deadline, profiled))
+
+    async def arecognize(
+        self,
+        image: ImageSource,
+        camera_id: Optional[str] = None,
+        priority: str = DEFAULT_PRIORITY,
+        deadline: Optional[float] = None,
+        profiled: bool = False,
+    ) -> Dict[str, str]:
+        return (await self.aanalyze(image, camera_id, priority, deadline, profiled))['info']
+
+    async def arecognize_many(self, images: Iterable[ImageSource]) -> List[Dict[str, str]]:
+        return list(await asyncio.gather(*(self.arecognize(image) for image in images)))
+
+    def close(self) -> None:
+        if self.shadow is not None:
+            self.shadow.close()
+        self.pipeline.close()
+        if self.roi_memory is not None:
+            self.roi_memory.save()
+        if self.artifacts is not None:
+            self.artifacts.close()
+
+
+class EngineRegistry:
+    """
+    Движки по именам профилей (см. src.config.PROFILES). Движок профиля
+    создаётся при первом обращении; модели с одинаковыми путями и вариантом OCR,
+    память областей, запись артефактов и конвейер этапов общие для всех профилей.
+
+    Конвейер один на узел, чтобы приоритеты и сроки действовали для всех профилей
+    сразу: stage_workers и pipeline_queue_size берутся из профиля, созданного первым
+    (профиль по умолчанию, OCR_PROFILE), у остальных профилей они не действуют.
+
+    Готовый движок выдаётся без блокировки. Новый профиль загружается и
+    прогревается вне общей блокировки: ждут только запросы этого же профиля.
+    """
+
+    def __init__(
+        self,
+        default_profile: str = DEFAULT_PROFILE,
+        engine_factory: Optional[Callable[..., OcrEngine]] = None,
+        warmup: bool = True,
+    ):
+        self.default_profile = default_profile
+        self.engine_factory = engine_factory or OcrEngine
+        self.warmup = warmup
+        self._engines: Dict[str, OcrEngine] = {}
+        # Профили, движок которых сейчас создаётся: запросы того же профиля ждут его Future
+        self._building: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def default(self) -> OcrEngine:
+        return self.get(self.default_profile)
+
+    def get(self, profile: Optional[str] = None) -> OcrEngine:
+        """Движок профиля; KeyError для неизвестного профиля."""
+        name = profile or self.default_profile
+        engine = self._engines.get(name)
+        if engine is not None:
+            return engine
+        if name != self.default_profile:
+            # Общие модели, блокировки и конвейер берутся у движка профиля по умолчанию
+            self.get(self.default_profile)
+
+        with self._lock:
+            engine = self._engines.get(name)
+            if engine is not None:
+                return engine
+            building = self._building.get(name)
+            if building is None:
+                config = get_config(name)
+                shared = self._shared(config)
+                building = self._building[name] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            return building.result()
+
+        try:
+            engine = self._create(config, shared)
+        except BaseException as e:
+            with self._lock:
+                del self._building[name]
+            building.set_exception(e)
+            raise
+        with self._lock:
+            self._engines[name] = engine
+            del self._building[name]
+        building.set_result(engine)
+        return engine
+
+    def _shared(self, config: OcrConfig) -> Dict:
+        # Под блокировкой: только ссылки на уже созданные движки, без загрузки моделей
+        shared = {}
+        for engine in self._engines.values():
+            if engine.config.car_model_path == config.car_model_path:
+                shared['car_model'] = engine.car_model
+            if engine.config.container_model_path == config.container_model_path:
+                shared['container_model'] = engine.container_model
+            if engine.config.ocr_variant == config.ocr_variant:
+                shared['ocr'] = engine.ocr
+            shared['roi_memory'] = engine.roi_memory
+            shared['artifacts'] = engine.artifacts
+            shared['detector_lock'] = engine._detector_lock
+            shared['ocr_lock'] = engine._ocr_lock
+            shared['pipeline'] = engine.pipeline
+        if 'pipeline' in shared and (
+            config.stage_workers != engine.config.stage_workers
+            or config.pipeline_queue_size != engine.config.pipeline_queue_size
+        ):
+            print("⚠️ stage_workers / pipeline_queue_size профиля не действуют: конвейер общий для профилей узла")
+        return shared
+
+    def _create(self, config: OcrConfig, shared: Dict) -> OcrEngine:
+        engine = self.engine_factory(config, **shared)
+        if self.warmup:
+            engine.warmup()
+        return engine
+
+    def engines(self) -> Dict[str, OcrEngine]:
+        with self._lock:
+            return dict(self._engines)
+
+    def close(self) -> None:
+        for engine in self.engines().values():
+            engine.close()
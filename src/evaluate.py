@@ -0,0 +1,238 @@
+import csv
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from src.get_info import has_check_digit_failure
+
+
+FIELDS = ('number', 'type', 'car')
+STAGE_FAILURES = ('missing', 'no_detection', 'ocr_miss', 'check_digit', 'mismatch', 'error')
+
+
+def load_manifest(manifest_path: Union[str, Path]) -> List[Dict[str, str]]:
+    """
+    Читает манифест с эталонными значениями.
+
+    JSON: список объектов {"image": ..., "number": ..., "type": ..., "car": ...}
+    или словарь {"путь/к/картинке.jpg": {"number": ...}}.
+    CSV: колонки image,number,type,car.
+    Относительные пути считаются от директории манифеста.
+    """
+    manifest_path = Path(manifest_path)
+    base_dir = manifest_path.resolve().parent
+
+    if manifest_path.suffix.lower() == '.csv':
+        with manifest_path.open('r', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with manifest_path.open('r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            rows = [{'image': image, **expected} for image, expected in data.items()]
+        else:
+            rows = data
+
+    entries = []
+    for row in rows:
+        image = (row.get('image') or '').strip()
+        if not image:
+            continue
+
+        image_path = Path(image)
+        if not image_path.is_absolute():
+            image_path = base_dir / image_path
+
+        entry = {'image': str(image_path)}
+        for field in FIELDS:
+            value = (row.get(field) or '').strip()
+            if value:
+                entry[field] = value
+        entries.append(entry)
+
+    return entries
+
+
+def manifest_from_names(test_dir: Union[str, Path], names: List[str]) -> List[Dict[str, str]]:
+    """Строит манифест из имён файлов вида XINU1235818.jpg / 01Q2270C.jpg."""
+    test_dir = Path(test_dir)
+    image_extensions = ['.jpg', '.jpeg', '.png', '.JPG', '.JPEG', '.PNG']
+
+    entries = []
+    for base_name in names:
+        image_path = test_dir / f"{base_name}.jpg"
+        for ext in image_extensions:
+            candidate = test_dir / f"{base_name}{ext}"
+            if candidate.exists():
+                image_path = candidate
+                break
+
+        field = 'number' if len(base_name) == 11 else 'car'
+        entries.append({'image': str(image_path), field: base_name})
+
+    return entries
+
+
+_worker_engine = None
+_worker_profile = None
+
+
+def _init_worker(profile: Optional[str]) -> None:
+    global _worker_profile
+    _worker_profile = profile
+
+
+def _get_worker_engine():
+    # Импорт внутри воркера: модели загружаются один раз в каждом процессе пула
+    global _worker_engine
+    if _worker_engine is None:
+        from src.config import get_config
+        from src.engine import OcrEngine
+        _worker_engine = OcrEngine(get_config(_worker_profile))
+    return _worker_engine
+
+
+def _evaluate_one(entry: Dict[str, str]) -> Dict:
+    image_path = Path(entry['image'])
+    expected = {field: entry[field] for field in FIELDS if field in entry}
+    report = {
+        'image': str(image_path),
+        'expected': expected,
+        'detect': None,
+        'info': {},
+        'texts': [],
+        'timings': {},
+        'failure': None,
+    }
+
+    if not image_path.exists():
+        report['failure'] = 'missing'
+        return report
+
+    try:
+        result = _get_worker_engine().analyze(image_path)
+    except Exception as e:
+        report['failure'] = 'error'
+        report['error'] = f"{type(e).__name__}: {e}"
+        return report
+
+    info = result['info']
+    report['detect'] = result['detect']
+    report['info'] = info
+    report['texts'] = result['texts']
+    report['timings'] = result['timings']
+
+    if not result['found']:
+        report['failure'] = 'no_detection'
+    elif not result['texts']:
+        report['failure'] = 'ocr_miss'
+    elif 'number' in expected and not info.get('number') and has_check_digit_failure(result['texts']):
+        report['failure'] = 'check_digit'
+    elif any(info.get(field, '') != value for field, value in expected.items()):
+        report['failure'] = 'mismatch'
+
+    return report
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(q / 100.0 * (len(values) - 1)))))
+    return values[index]
+
+
+def summarize(reports: List[Dict]) -> Dict:
+    accuracy = {}
+    for field in FIELDS:
+        total = [r for r in reports if field in r['expected']]
+        correct = [r for r in total if r['info'].get(field, '') == r['expected'][field]]
+        if total:
+            accuracy[field] = {
+                'correct': len(correct),
+                'total': len(total),
+                'accuracy': len(correct) / len(total),
+            }
+
+    failures = {stage: 0 for stage in STAGE_FAILURES}
+    for r in reports:
+        if r['failure']:
+            failures[r['failure']] += 1
+
+    latency = {}
+    stages = ('decode', 'detect', 'crop', 'compress', 'enhance', 'ocr', 'info', 'total')
+    for stage in stages:
+        values = [r['timings'][stage] for r in reports if stage in r['timings']]
+        if values:
+            latency[stage] = {
+                'mean': sum(values) / len(values),
+                'p50': _percentile(values, 50),
+                'p95': _percentile(values, 95),
+                'max': max(values),
+            }
+
+    return {
+        'images': len(reports),
+        'accuracy': accuracy,
+        'failures': failures,
+        'latency': latency,
+    }
+
+
+def evaluate(
+    entries: List[Dict[str, str]],
+    workers: Optional[int] = None,
+    verbose: bool = True,
+    profile: Optional[str] = None,
+) -> Dict:
+    workers = workers or max(1, (multiprocessing.cpu_count() or 2) // 2)
+    reports: List[Dict] = []
+
+    # spawn вместо fork: torch/paddle плохо переживают fork после инициализации
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(profile,),
+    ) as executor:
+        futures = {executor.submit(_evaluate_one, entry): entry for entry in entries}
+        for future in as_completed(futures):
+            report = future.result()
+            reports.append(report)
+            if verbose:
+                _print_report(report)
+
+    order = {entry['image']: i for i, entry in enumerate(entries)}
+    reports.sort(key=lambda r: order.get(r['image'], 0))
+
+    return {
+        'summary': summarize(reports),
+        'reports': reports,
+    }
+
+
+def _print_report(report: Dict) -> None:
+    name = Path(report['image']).stem
+    expected = report['expected']
+    got = ', '.join(f"{field}={report['info'].get(field, '')}" for field in expected) or report['info']
+    total = report['timings'].get('total')
+    total_text = f" ({total:.2f} сек)" if total is not None else ""
+    check_icon_text = "❌" if report['failure'] else "✅"
+    failure_text = f" [{report['failure']}]" if report['failure'] else ""
+    print(f"{check_icon_text}: {name} - {got}{failure_text}{total_text}")
+
+
+def print_summary(summary: Dict) -> None:
+    print(f"\nИзображений: {summary['images']}")
+    for field, stats in summary['accuracy'].items():
+        print(f"Точность {field}: {stats['correct']}/{stats['total']} ({stats['accuracy'] * 100:.1f}%)")
+    failures = ', '.join(f"{stage}={count}" for stage, count in summary['failures'].items() if count)
+    print(f"Ошибки по этапам: {failures or 'нет'}")
+    for stage, stats in summary['latency'].items():
+        print(
+            f"Время {stage}: mean {stats['mean']:.3f} / p50 {stats['p50']:.3f} / "
+            f"p95 {stats['p95']:.3f} / max {stats['max']:.3f} сек"
+        )
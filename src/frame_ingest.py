@@ -0,0 +1,217 @@
+import grp
+import json
+import os
+import re
+import socket
+import socketserver
+import threading
+import uuid
+from multiprocessing import resource_tracker, shared_memory
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from src.scheduler import deadline_after
+
+
+FRAME_SOCKET_PATH = os.environ.get('OCR_FRAME_SOCKET')
+# Группа граббера: сокет доступен ей (0660); без группы — только владельцу (0600)
+FRAME_SOCKET_GROUP = os.environ.get('OCR_FRAME_SOCKET_GROUP', '')
+# Сервер подключает только сегменты общей памяти граббера с этим префиксом
+FRAME_SEGMENT_PREFIX = 'tezport-frames-'
+_FRAME_CHANNELS = 3
+_SEGMENT_NAME = re.compile(rf'^{re.escape(FRAME_SEGMENT_PREFIX)}[A-Za-z0-9_-]{{1,64}}$')
+
+
+class _FrameRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Протокол: одна JSON-строка на кадр
+    {"shm": "<имя сегмента>", "offset": 0, "width": W, "height": H, "camera_id": "...",
+     "priority": "high", "deadline_ms": 1000}
+    и одна JSON-строка в ответ (результат get_info или {"error": ...}).
+    priority и deadline_ms необязательны (по умолчанию high, без срока).
+    Кадр в сегменте — RGB uint8, строки подряд. Клиент может переиспользовать
+    слот после получения ответа. Сегменты подключаются на время соединения:
+    после перезапуска граббера старое отображение закрывается вместе с ним.
+    """
+
+    def setup(self):
+        super().setup()
+        self.segments: Dict[str, shared_memory.SharedMemory] = {}
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                response = self.server.process(json.loads(line), self.segments)
+            except Exception as e:
+                response = {'error': f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+    def finish(self):
+        for segment in self.segments.values():
+            _close_segment(segment)
+        self.segments.clear()
+        super().finish()
+
+
+def _close_segment(segment: shared_memory.SharedMemory) -> None:
+    try:
+        segment.close()
+    except BufferError:
+        # Кадр ещё где-то используется: отображение освободится вместе с последней ссылкой
+        pass
+
+
+class FrameIngestServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, recognize: Callable[..., Dict[str, str]]):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.socket_path = socket_path
+        self.recognize = recognize
+        super().__init__(socket_path, _FrameRequestHandler)
+
+    def server_bind(self):
+        super().server_bind()
+        # Права выставляются до listen(): подключиться раньше никто не успеет
+        if FRAME_SOCKET_GROUP:
+            os.chown(self.socket_path, -1, grp.getgrnam(FRAME_SOCKET_GROUP).gr_gid)
+            os.chmod(self.socket_path, 0o660)
+        else:
+            os.chmod(self.socket_path, 0o600)
+
+    def _attach(self, name: str, segments: Dict[str, shared_memory.SharedMemory]) -> shared_memory.SharedMemory:
+        segment = segments.get(name)
+        if segment is None:
+            if not isinstance(name, str) or not _SEGMENT_NAME.match(name):
+                raise ValueError(f"Shared memory segment name must start with {FRAME_SEGMENT_PREFIX}")
+            segment = shared_memory.SharedMemory(name=name)
+            # Сегментом владеет граббер: не даём resource_tracker удалить его при выходе
+            try:
+                resource_tracker.unregister(segment._name, 'shared_memory')
+            except Exception:
+                pass
+            segments[name] = segment
+        return segment
+
+    def process(self, message: dict, segments: Dict[str, shared_memory.SharedMemory]) -> Dict[str, str]:
+        width = int(message['width'])
+        height = int(message['height'])
+        offset = int(message.get('offset', 0))
+        segment = self._attach(message['shm'], segments)
+
+        frame_bytes = width * height * _FRAME_CHANNELS
+        if width <= 0 or height <= 0 or offset < 0 or offset + frame_bytes > segment.size:
+            raise ValueError("Frame does not fit into the shared memory segment")
+
+        # Zero-copy представление кадра поверх общей памяти
+        frame = np.ndarray(
+            (height, width, _FRAME_CHANNELS),
+            dtype=np.uint8,
+            buffer=segment.buf,
+            offset=offset,
+        )
+        try:
+            return self.recognize(
+                frame,
+                message.get('camera_id'),
+                message.get('priority', 'high'),
+                deadline_after(message.get('deadline_ms')),
+            )
+        finally:
+            del frame
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def start_frame_server(engine, socket_path: Optional[str] = FRAME_SOCKET_PATH) -> Optional[FrameIngestServer]:
+    if not socket_path:
+        return None
+
+    # Кадры с камер въезда — через планировщик движка, по умолчанию с высоким приоритетом
+    def recognize(frame, camera_id, priority, deadline):
+        return engine.submit(frame, camera_id, priority, deadline).result()['info']
+
+    server = FrameIngestServer(socket_path, recognize)
+    thread = threading.Thread(target=server.serve_forever, name='frame-ingest', daemon=True)
+    thread.start()
+    print(f"ℹ️ Приём кадров через общую память: {socket_path}")
+    return server
+
+
+def stop_frame_server(server: Optional[FrameIngestServer]) -> None:
+    if server is None:
+        return
+    server.shutdown()
+    server.server_close()
+
+
+class FrameClient:
+    """
+    Клиент для граббера на том же хосте: кольцевой буфер из slots кадров
+    в одном сегменте общей памяти и управляющие сообщения через Unix-сокет.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        width: int,
+        height: int,
+        slots: int = 2,
+        camera_id: Optional[str] = None,
+    ):
+        self.camera_id = camera_id
+        self.width = width
+        self.height = height
+        self.slots = slots
+        self.slot_size = width * height * _FRAME_CHANNELS
+        self.segment = shared_memory.SharedMemory(
+            name=f"{FRAME_SEGMENT_PREFIX}{uuid.uuid4().hex}",
+            create=True,
+            size=self.slot_size * slots,
+        )
+        self._next_slot = 0
+        self._lock = threading.Lock()
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(socket_path)
+        self._reader = self._sock.makefile('rb')
+
+    def slot(self, index: int) -> np.ndarray:
+        """Представление слота для записи кадра напрямую (без промежуточной копии)."""
+        return np.ndarray(
+            (self.height, self.width, _FRAME_CHANNELS),
+            dtype=np.uint8,
+            buffer=self.segment.buf,
+            offset=index * self.slot_size,
+        )
+
+    def recognize(self, frame: Optional[np.ndarray] = None, index: Optional[int] = None) -> Dict[str, str]:
+        with self._lock:
+            if index is None:
+                index = self._next_slot
+                self._next_slot = (self._next_slot + 1) % self.slots
+            if frame is not None:
+                self.slot(index)[...] = frame
+
+            message = {
+                'shm': self.segment.name,
+                'offset': index * self.slot_size,
+                'width': self.width,
+                'height': self.height,
+                'camera_id': self.camera_id,
+            }
+            self._sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+            return json.loads(self._reader.readline())
+
+    def close(self) -> None:
+        self._reader.close()
+        self._sock.close()
+        self.segment.close()
+        self.segment.unlink()
@@ -165,7 +165,20 @@ def _get_container_number(texts: List[str]) -> str:
     return ""
 
 
-def get_info(texts: List[str], detect: Optional[str] = None) -> Dict[str, str]:
+def has_check_digit_failure(texts: List[str]) -> bool:
+    """Есть кандидат формата ISO 6346, у которого не сошлась контрольная цифра."""
+    for text in _filter_by_length(texts):
+        code = normalize_container_number(text)
+        if len(code) == 11 and validate_container(code, without_iso_check=True) and not validate_container(code):
+            return True
+    return False
+
+
+def get_info(
+    texts: List[str],
+    detect: Optional[str] = None,
+    regions: Optional[List[List[str]]] = None,
+) -> Dict[str, str]:
     container_number = None
     container_type = None
     car = None
@@ -183,9 +196,17 @@ def get_info(texts: List[str], detect: Optional[str] = None) -> Dict[str, str]:
             'car': car or '',
         }
     
-    filtered_texts = _filter_by_length(texts)
-    container_type = _get_container_type(filtered_texts)
-    container_number = _get_container_number(filtered_texts)
+    # Тексты по областям (строка номера, строка типа) разбираются отдельно,
+    # чтобы фрагменты разных строк не склеивались в ложный номер
+    for region_texts in regions or []:
+        filtered_texts = _filter_by_length(region_texts)
+        container_type = container_type or _get_container_type(filtered_texts)
+        container_number = container_number or _get_container_number(filtered_texts)
+
+    if not container_number or not container_type:
+        filtered_texts = _filter_by_length(texts)
+        container_type = container_type or _get_container_type(filtered_texts)
+        container_number = container_number or _get_container_number(filtered_texts)
     
     return {
         'number': container_number or '',
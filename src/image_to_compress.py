@@ -1,17 +1,25 @@
 import io
+import os
 from pathlib import Path
-from typing import Union
+from typing import BinaryIO, Union
 
+import numpy as np
 from PIL import Image
 
+from src.codec import encode_jpeg, open_image
+
+
+COMPRESS_TARGET_SIZE_KB = 40
+COMPRESS_QUALITY = 85
+
 
 def image_to_compress(
-    image_source: Union[str, Path, io.BytesIO],
-    target_size_kb: int = 40,
-    quality: int = 85,
+    image_source: Union[str, Path, BinaryIO, np.ndarray],
+    target_size_kb: int = COMPRESS_TARGET_SIZE_KB,
+    quality: int = COMPRESS_QUALITY,
     log_size: bool = False,
     is_min_size_disabled_compress: bool = False,
-) -> io.BytesIO:
+) -> BinaryIO:
     target_size_bytes = target_size_kb * 1024
 
     image_path: Path | None = None
@@ -20,14 +28,15 @@ def image_to_compress(
     if isinstance(image_source, (str, Path)):
         image_path = Path(image_source)
         initial_size = image_path.stat().st_size
-        img = Image.open(image_path)
-    elif isinstance(image_source, io.BytesIO):
-        current_pos = image_source.tell()
+        img = open_image(image_path)
+    elif hasattr(image_source, 'read'):
+        # Размер без getvalue(): не копируем буфер (BytesIO или спул-файл загрузки)
+        initial_size = image_source.seek(0, os.SEEK_END)
         image_source.seek(0)
-        initial_size = len(image_source.getvalue())
-        image_source.seek(current_pos)
-        image_source.seek(0)
-        img = Image.open(image_source)
+        img = open_image(image_source)
+    elif isinstance(image_source, np.ndarray):
+        # Сырой RGB-кадр (например, из общей памяти): всегда кодируем в JPEG
+        img = Image.fromarray(image_source)
     else:
         img = Image.open(image_source)
         initial_size = None
@@ -38,7 +47,7 @@ def image_to_compress(
             print(f"Начальный размер: {initial_size_kb:.2f} KB ({initial_size} bytes)")
             print(f"Изображение уже меньше целевого размера ({target_size_kb} KB), сжатие не требуется")
         
-        if isinstance(image_source, io.BytesIO):
+        if hasattr(image_source, 'read'):
             image_source.seek(0)
             return image_source
         else:
@@ -73,14 +82,9 @@ def image_to_compress(
                 new_size = (int(img.width * scale_factor), int(img.height * scale_factor))
                 img_resized = img.resize(new_size, Image.Resampling.LANCZOS)
 
-            buffer = io.BytesIO()
-            img_resized.save(
-                buffer,
-                format="JPEG",
-                quality=current_quality,
-                optimize=True,
-            )
-            current_size = buffer.tell()
+            # Кодирование выбранным кодеком (src.codec)
+            buffer = encode_jpeg(img_resized, current_quality, optimize=True)
+            current_size = buffer.getbuffer().nbytes
 
             if current_size <= target_size_bytes:
                 buffer.seek(0)
@@ -88,13 +92,7 @@ def image_to_compress(
 
         if buffer is None or current_size > target_size_bytes:
             if buffer is None:
-                buffer = io.BytesIO()
-                img_resized.save(
-                    buffer,
-                    format="JPEG",
-                    quality=current_quality,
-                    optimize=True,
-                )
+                buffer = encode_jpeg(img_resized, current_quality, optimize=True)
             buffer.seek(0)
 
     if log_size:
@@ -1,11 +1,18 @@
 import io
 import os
 from pathlib import Path
-from typing import Optional, Union
+from typing import BinaryIO, List, Optional, Union
 
 import numpy as np
 from PIL import Image
-from ultralytics import YOLO
+
+try:
+    from ultralytics import YOLO
+except ImportError:
+    # Без ultralytics модуль импортируется (константы, геометрия рамок), но модели не загружаются
+    YOLO = None
+
+from src.codec import decode_jpeg, encode_jpeg, jpeg_codec, jpeg_reduction, read_source
 
 
 yolo_model = None
@@ -33,79 +40,374 @@ if YOLO_DEVICE.startswith('cuda'):
 else:
     print("ℹ️ GPU не обнаружен для YOLO. Используется CPU.")
 
-def _init_yolo_model():
-    global yolo_model
-    if yolo_model is not None:
-        return yolo_model
-    
+CAR_MODEL_DEFAULT_PATH = _base_dir / "src/yolo_car_number.pt"
+CONTAINER_MODEL_DEFAULT_PATH = _base_dir / "src/yolo_container_number.pt"
+
+
+def load_yolo_model(custom_model_path: Optional[str], default_model_path: Path):
+    if YOLO is None:
+        raise RuntimeError("Для детекции нужен ultralytics: pip install ultralytics")
     try:
-        custom_model_path = os.environ.get('YOLO_LICENSE_PLATE_MODEL')
         model_paths = []
         
         if custom_model_path and Path(custom_model_path).exists():
             model_paths.append(custom_model_path)
         
         model_paths.extend([
-            str(_base_dir / "src/yolo_car_number.pt"),
+            str(default_model_path),
         ])
         
         for model_path in model_paths:
             try:
                 # YOLO автоматически использует GPU, если доступен PyTorch с CUDA
                 # device будет указан при вызове predict
-                yolo_model = YOLO(model_path)
-                return yolo_model
+                return YOLO(model_path)
             except Exception:
                 continue
         
-        return yolo_model
+        return None
     except Exception:
         return None
 
-_init_yolo_model()
 
+def _init_yolo_model():
+    global yolo_model
+    if yolo_model is None:
+        yolo_model = load_yolo_model(os.environ.get('YOLO_LICENSE_PLATE_MODEL'), CAR_MODEL_DEFAULT_PATH)
+    return yolo_model
 
-def image_to_car_number_crop(
-    image_path: Union[str, Path, io.BytesIO],
-    confidence: float = 0.25,
+
+# Размер входа детектора: YOLO всё равно уменьшает кадр до 640 по длинной стороне
+DETECTOR_INPUT_SIZE = 640
+DETECTOR_CONFIDENCE = 0.25
+# Свой размер входа для каждого детектора (None — общий imgsz); подбирается
+# по размеченному набору командой main-tune-imgsz.py
+CAR_INPUT_SIZE: Optional[int] = None
+CONTAINER_INPUT_SIZE: Optional[int] = None
+
+# Отступы кропа вокруг рамки: номер машины и вертикальный номер контейнера — в пикселях,
+# горизонтальный номер контейнера — в долях рамки (слева, сверху, справа, снизу),
+# чтобы строка типа под номером попала в тот же кроп
+PLATE_PADDING = 10
+CONTAINER_PADDING = (1.0, 0.75, 1.0, 1.5)
+
+# Допустимые пропорции рамки номера контейнера (ширина / высота): горизонтальная
+# строка — как было всегда; вертикальная — только узкий столбец символов, чтобы
+# расширение не меняло выбор рамки на обычных горизонтальных снимках
+CONTAINER_HORIZONTAL_ASPECT = (1.0, 10.0)
+CONTAINER_VERTICAL_ASPECT = (0.1, 1 / 3)
+
+# Отступ узкого кропа области (доля меньшей стороны рамки)
+TIGHT_PADDING_RATIO = 0.2
+
+# Плиточная детекция для кадров очень высокого разрешения / дальних планов
+TILE_SIZE = 640
+TILE_OVERLAP = 0.2
+TILED_MIN_AREA_RATIO = 0.0001
+NMS_IOU_THRESHOLD = 0.5
+
+
+def _open_image(image_path: Union[str, Path, BinaryIO, np.ndarray]) -> Optional[Image.Image]:
+    if isinstance(image_path, np.ndarray):
+        return Image.fromarray(image_path)
+
+    if hasattr(image_path, 'read'):
+        image_path.seek(0)
+        return Image.open(image_path)
+
+    img_path = Path(image_path)
+    if not img_path.exists():
+        return None
+    return Image.open(img_path)
+
+
+def image_size(image_path: Union[str, Path, BinaryIO, np.ndarray]) -> Optional[tuple]:
+    """Размер изображения (ширина, высота) по заголовку, без декодирования."""
+    if isinstance(image_path, np.ndarray):
+        height, width = image_path.shape[:2]
+        return (width, height)
+
+    img = _open_image(image_path)
+    if img is None:
+        return None
+    return img.size
+
+
+def load_detection_frame(
+    image_path: Union[str, Path, BinaryIO, np.ndarray],
+    input_size: Optional[int] = DETECTOR_INPUT_SIZE,
 ) -> Optional[dict]:
-    model = _init_yolo_model()
-    if model is None:
+    """
+    Декодирует изображение в уменьшенном разрешении для детекции.
+    Для JPEG используется DCT-масштабирование (Image.draft), поэтому
+    полный кадр 8–12 MP не декодируется и не копируется в numpy.
+    Готовый RGB-кадр (np.ndarray) передаётся детектору без копирования.
+    input_size=None — полное разрешение (для плиточной детекции).
+    """
+    if isinstance(image_path, np.ndarray):
+        height, width = image_path.shape[:2]
+        return {'array': image_path, 'size': (width, height), 'scale': (1.0, 1.0)}
+
+    img = _open_image(image_path)
+    if img is None:
         return None
-    
-    if isinstance(image_path, io.BytesIO):
-        image_path.seek(0)
-        img = Image.open(image_path)
-        img_array = np.array(img.convert('RGB'))
+
+    full_width, full_height = img.size
+    long_side = max(full_width, full_height)
+
+    if img.format == 'JPEG' and jpeg_codec.name != 'pillow':
+        # Быстрый кодек (src.codec): то же DCT-масштабирование, сразу в numpy
+        reduction = jpeg_reduction(img.size, input_size) if input_size is not None else 1
+        del img
+        array = decode_jpeg(read_source(image_path), reduction)
+        factor = max(array.shape[:2]) // input_size if input_size is not None else 1
+        if factor >= 2:
+            array = np.array(Image.fromarray(array).reduce(factor))
+        return {
+            'array': array,
+            'size': (full_width, full_height),
+            'scale': (full_width / array.shape[1], full_height / array.shape[0]),
+        }
+
+    if input_size is not None and long_side > input_size:
+        # Запрашиваем размер с сохранением пропорций: draft выберет
+        # наименьший масштаб 1/2, 1/4, 1/8, при котором кадр не меньше input_size
+        ratio = input_size / long_side
+        img.draft('RGB', (max(1, int(full_width * ratio)), max(1, int(full_height * ratio))))
+
+        # Не-JPEG (или слишком грубый draft): дешёвое целочисленное уменьшение
+        factor = max(img.size) // input_size
+        if factor >= 2:
+            img = img.reduce(factor)
+
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    draft_width, draft_height = img.size
+    return {
+        'array': np.array(img),
+        'size': (full_width, full_height),
+        'scale': (full_width / draft_width, full_height / draft_height),
+    }
+
+
+def _to_full_resolution(boxes: np.ndarray, frame: dict) -> np.ndarray:
+    scale_x, scale_y = frame['scale']
+    offset_x, offset_y = frame.get('offset', (0, 0))
+    if (scale_x, scale_y, offset_x, offset_y) == (1.0, 1.0, 0, 0):
+        return boxes
+    scale = np.array([scale_x, scale_y, scale_x, scale_y], dtype=boxes.dtype)
+    offset = np.array([offset_x, offset_y, offset_x, offset_y], dtype=boxes.dtype)
+    return boxes * scale + offset
+
+
+def roi_frame(frame: dict, roi: tuple) -> dict:
+    """
+    Часть кадра для детекции по области roi (x1, y1, x2, y2 в долях 0..1).
+    Массив — представление без копирования; рамки пересчитываются в
+    координаты полного изображения через offset.
+    """
+    array = frame['array']
+    height, width = array.shape[:2]
+    x1 = max(0, int(roi[0] * width))
+    y1 = max(0, int(roi[1] * height))
+    x2 = min(width, max(x1 + 1, int(np.ceil(roi[2] * width))))
+    y2 = min(height, max(y1 + 1, int(np.ceil(roi[3] * height))))
+
+    scale_x, scale_y = frame['scale']
+    offset_x, offset_y = frame.get('offset', (0, 0))
+    return {
+        'array': array[y1:y2, x1:x2],
+        'size': frame['size'],
+        'scale': frame['scale'],
+        'offset': (offset_x + x1 * scale_x, offset_y + y1 * scale_y),
+    }
+
+
+def tiled_frame(
+    frame: dict,
+    tile_size: int = TILE_SIZE,
+    overlap: float = TILE_OVERLAP,
+    min_area_ratio: float = TILED_MIN_AREA_RATIO,
+) -> dict:
+    """
+    Разбивает кадр на перекрывающиеся плитки tile_size×tile_size.
+    Детектор получает их одним батчем, поэтому мелкие (дальние) номера
+    не теряются при уменьшении всего кадра до входа YOLO.
+    """
+    height, width = frame['array'].shape[:2]
+    stride = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(length: int) -> List[int]:
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, stride))
+        positions.append(length - tile_size)
+        return positions
+
+    tiles = [
+        (x, y, min(width, x + tile_size), min(height, y + tile_size))
+        for y in starts(height)
+        for x in starts(width)
+    ]
+    return {**frame, 'tiles': tiles, 'min_area_ratio': min_area_ratio}
+
+
+def _nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float = NMS_IOU_THRESHOLD) -> np.ndarray:
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = np.maximum(0, x2 - x1) * np.maximum(0, y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+
+        inter_w = np.maximum(0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]))
+        inter_h = np.maximum(0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]))
+        inter = inter_w * inter_h
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-6)
+        order = rest[iou <= iou_threshold]
+
+    return np.array(keep, dtype=np.int64)
+
+
+def _predict(model, frame: dict, confidence: float, imgsz: int) -> Optional[tuple]:
+    """Рамки (в координатах полного изображения), уверенности и классы детектора."""
+    tiles = frame.get('tiles')
+    if tiles:
+        array = frame['array']
+        inputs = [array[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles]
+        offsets = tiles
     else:
-        img_path = Path(image_path)
-        if not img_path.exists():
-            return None
-        img = Image.open(img_path)
-        img_array = np.array(img.convert('RGB'))
-    
-    results = model(img_array, conf=confidence, verbose=False, device=YOLO_DEVICE)
+        inputs = frame['array']
+        offsets = [(0, 0, 0, 0)]
+
+    results = model(inputs, conf=confidence, imgsz=imgsz, verbose=False, device=YOLO_DEVICE)
     
     if not results or len(results) == 0:
         return None
-    
-    result = results[0]
-    
-    if result.boxes is None or len(result.boxes) == 0:
+
+    all_boxes = []
+    all_confidences = []
+    all_classes = []
+    for result, (offset_x, offset_y, _, _) in zip(results, offsets):
+        if result.boxes is None or len(result.boxes) == 0:
+            continue
+        boxes = result.boxes.xyxy.cpu().numpy()
+        all_boxes.append(boxes + np.array([offset_x, offset_y, offset_x, offset_y], dtype=boxes.dtype))
+        all_confidences.append(result.boxes.conf.cpu().numpy())
+        if result.boxes.cls is not None:
+            all_classes.append(result.boxes.cls.cpu().numpy())
+        else:
+            all_classes.append(np.zeros(len(boxes)))
+
+    if not all_boxes:
         return None
-    
-    boxes = result.boxes.xyxy.cpu().numpy()
-    confidences = result.boxes.conf.cpu().numpy()
-    classes = result.boxes.cls.cpu().numpy() if result.boxes.cls is not None else None
-    
-    if len(boxes) == 0:
+
+    boxes = np.concatenate(all_boxes)
+    confidences = np.concatenate(all_confidences)
+    classes = np.concatenate(all_classes)
+
+    if tiles and len(boxes) > 1:
+        # Склейка дублей из перекрывающихся плиток; NMS по классам через сдвиг рамок
+        class_offsets = (classes * (max(frame['array'].shape[:2]) + 1))[:, None]
+        keep = _nms(boxes + class_offsets, confidences)
+        boxes, confidences, classes = boxes[keep], confidences[keep], classes[keep]
+
+    return _to_full_resolution(boxes, frame), confidences, classes
+
+
+def warmup_yolo(model, sizes, confidence: float = DETECTOR_CONFIDENCE) -> None:
+    """Прогревает один детектор на каждом размере входа (пустой кадр)."""
+    for size in sizes:
+        frame = {
+            'array': np.zeros((size, size, 3), dtype=np.uint8),
+            'size': (size, size),
+            'scale': (1.0, 1.0),
+        }
+        _predict(model, frame, confidence, size)
+
+
+def _crop_boxes(
+    image_path: Union[str, Path, BinaryIO, np.ndarray],
+    boxes: List[tuple],
+    max_decode_pixels: Optional[int] = None,
+) -> List[Image.Image]:
+    """Вырезает рамки из полного разрешения за одно декодирование изображения."""
+    if isinstance(image_path, np.ndarray):
+        # Копируются только выбранные области кадра
+        return [
+            Image.fromarray(np.ascontiguousarray(image_path[y1:y2, x1:x2]))
+            for x1, y1, x2, y2 in boxes
+        ]
+
+    img = _open_image(image_path)
+    width, height = img.size
+    reduction = 1
+    if max_decode_pixels and width * height > max_decode_pixels:
+        # Бюджет памяти запроса: декодируем с наименьшим уменьшением 1/2..1/8,
+        # при котором кадр помещается в бюджет, и пересчитываем рамки
+        reduction = 2
+        while reduction < 8 and (width // reduction) * (height // reduction) > max_decode_pixels:
+            reduction *= 2
+
+    # Кроп всегда через Pillow: draft и бюджет памяти, без второго чтения байтов
+    # запроса (быстрый кодек уже прочитал их для кадра детекции)
+    if reduction > 1:
+        img.draft('RGB', (width // reduction, height // reduction))
+    decoded_size = img.size
+
+    if decoded_size != (width, height):
+        scale_x = decoded_size[0] / width
+        scale_y = decoded_size[1] / height
+        boxes = [
+            (
+                int(box[0] * scale_x),
+                int(box[1] * scale_y),
+                max(int(box[0] * scale_x) + 1, int(box[2] * scale_x)),
+                max(int(box[1] * scale_y) + 1, int(box[3] * scale_y)),
+            )
+            for box in boxes
+        ]
+    crops = [img.crop(box) for box in boxes]
+    del img
+    return crops
+
+
+def _crop_full_resolution(
+    image_path: Union[str, Path, BinaryIO, np.ndarray],
+    box: tuple,
+    max_decode_pixels: Optional[int] = None,
+) -> io.BytesIO:
+    cropped_img = _crop_boxes(image_path, [box], max_decode_pixels)[0]
+
+    return encode_jpeg(cropped_img, 95)
+
+
+def _detect_car_number(
+    frame: dict,
+    confidence: float = DETECTOR_CONFIDENCE,
+    model=None,
+    imgsz: int = DETECTOR_INPUT_SIZE,
+) -> Optional[dict]:
+    if model is None:
+        model = _init_yolo_model()
+    if model is None:
+        return None
+
+    prediction = _predict(model, frame, confidence, imgsz)
+    if prediction is None:
         return None
+    boxes, confidences, classes = prediction
     
     class_names = model.names if hasattr(model, 'names') else None
     filtered_boxes = []
     filtered_confidences = []
-    img_width, img_height = img.size
+    img_width, img_height = frame['size']
     img_area = img_width * img_height
+    min_area_ratio = frame.get('min_area_ratio', 0.001)
     excluded_classes = {'car', 'truck', 'bus', 'motorcycle', 'vehicle'}
     
     for i, box in enumerate(boxes):
@@ -114,7 +416,7 @@ def image_to_car_number_crop(
         height = y2 - y1
         area = width * height
         
-        if area > (img_area * 0.05) or area < (img_area * 0.001):
+        if area > (img_area * 0.05) or area < (img_area * min_area_ratio):
             continue
         
         aspect_ratio = width / height if height > 0 else 0
@@ -142,90 +444,92 @@ def image_to_car_number_crop(
     car_confidence = filtered_confidences[max_conf_idx]
     selected_box = filtered_boxes[max_conf_idx]
     x1, y1, x2, y2 = map(int, selected_box)
+    raw_box = (x1, y1, x2, y2)
     
-    padding = 10
+    padding = PLATE_PADDING
     x1 = max(0, x1 - padding)
     y1 = max(0, y1 - padding)
     x2 = min(img_width, x2 + padding)
     y2 = min(img_height, y2 + padding)
     
-    cropped_img = img.crop((x1, y1, x2, y2))
-    
-    if cropped_img.mode != 'RGB':
-        cropped_img = cropped_img.convert('RGB')
-    
-    buffer = io.BytesIO()
-    cropped_img.save(buffer, "JPEG", quality=95)
-    buffer.seek(0)
-    return {'image': buffer, 'confidence': car_confidence}
+    return {'box': (x1, y1, x2, y2), 'raw_box': raw_box, 'confidence': car_confidence}
+
+
+def image_to_car_number_crop(
+    image_path: Union[str, Path, BinaryIO, np.ndarray],
+    confidence: float = DETECTOR_CONFIDENCE,
+) -> Optional[dict]:
+    frame = load_detection_frame(image_path)
+    if frame is None:
+        return None
+
+    detection = _detect_car_number(frame, confidence)
+    if detection is None:
+        return None
+
+    buffer = _crop_full_resolution(image_path, detection['box'])
+    return {'image': buffer, 'confidence': detection['confidence']}
 
 def _init_container_yolo_model():
     global yolo_container_model
-    if yolo_container_model is not None:
-        return yolo_container_model
-    
-    try:
-        custom_model_path = os.environ.get('YOLO_CONTAINER_MODEL')
-        model_paths = []
-        
-        if custom_model_path and Path(custom_model_path).exists():
-            model_paths.append(custom_model_path)
-        
-        model_paths.extend([
-            str(_base_dir / "src/yolo_container_number.pt"),
-        ])
-        
-        for model_path in model_paths:
-            try:
-                # YOLO автоматически использует GPU, если доступен PyTorch с CUDA
-                # device будет указан при вызове predict
-                yolo_container_model = YOLO(model_path)
-                return yolo_container_model
-            except Exception:
-                continue
-        
-        return yolo_container_model
-    except Exception:
-        return None
+    if yolo_container_model is None:
+        yolo_container_model = load_yolo_model(os.environ.get('YOLO_CONTAINER_MODEL'), CONTAINER_MODEL_DEFAULT_PATH)
+    return yolo_container_model
 
 
-def image_to_container_number_crop(
-    image_path: Union[str, Path, io.BytesIO],
-    confidence: float = 0.25,
+def _tight_regions(
+    boxes: List[np.ndarray],
+    confidences: List[float],
+    size: tuple,
+    top_k: int,
+) -> List[dict]:
+    """
+    До top_k самых уверенных непересекающихся рамок (строка владельца/номера,
+    строка типа ISO) с небольшим отступом, без захвата соседнего текста.
+    """
+    img_width, img_height = size
+    keep = _nms(np.asarray(boxes, dtype=np.float32), np.asarray(confidences, dtype=np.float32))[:top_k]
+
+    regions = []
+    for i in keep:
+        x1, y1, x2, y2 = map(int, boxes[i])
+        raw_box = (x1, y1, x2, y2)
+        is_horizontal = (x2 - x1) > (y2 - y1)
+        padding = max(4, int(min(x2 - x1, y2 - y1) * TIGHT_PADDING_RATIO))
+        regions.append({
+            'box': (
+                max(0, x1 - padding),
+                max(0, y1 - padding),
+                min(img_width, x2 + padding),
+                min(img_height, y2 + padding),
+            ),
+            'raw_box': raw_box,
+            'confidence': float(confidences[i]),
+            'orientation': 'horizontal' if is_horizontal else 'vertical',
+        })
+    return regions
+
+
+def _detect_container_number(
+    frame: dict,
+    confidence: float = DETECTOR_CONFIDENCE,
+    model=None,
+    imgsz: int = DETECTOR_INPUT_SIZE,
+    top_k: int = 1,
 ) -> Optional[dict]:
-    model = _init_container_yolo_model()
+    if model is None:
+        model = _init_container_yolo_model()
     if model is None:
         return None
-    
-    if isinstance(image_path, io.BytesIO):
-        image_path.seek(0)
-        img = Image.open(image_path)
-        img_array = np.array(img.convert('RGB'))
-    else:
-        img_path = Path(image_path)
-        if not img_path.exists():
-            return None
-        img = Image.open(img_path)
-        img_array = np.array(img.convert('RGB'))
-    
-    results = model(img_array, conf=confidence, verbose=False, device=YOLO_DEVICE)
-    
-    if not results or len(results) == 0:
-        return None
-    
-    result = results[0]
-    
-    if result.boxes is None or len(result.boxes) == 0:
-        return None
-    
-    boxes = result.boxes.xyxy.cpu().numpy()
-    confidences = result.boxes.conf.cpu().numpy()
-    
-    if len(boxes) == 0:
+
+    prediction = _predict(model, frame, confidence, imgsz)
+    if prediction is None:
         return None
+    boxes, confidences, _ = prediction
     
-    img_width, img_height = img.size
+    img_width, img_height = frame['size']
     img_area = img_width * img_height
+    min_area_ratio = frame.get('min_area_ratio', 0.001)
     filtered_boxes = []
     filtered_confidences = []
     
@@ -235,12 +539,15 @@ def image_to_container_number_crop(
         height = y2 - y1
         area = width * height
         
-        if area > (img_area * 0.5) or area < (img_area * 0.001):
+        if area > (img_area * 0.5) or area < (img_area * min_area_ratio):
             continue
         
         aspect_ratio = width / height if height > 0 else 0
         
-        if 1.0 <= aspect_ratio <= 10.0:
+        # Горизонтальные номера и вертикальные (символы столбиком)
+        horizontal_min, horizontal_max = CONTAINER_HORIZONTAL_ASPECT
+        vertical_min, vertical_max = CONTAINER_VERTICAL_ASPECT
+        if horizontal_min <= aspect_ratio <= horizontal_max or vertical_min <= aspect_ratio <= vertical_max:
             filtered_boxes.append(box)
             filtered_confidences.append(confidences[i])
     
@@ -251,53 +558,141 @@ def image_to_container_number_crop(
     container_confidence = filtered_confidences[max_conf_idx]
     selected_box = filtered_boxes[max_conf_idx]
     x1, y1, x2, y2 = map(int, selected_box)
+    raw_box = (x1, y1, x2, y2)
     
     box_width = x2 - x1
     box_height = y2 - y1
     is_horizontal = box_width > box_height
     
     if is_horizontal:
-        padding_right = int(box_width * 1.0)
-        padding_top = int(box_height * 0.75)
-        padding_bottom = int(box_height * 1.5)
-        padding_left = int(box_width * 1.0)
+        ratio_left, ratio_top, ratio_right, ratio_bottom = CONTAINER_PADDING
+        padding_right = int(box_width * ratio_right)
+        padding_top = int(box_height * ratio_top)
+        padding_bottom = int(box_height * ratio_bottom)
+        padding_left = int(box_width * ratio_left)
         
         x1 = max(0, x1 - padding_left)
         y1 = max(0, y1 - padding_top)
         x2 = min(img_width, x2 + padding_right)
         y2 = min(img_height, y2 + padding_bottom)
     else:
-        padding = 10
+        padding = PLATE_PADDING
         x1 = max(0, x1 - padding)
         y1 = max(0, y1 - padding)
         x2 = min(img_width, x2 + padding)
         y2 = min(img_height, y2 + padding)
     
-    cropped_img = img.crop((x1, y1, x2, y2))
-    
-    if cropped_img.mode != 'RGB':
-        cropped_img = cropped_img.convert('RGB')
-    
-    buffer = io.BytesIO()
-    cropped_img.save(buffer, "JPEG", quality=95)
-    buffer.seek(0)
-    return {'image': buffer, 'confidence': container_confidence}
+    result = {
+        'box': (x1, y1, x2, y2),
+        'raw_box': raw_box,
+        'confidence': container_confidence,
+        'orientation': 'horizontal' if is_horizontal else 'vertical',
+    }
+    if top_k > 1:
+        regions = _tight_regions(filtered_boxes, filtered_confidences, frame['size'], top_k)
+        # С одной рамкой остаётся широкий кроп: строка типа попадает в него
+        if len(regions) > 1:
+            result['regions'] = regions
+    return result
 
-def image_to_crop(
-    image_path: Union[str, Path, io.BytesIO],
-    confidence: float = 0.25,
-) -> Optional[Union[str, io.BytesIO]]:
 
-    car_result = image_to_car_number_crop(image_path, confidence)
-    container_result = image_to_container_number_crop(image_path, confidence)
+def image_to_container_number_crop(
+    image_path: Union[str, Path, BinaryIO, np.ndarray],
+    confidence: float = DETECTOR_CONFIDENCE,
+) -> Optional[dict]:
+    frame = load_detection_frame(image_path)
+    if frame is None:
+        return None
+
+    detection = _detect_container_number(frame, confidence)
+    if detection is None:
+        return None
+
+    buffer = _crop_full_resolution(image_path, detection['box'])
+    return {'image': buffer, 'confidence': detection['confidence']}
+
+def select_region(
+    frame: dict,
+    confidence: float = DETECTOR_CONFIDENCE,
+    car_model=None,
+    container_model=None,
+    imgsz: int = DETECTOR_INPUT_SIZE,
+    top_k: int = 1,
+    car_imgsz: Optional[int] = None,
+    container_imgsz: Optional[int] = None,
+) -> dict:
+    car_result = _detect_car_number(frame, confidence, car_model, car_imgsz or imgsz)
+    container_result = _detect_container_number(frame, confidence, container_model, container_imgsz or imgsz, top_k)
     
     car_confidence = car_result.get('confidence', 0.0) if car_result else 0.0
     container_confidence = container_result.get('confidence', 0.0) if container_result else 0.0
     
+    # orientation — расположение текста по геометрии рамки (None, если рамки нет)
     if car_confidence >= container_confidence and car_result:
-        return {'detect': 'car', 'image': car_result['image']}
+        return {
+            'detect': 'car',
+            'box': car_result['box'],
+            'raw_box': car_result['raw_box'],
+            'confidence': car_confidence,
+            'orientation': 'horizontal',
+        }
     
     if container_result:
-        return {'detect': 'container', 'image': container_result['image']}
-    
-    return {'detect': 'container', 'image': image_path}
\ No newline at end of file
+        region = {
+            'detect': 'container',
+            'box': container_result['box'],
+            'raw_box': container_result['raw_box'],
+            'confidence': container_confidence,
+            'orientation': container_result['orientation'],
+        }
+        if 'regions' in container_result:
+            region['regions'] = container_result['regions']
+        return region
+    
+    return {'detect': 'container', 'box': None, 'raw_box': None, 'confidence': 0.0, 'orientation': None}
+
+
+def crop_region(
+    image_path: Union[str, Path, BinaryIO, np.ndarray],
+    region: dict,
+    max_decode_pixels: Optional[int] = None,
+) -> dict:
+    orientation = region.get('orientation')
+    if region['box'] is None:
+        return {'detect': region['detect'], 'image': image_path, 'orientation': orientation}
+    buffer = _crop_full_resolution(image_path, region['box'], max_decode_pixels)
+    return {'detect': region['detect'], 'image': buffer, 'orientation': orientation}
+
+
+def crop_regions(
+    image_path: Union[str, Path, BinaryIO, np.ndarray],
+    region: dict,
+    max_decode_pixels: Optional[int] = None,
+) -> dict:
+    """Узкие кропы всех областей региона (region['regions']) за одно декодирование."""
+    regions = region['regions']
+    crops = _crop_boxes(image_path, [item['box'] for item in regions], max_decode_pixels)
+    return {
+        'detect': region['detect'],
+        'images': [np.asarray(crop.convert('RGB')) for crop in crops],
+        'orientations': [item['orientation'] for item in regions],
+    }
+
+
+def image_to_crop(
+    image_path: Union[str, Path, BinaryIO, np.ndarray],
+    confidence: float = DETECTOR_CONFIDENCE,
+    car_model=None,
+    container_model=None,
+    input_size: int = DETECTOR_INPUT_SIZE,
+) -> Optional[Union[str, BinaryIO, np.ndarray]]:
+    # Один уменьшенный кадр на обе модели; в полном разрешении
+    # декодируется только выбранная область
+    frame = load_detection_frame(image_path, input_size)
+    if frame is None:
+        return {'detect': 'container', 'image': image_path, 'orientation': None}
+
+    region = select_region(frame, confidence, car_model, container_model)
+    del frame
+
+    return crop_region(image_path, region)
@@ -1,10 +1,16 @@
-import io
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Union
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
 
 import numpy as np
-from PIL import Image, ImageEnhance, ImageOps, ImageFilter
-from paddleocr import PaddleOCR
+from PIL import Image, ImageDraw, ImageEnhance, ImageOps, ImageFilter
+
+try:
+    from paddleocr import PaddleOCR
+except ImportError:
+    # Без PaddleOCR модуль импортируется (константы, подготовка кропов), но OCR не создаётся
+    PaddleOCR = None
+
+from src.codec import open_image
 
 def _check_gpu_available() -> bool:
     try:
@@ -31,14 +37,111 @@ if USE_GPU:
 else:
     print("ℹ️ GPU не обнаружен или недоступен. Используется CPU.")
 
-ocr_instance = PaddleOCR(
-    lang="en",
-    use_doc_orientation_classify=True,
-    use_doc_unwarping=False,
-    use_angle_cls=True,
+OCR_OPTIONS = {
+    'lang': "en",
+    'use_doc_orientation_classify': True,
+    'use_doc_unwarping': False,
+    'use_angle_cls': True,
+}
+
+# Варианты моделей PaddleOCR: server — точнее, mobile — быстрее на CPU
+OCR_VARIANTS = {
+    'server': {},
+    'mobile': {
+        'text_detection_model_name': 'PP-OCRv5_mobile_det',
+        'text_recognition_model_name': 'PP-OCRv5_mobile_rec',
+    },
+}
+
+MIN_SCORE = 0.6
+
+ocr_instance = None
+
+
+def create_ocr(variant: str = 'server', **options) -> PaddleOCR:
+    if PaddleOCR is None:
+        raise RuntimeError("Для распознавания нужен PaddleOCR: pip install paddleocr")
+    return PaddleOCR(**{**OCR_OPTIONS, **OCR_VARIANTS[variant], **options})
+
+
+def _init_ocr() -> PaddleOCR:
+    global ocr_instance
+    if ocr_instance is None:
+        ocr_instance = create_ocr()
+    return ocr_instance
+
+
+# Канонические размеры входа OCR (ширина, высота; кратны 32). Кроп дополняется
+# до ближайшего подходящего размера (в любой ориентации), поэтому детектор
+# PaddleOCR видит лишь несколько форм входа и не перестраивается под каждую.
+OCR_SHAPE_BUCKETS: Tuple[Tuple[int, int], ...] = (
+    (640, 320),
+    (640, 640),
+    (960, 640),
+    (960, 960),
+    (1280, 640),
+    (1280, 960),
+    (1280, 1280),
+    (1600, 960),
+    (1600, 1600),
 )
 
 
+def _all_bucket_shapes(buckets: Tuple[Tuple[int, int], ...]) -> List[Tuple[int, int]]:
+    shapes = set()
+    for width, height in buckets:
+        shapes.add((width, height))
+        shapes.add((height, width))
+    return sorted(shapes, key=lambda shape: (shape[0] * shape[1], shape))
+
+
+def _fit_to_bucket(
+    img: Image.Image,
+    buckets: Tuple[Tuple[int, int], ...] = OCR_SHAPE_BUCKETS,
+) -> Tuple[Image.Image, float]:
+    """
+    Дополняет изображение до канонического размера (справа и снизу, поэтому
+    координаты рамок не сдвигаются). Если кроп больше самого крупного размера,
+    он сначала уменьшается; возвращается коэффициент масштаба для обратного пересчёта.
+    """
+    shapes = _all_bucket_shapes(buckets)
+    width, height = img.size
+    scale = 1.0
+
+    if not any(shape[0] >= width and shape[1] >= height for shape in shapes):
+        # Больше самого крупного размера: уменьшаем под максимальные стороны
+        max_width = max(shape[0] for shape in shapes)
+        max_height = max(shape[1] for shape in shapes)
+        scale = min(max_width / width, max_height / height)
+        width, height = max(1, int(width * scale)), max(1, int(height * scale))
+        img = img.resize((width, height), Image.LANCZOS)
+
+    # Наименьший подходящий размер; при равной площади — той же ориентации
+    landscape = width >= height
+    bucket = min(
+        (shape for shape in shapes if shape[0] >= width and shape[1] >= height),
+        key=lambda shape: (shape[0] * shape[1], (shape[0] >= shape[1]) != landscape),
+    )
+
+    if img.size == bucket:
+        return img, scale
+
+    # Фон — медиана изображения, чтобы граница дополнения не выглядела как штрих
+    fill = tuple(int(v) for v in np.median(np.asarray(img).reshape(-1, 3), axis=0))
+    padded = Image.new('RGB', bucket, fill)
+    padded.paste(img, (0, 0))
+    return padded, scale
+
+
+def warmup_ocr(ocr: PaddleOCR, buckets: Tuple[Tuple[int, int], ...] = OCR_SHAPE_BUCKETS) -> None:
+    """Прогревает OCR на каждом каноническом размере (детекция и распознавание строки)."""
+    for width, height in _all_bucket_shapes(buckets):
+        img = Image.new('RGB', (width, height), (255, 255, 255))
+        draw = ImageDraw.Draw(img)
+        draw.text((10, 10), "MSKU 807409 4", fill=(0, 0, 0))
+        ocr.predict(input=np.array(img))
+
+
 def _group_texts_by_line(
     texts: List[str],
     scores: List[float],
@@ -140,8 +243,134 @@ def _group_texts_by_line(
 
 
 
-image_quality = 75
-def _enhance_image_for_ocr(img: Image.Image) -> Image.Image:
+def _histogram_percentiles(values: np.ndarray, bins: int, percentiles: Tuple[float, ...]) -> List[float]:
+    """
+    Перцентили (линейная интерполяция, как np.percentile) для целых значений
+    0..bins-1 через гистограмму: без сортировки и без копии массива.
+    """
+    cumulative = np.cumsum(np.bincount(values.ravel(), minlength=bins))
+    total = int(cumulative[-1])
+    result = []
+    for q in percentiles:
+        position = q / 100.0 * (total - 1)
+        lower = int(np.floor(position))
+        upper = min(lower + 1, total - 1)
+        value_lower = int(np.searchsorted(cumulative, lower, side='right'))
+        value_upper = int(np.searchsorted(cumulative, upper, side='right'))
+        result.append(value_lower + (value_upper - value_lower) * (position - lower))
+    return result
+
+
+# Вертикальный номер: не меньше MIN_STACKED_CHARS символов столбиком,
+# высота символа не меньше ширины столбца * STACKED_CHAR_ASPECT
+# (у повёрнутой на 90° строки символы наоборот шире, чем выше)
+MIN_STACKED_CHARS = 4
+STACKED_CHAR_ASPECT = 1.0
+
+# Классификаторы ориентации PaddleOCR выключаются, если ориентация известна заранее
+_KNOWN_ORIENTATION_OPTIONS = {
+    'use_doc_orientation_classify': False,
+    'use_textline_orientation': False,
+}
+
+
+def _ink_mask(gray: np.ndarray) -> np.ndarray:
+    """Маска штрихов: порог Оцу, штрихами считается меньший по площади класс."""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256, dtype=np.float64)
+    weight = np.cumsum(hist)
+    mean = np.cumsum(hist * levels)
+    total, total_mean = weight[-1], mean[-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = (total_mean * weight - mean * total) ** 2 / (weight * (total - weight))
+    threshold = int(np.nanargmax(between))
+    mask = gray > threshold
+    if mask.mean() > 0.5:
+        mask = ~mask
+    return mask
+
+
+def _runs(profile: np.ndarray, threshold: float, min_length: int = 2) -> List[Tuple[int, int]]:
+    """Непрерывные участки профиля проекции выше порога: [(начало, конец), ...]."""
+    active = np.concatenate(([False], profile > threshold, [False]))
+    edges = np.flatnonzero(active[1:] != active[:-1])
+    return [
+        (int(start), int(end))
+        for start, end in zip(edges[::2], edges[1::2])
+        if end - start >= min_length
+    ]
+
+
+def _stacked_layout(img: Image.Image) -> Optional[List[Tuple[int, int, List[Tuple[int, int]]]]]:
+    """
+    Проверка по профилям проекции, что текст стоит столбиком (символы друг под
+    другом, не повёрнуты). Возвращает столбцы [(x1, x2, [(y1, y2), ...]), ...]
+    или None, если это не так — тогда ориентацию определяют классификаторы OCR.
+    """
+    mask = _ink_mask(np.asarray(img.convert('L')))
+    height, width = mask.shape
+
+    columns = []
+    for x1, x2 in _runs(mask.sum(axis=0), height * 0.02):
+        chars = _runs(mask[:, x1:x2].sum(axis=1), 0)
+        if chars:
+            columns.append((x1, x2, chars))
+    if not columns:
+        return None
+
+    # Решение по самому длинному столбцу (это сам номер)
+    x1, x2, chars = max(columns, key=lambda column: len(column[2]))
+    char_heights = [y2 - y1 for y1, y2 in chars]
+    if len(chars) < MIN_STACKED_CHARS:
+        return None
+    if np.median(char_heights) < (x2 - x1) * STACKED_CHAR_ASPECT:
+        return None
+    # Узкие полосы по краям (ореолы, кромки) — не текст
+    return [column for column in columns if column[1] - column[0] >= (x2 - x1) * 0.3]
+
+
+def _columns_to_lines(
+    img: Image.Image,
+    columns: List[Tuple[int, int, List[Tuple[int, int]]]],
+) -> Image.Image:
+    """
+    Собирает вертикальные столбцы в горизонтальные строки: символы каждого
+    столбца ставятся слева направо, столбцы (слева направо) — строками сверху вниз.
+    """
+    char_height = max(y2 - y1 for _, _, chars in columns for y1, y2 in chars)
+    pad = max(2, char_height // 6)
+    gap = max(2, char_height // 3)
+
+    lines = []
+    for x1, x2, chars in columns:
+        pieces = []
+        for y1, y2 in chars:
+            piece = img.crop((x1, max(0, y1 - pad), x2, min(img.height, y2 + pad)))
+            scale = (char_height + 2 * pad) / piece.height
+            pieces.append(piece.resize((max(1, int(piece.width * scale)), char_height + 2 * pad), Image.LANCZOS))
+        lines.append(pieces)
+
+    fill = tuple(int(v) for v in np.median(np.asarray(img).reshape(-1, 3), axis=0))
+    line_height = char_height + 2 * pad
+    width = max(sum(piece.width for piece in pieces) + gap * (len(pieces) + 1) for pieces in lines)
+    height = line_height * len(lines) + gap * (len(lines) + 1)
+    result = Image.new('RGB', (width, height), fill)
+
+    y = gap
+    for pieces in lines:
+        x = gap
+        for piece in pieces:
+            result.paste(piece, (x, y))
+            x += piece.width + gap
+        y += line_height + gap
+    return result
+
+
+# Сила улучшения изображения перед OCR (0–100)
+ENHANCE_STRENGTH = 75
+
+
+def _enhance_image_for_ocr(img: Image.Image, strength: int = ENHANCE_STRENGTH) -> Image.Image:
     """
     Улучшает изображение для лучшего распознавания текста
     (особенно для чёрных цифр внутри цветных/светлых квадратов и на
@@ -170,8 +399,8 @@ def _enhance_image_for_ocr(img: Image.Image) -> Image.Image:
         img_gray = img_gray.resize(new_size, Image.LANCZOS)
 
     # Нормализуем "силу" обработки от 0 до 1,
-    # чтобы можно было управлять качеством через image_quality (0–100).
-    q = max(0.0, min(1.0, float(image_quality) / 100.0))
+    # чтобы можно было управлять качеством через strength (0–100).
+    q = max(0.0, min(1.0, float(strength) / 100.0))
 
     # Локальное выравнивание яркости: убираем медленно меняющийся фон,
     # усиливаем структуры (штрихи цифр), но оставляем естественные полутона.
@@ -182,17 +411,25 @@ def _enhance_image_for_ocr(img: Image.Image) -> Image.Image:
 
     # 2) вычитаем фон и делаем более аккуратную нормализацию контраста
     # используем перцентили для более мягкого растяжения гистограммы
-    arr_gray = np.array(img_gray).astype(np.int16)
-    arr_blur = np.array(blurred).astype(np.int16)
-    detail = arr_gray - arr_blur
-    
+    # Разность хранится со сдвигом +255 (0..510) в одном int16-массиве,
+    # без промежуточных float64-копий размером с изображение
+    detail = np.asarray(img_gray, dtype=np.int16) + 255
+    detail -= np.asarray(blurred, dtype=np.uint8)
+    del blurred
+
     # Растягиваем гистограмму по перцентилям для более мягкой нормализации
-    p2, p98 = np.percentile(detail, (2, 98))
+    p2, p98 = _histogram_percentiles(detail, 511, (2, 98))
+    p2 -= 255
+    p98 -= 255
+    values = np.arange(-255, 256, dtype=np.float64)
     if p98 > p2:
-        detail = (detail - p2) * (255.0 / (p98 - p2))
-    detail = np.clip(detail, 0, 255).astype(np.uint8)
+        values = (values - p2) * (255.0 / (p98 - p2))
+    # Таблица на 511 значений вместо поэлементной арифметики по всему кадру
+    lut = np.clip(values, 0, 255).astype(np.uint8)
+    detail = lut[detail]
 
     img_detail = Image.fromarray(detail)
+    del detail
 
     # 3) Автоконтраст + усиление контраста: цифры становятся более чёткими.
     # cutoff делаем меньше при большем качестве (меньше "обрезаем" тени/света).
@@ -221,75 +458,155 @@ def _enhance_image_for_ocr(img: Image.Image) -> Image.Image:
     return img_final
 
 
-def image_to_text(
-    image_path: Union[str, Path, io.BytesIO],
-    min_score: float = 0.6,
-    group_by_line: bool = True,
-    line_threshold: float = 0.5,
-    save_to_output: bool = False,
-    output_name: str = None,
-) -> Dict[str, List]:
-    if isinstance(image_path, io.BytesIO):
-        image_path.seek(0)
-        img = Image.open(image_path)
-    else:
-        img = Image.open(image_path)
-    
-    img = _enhance_image_for_ocr(img)
-    
-    if save_to_output:
-        # Сохраняем обработанное изображение в output
-        output_dir = Path(__file__).resolve().parent.parent / "output"
-        output_dir.mkdir(exist_ok=True)
-        
-        if isinstance(image_path, io.BytesIO):
-            base_name = output_name or "enhanced_image"
+def _open_for_ocr(image_path: Union[str, Path, BinaryIO, np.ndarray]) -> Image.Image:
+    # JPEG-кропы декодируются выбранным кодеком (src.codec)
+    return open_image(image_path)
+
+
+def _prepare_for_ocr(
+    img: Image.Image,
+    orientation: Optional[str],
+    shape_buckets: Optional[Tuple[Tuple[int, int], ...]],
+) -> Tuple[np.ndarray, float, Optional[str]]:
+    """Вход PaddleOCR: массив, масштаб рамок и ориентация (None — неизвестна)."""
+    # Ориентация по геометрии рамки детектора: горизонтальный текст читается
+    # как есть, вертикальный проверяется по профилям проекции и читается по столбцам.
+    # Классификаторы ориентации PaddleOCR работают только в неясных случаях.
+    if orientation == 'vertical':
+        columns = _stacked_layout(img)
+        if columns is None:
+            orientation = None
         else:
-            base_name = output_name or Path(image_path).stem
-        
-        output_path = output_dir / f"{base_name}_enhanced.jpg"
-        img.save(output_path, "JPEG", quality=95)
-    
+            img = _columns_to_lines(img, columns)
+
+    bucket_scale = 1.0
+    if shape_buckets:
+        img, bucket_scale = _fit_to_bucket(img, shape_buckets)
+
     img_array = np.array(img)
-    results = ocr_instance.predict(input=img_array)
+    del img
+    return img_array, bucket_scale, orientation
 
+
+def _collect_results(
+    res,
+    bucket_scale: float,
+    min_score: float,
+    group_by_line: bool,
+    line_threshold: float,
+) -> Tuple[List[str], List[float]]:
     rec_texts: List[str] = []
     rec_scores: List[float] = []
     rec_bboxes: List[List[List[int]]] = []
 
-    if results:
-        for res in results:
-            if isinstance(res, dict):
-                texts = res.get("rec_texts", [])
-                scores = res.get("rec_scores", [])
-                bboxes = res.get("dt_polys", []) or res.get("boxes", [])
-            else:
-                texts = getattr(res, "rec_texts", None) or []
-                scores = getattr(res, "rec_scores", None) or []
-                bboxes = getattr(res, "dt_polys", None) or getattr(res, "boxes", None) or []
-
-            if texts:
-                for i, text in enumerate(texts):
-                    if not text:
-                        continue
-                    
-                    score = 0.0
-                    if scores and i < len(scores):
-                        score = scores[i]
-                    
-                    bbox = []
-                    if bboxes and i < len(bboxes):
-                        bbox = bboxes[i]
-                    
-                    if score >= min_score:
-                        rec_texts.append(text)
-                        rec_scores.append(score)
-                        rec_bboxes.append(bbox)
+    if isinstance(res, dict):
+        texts = res.get("rec_texts", [])
+        scores = res.get("rec_scores", [])
+        bboxes = res.get("dt_polys", []) or res.get("boxes", [])
+    else:
+        texts = getattr(res, "rec_texts", None) or []
+        scores = getattr(res, "rec_scores", None) or []
+        bboxes = getattr(res, "dt_polys", None) or getattr(res, "boxes", None) or []
+
+    if texts:
+        for i, text in enumerate(texts):
+            if not text:
+                continue
+            
+            score = 0.0
+            if scores and i < len(scores):
+                score = scores[i]
+            
+            bbox = []
+            if bboxes and i < len(bboxes):
+                bbox = bboxes[i]
+                if bucket_scale != 1.0:
+                    bbox = np.asarray(bbox, dtype=np.float32) / bucket_scale
+            
+            if score >= min_score:
+                rec_texts.append(text)
+                rec_scores.append(score)
+                rec_bboxes.append(bbox)
 
     if group_by_line and rec_texts and rec_bboxes:
         rec_texts, rec_scores = _group_texts_by_line(
             rec_texts, rec_scores, rec_bboxes, line_threshold
         )
+    return rec_texts, rec_scores
+
+
+def _enhance_input(
+    image: Union[str, Path, BinaryIO, np.ndarray, Image.Image],
+    enhance: bool,
+    enhance_strength: int,
+    capture: Optional[Dict],
+) -> Image.Image:
+    img = image if isinstance(image, Image.Image) else _open_for_ocr(image)
+    if enhance:
+        img = _enhance_image_for_ocr(img, enhance_strength)
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+    if capture is not None:
+        capture.setdefault('enhanced', []).append(img)
+    return img
+
+
+def prepare_ocr_inputs(
+    images: List[Union[str, Path, BinaryIO, np.ndarray, Image.Image]],
+    orientations: Optional[List[Optional[str]]] = None,
+    shape_buckets: Optional[Tuple[Tuple[int, int], ...]] = None,
+    capture: Optional[Dict] = None,
+    enhance: bool = True,
+    enhance_strength: int = ENHANCE_STRENGTH,
+) -> Dict:
+    """
+    Всё, что до вызова модели: открытие, улучшение, ориентация и канонический
+    размер. Не трогает PaddleOCR, поэтому может идти параллельно с распознаванием.
+    """
+    if orientations is None:
+        orientations = [None] * len(images)
+
+    inputs = []
+    scales = []
+    known = True
+    for image, orientation in zip(images, orientations):
+        img = _enhance_input(image, enhance, enhance_strength, capture)
+        img_array, bucket_scale, orientation = _prepare_for_ocr(img, orientation, shape_buckets)
+        inputs.append(img_array)
+        scales.append(bucket_scale)
+        known = known and orientation is not None
+
+    return {'inputs': inputs, 'scales': scales, 'known_orientation': known}
+
+
+def read_ocr_inputs(
+    prepared: Dict,
+    ocr: Optional[PaddleOCR] = None,
+    min_score: float = MIN_SCORE,
+    group_by_line: bool = True,
+    line_threshold: float = 0.5,
+) -> Dict[str, List]:
+    """Один пакетный вызов PaddleOCR по результату prepare_ocr_inputs."""
+    if ocr is None:
+        ocr = _init_ocr()
+
+    # Параметры вызова общие на пакет: классификаторы выключаются, только если
+    # ориентация известна для всех входов
+    predict_options = _KNOWN_ORIENTATION_OPTIONS if prepared['known_orientation'] else {}
+    inputs = prepared['inputs']
+    if len(inputs) == 1:
+        results = list(ocr.predict(input=inputs[0], **predict_options) or [])
+    else:
+        results = list(ocr.predict(input=inputs, **predict_options) or []) if inputs else []
+
+    regions: List[List[str]] = []
+    rec_texts: List[str] = []
+    rec_scores: List[float] = []
+    for res, bucket_scale in zip(results, prepared['scales']):
+        texts, scores = _collect_results(res, bucket_scale, min_score, group_by_line, line_threshold)
+        regions.append(texts)
+        rec_texts.extend(texts)
+        rec_scores.extend(scores)
 
     return {
         "data": {
@@ -297,5 +614,42 @@ def image_to_text(
             "rec_scores": rec_scores,
         },
         "texts": rec_texts,
+        "regions": regions,
     }
 
+
+def image_to_text(
+    image_path: Union[str, Path, BinaryIO, np.ndarray],
+    min_score: float = MIN_SCORE,
+    group_by_line: bool = True,
+    line_threshold: float = 0.5,
+    save_to_output: bool = False,
+    output_name: str = None,
+    ocr: Optional[PaddleOCR] = None,
+    shape_buckets: Optional[Tuple[Tuple[int, int], ...]] = None,
+    orientation: Optional[str] = None,
+    capture: Optional[Dict] = None,
+    enhance: bool = True,
+    enhance_strength: int = ENHANCE_STRENGTH,
+) -> Dict[str, List]:
+    img = _enhance_input(image_path, enhance, enhance_strength, capture)
+    
+    if save_to_output:
+        # Сохраняем обработанное изображение в output
+        output_dir = Path(__file__).resolve().parent.parent / "output"
+        output_dir.mkdir(exist_ok=True)
+        
+        if hasattr(image_path, 'read') or isinstance(image_path, np.ndarray):
+            base_name = output_name or "enhanced_image"
+        else:
+            base_name = output_name or Path(image_path).stem
+        
+        output_path = output_dir / f"{base_name}_enhanced.jpg"
+        img.save(output_path, "JPEG", quality=95)
+    
+    prepared = prepare_ocr_inputs([img], [orientation], shape_buckets, enhance=False)
+    del img
+    result = read_ocr_inputs(prepared, ocr, min_score, group_by_line, line_threshold)
+    del prepared
+    result.pop("regions")
+    return result
@@ -0,0 +1,158 @@
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import get_config
+from src.image_to_crop import (
+    CAR_MODEL_DEFAULT_PATH,
+    CONTAINER_MODEL_DEFAULT_PATH,
+    _detect_car_number,
+    _detect_container_number,
+    load_detection_frame,
+    load_yolo_model,
+    warmup_yolo,
+)
+
+
+# Перебираемые размеры входа: кратны шагу сети YOLO (32)
+TUNE_SIZES = (320, 384, 448, 512, 576, 640, 768, 896, 1024)
+# Допустимая потеря полноты относительно лучшего размера (абсолютная доля)
+RECALL_TOLERANCE = 0.01
+
+# Детектор → поле манифеста, по которому снимок считается содержащим объект
+DETECTOR_FIELDS = {'car': 'car', 'container': 'number'}
+CONFIG_FIELDS = {'car': 'car_input_size', 'container': 'container_input_size'}
+
+
+def _detect(kind: str, frame: dict, confidence: float, model, size: int) -> Optional[dict]:
+    if kind == 'car':
+        return _detect_car_number(frame, confidence, model, size)
+    return _detect_container_number(frame, confidence, model, size)
+
+
+def _sweep(
+    kind: str,
+    model,
+    images: List[Path],
+    sizes: Tuple[int, ...],
+    confidence: float,
+    repeat: int,
+) -> Dict[int, Dict]:
+    results = {}
+    for size in sizes:
+        found = 0
+        durations = []
+        for image in images:
+            frame = load_detection_frame(image, size)
+            if frame is None:
+                continue
+            best = float('inf')
+            detection = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                detection = _detect(kind, frame, confidence, model, size)
+                best = min(best, time.perf_counter() - start)
+            durations.append(best)
+            if detection is not None:
+                found += 1
+        results[size] = {
+            'found': found,
+            'recall': found / len(images) if images else 0.0,
+            'mean_ms': float(np.mean(durations)) * 1000 if durations else None,
+            'p95_ms': float(np.percentile(durations, 95)) * 1000 if durations else None,
+        }
+    return results
+
+
+def tune_imgsz(
+    entries: List[Dict[str, str]],
+    profile: Optional[str] = None,
+    sizes: Tuple[int, ...] = TUNE_SIZES,
+    tolerance: float = RECALL_TOLERANCE,
+    repeat: int = 1,
+) -> Dict:
+    """
+    Подбор imgsz каждого детектора по размеченному набору (манифест src.evaluate):
+    для всех размеров считаются полнота (доля снимков с номером, где детектор
+    нашёл рамку) и время детектора, выбирается наименьший размер, полнота
+    которого не ниже лучшей более чем на tolerance. Экономия — относительно
+    текущего размера профиля.
+    """
+    if repeat < 1:
+        raise ValueError(f"repeat должен быть не меньше 1: {repeat}")
+    config = get_config(profile)
+    model_paths = {
+        'car': (config.car_model_path, CAR_MODEL_DEFAULT_PATH),
+        'container': (config.container_model_path, CONTAINER_MODEL_DEFAULT_PATH),
+    }
+
+    report = {'profile': profile, 'tolerance': tolerance, 'detectors': {}}
+    for kind, field in DETECTOR_FIELDS.items():
+        images = [Path(entry['image']) for entry in entries if field in entry and Path(entry['image']).exists()]
+        current = getattr(config, CONFIG_FIELDS[kind]) or config.detector_input_size
+        result = {'images': len(images), 'current': current, 'chosen': None}
+        report['detectors'][kind] = result
+        if not images:
+            continue
+        model = load_yolo_model(*model_paths[kind])
+        if model is None:
+            result['error'] = "Модель не загружена"
+            continue
+
+        swept = tuple(sorted(set(sizes) | {current}))
+        warmup_yolo(model, swept, config.confidence)
+        stats = _sweep(kind, model, images, swept, config.confidence, repeat)
+        result['sizes'] = stats
+        # Размеры, на которых не прочитался ни один снимок, не замерены и не выбираются
+        measured = [size for size in swept if stats[size]['mean_ms'] is not None]
+        if not measured:
+            result['error'] = "Ни один снимок не прочитан"
+            continue
+        reference = max(stats[size]['recall'] for size in measured)
+        chosen = next(size for size in measured if stats[size]['recall'] >= reference - tolerance)
+
+        current_ms = stats[current]['mean_ms']
+        saving_ms = current_ms - stats[chosen]['mean_ms'] if current_ms is not None else None
+        result.update({
+            'reference_recall': reference,
+            'chosen': chosen,
+            'saving_ms': saving_ms,
+            'saving_ratio': saving_ms / current_ms if current_ms else None,
+        })
+    return report
+
+
+def chosen_overrides(report: Dict) -> Dict[str, int]:
+    """Параметры профиля для файла развёртывания по результатам подбора."""
+    return {
+        CONFIG_FIELDS[kind]: result['chosen']
+        for kind, result in report['detectors'].items()
+        if result['chosen'] is not None
+    }
+
+
+def print_report(report: Dict) -> None:
+    print(f"Профиль: {report['profile'] or 'по умолчанию'}, допуск полноты: {report['tolerance']}")
+    for kind, result in report['detectors'].items():
+        print(f"\nДетектор {kind}: снимков {result['images']}, текущий imgsz {result['current']}")
+        if result.get('error'):
+            print(f"  ⚠️ {result['error']}")
+        if 'sizes' not in result:
+            continue
+        for size, stats in result['sizes'].items():
+            marks = ' ← выбран' if size == result['chosen'] else ''
+            marks += ' (текущий)' if size == result['current'] else ''
+            timing = (
+                f"{stats['mean_ms']:.1f} мс / p95 {stats['p95_ms']:.1f} мс"
+                if stats['mean_ms'] is not None else "не замерен"
+            )
+            print(f"  {size:>5}: полнота {stats['recall'] * 100:5.1f}% ({stats['found']}/{result['images']}), {timing}{marks}")
+        if result['chosen'] is None:
+            continue
+        saving = (
+            f"экономия {result['saving_ms']:.1f} мс на кадр ({result['saving_ratio'] * 100:.0f}%)"
+            if result['saving_ratio'] is not None else "экономия не оценена"
+        )
+        print(f"  Выбран {result['chosen']}: {saving} при лучшей полноте {result['reference_recall'] * 100:.1f}%")
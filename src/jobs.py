@@ -0,0 +1,422 @@
+import http.client
+import ipaddress
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import ssl
+import threading
+import time
+import uuid
+from pathlib import Path
+from queue import Queue
+from typing import BinaryIO, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+
+_base_dir = Path(__file__).resolve().parent.parent
+
+JOBS_DIR = Path(os.environ.get('OCR_JOBS_DIR', _base_dir / "jobs"))
+JOBS_WORKERS = int(os.environ.get('OCR_JOBS_WORKERS', 1))
+JOBS_MAX_ATTEMPTS = int(os.environ.get('OCR_JOBS_MAX_ATTEMPTS', 3))
+JOBS_TTL_SECONDS = int(float(os.environ.get('OCR_JOBS_TTL_HOURS', 24)) * 3600)
+CALLBACK_TIMEOUT_SECONDS = 10
+CALLBACK_ATTEMPTS = 3
+# Хосты, на которые разрешены обратные вызовы: "erp.example.com,.tezport.local"
+# (с точкой — домен и поддомены). Пусто — любой хост с публичным адресом
+CALLBACK_HOSTS = [host.strip().lower() for host in os.environ.get('OCR_CALLBACK_HOSTS', '').split(',') if host.strip()]
+# Разрешить обратные вызовы во внутреннюю сеть без списка хостов (только для закрытых стендов)
+CALLBACK_ALLOW_PRIVATE = os.environ.get('OCR_CALLBACK_ALLOW_PRIVATE', '0') == '1'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    image_path TEXT NOT NULL,
+    callback_url TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    callback_status TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    available_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_available ON jobs (status, available_at);
+"""
+
+
+class JobQueue:
+    """
+    Надёжная локальная очередь задач на SQLite: изображения лежат файлами
+    в storage_dir, состояние задач — в базе. Переживает перезапуск процесса.
+
+    Статусы: queued → running → done | failed. Задача с ошибкой
+    возвращается в очередь с экспоненциальной задержкой, пока не исчерпает
+    max_attempts. Задачи старше ttl_seconds удаляются вместе с файлами.
+    """
+
+    def __init__(
+        self,
+        jobs_dir: Path = JOBS_DIR,
+        max_attempts: int = JOBS_MAX_ATTEMPTS,
+        ttl_seconds: int = JOBS_TTL_SECONDS,
+    ):
+        self.jobs_dir = Path(jobs_dir)
+        self.storage_dir = self.jobs_dir / "images"
+        self.storage_dir.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max_attempts
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._available = threading.Event()
+        self._conn = sqlite3.connect(str(self.jobs_dir / "jobs.sqlite3"), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            # Задачи, прерванные падением процесса, возвращаются в очередь
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running'",
+                (time.time(),),
+            )
+
+    def submit(self, image: BinaryIO, callback_url: Optional[str] = None) -> str:
+        job_id = uuid.uuid4().hex
+        image_path = self.storage_dir / job_id
+
+        image.seek(0)
+        with image_path.open('wb') as f:
+            shutil.copyfileobj(image, f)
+
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, image_path, callback_url, created_at, updated_at, available_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, str(image_path), callback_url, now, now, now),
+            )
+        self.wake()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return _row_to_job(row)
+
+    def claim(self) -> Optional[Dict]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' AND available_at <= ? "
+                "ORDER BY available_at, created_at LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (now, row['id']),
+            )
+        job = _row_to_job(row)
+        job['attempts'] += 1
+        job['status'] = 'running'
+        return job
+
+    def complete(self, job_id: str, result: Dict) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, updated_at = ? WHERE id = ?",
+                (json.dumps(result, ensure_ascii=False), time.time(), job_id),
+            )
+        self._remove_image(job_id)
+
+    def fail(self, job_id: str, error: str) -> str:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return 'failed'
+            if row['attempts'] < self.max_attempts:
+                status = 'queued'
+                available_at = now + 2 ** row['attempts']
+            else:
+                status = 'failed'
+                available_at = now
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ?, available_at = ? WHERE id = ?",
+                (status, error, now, available_at, job_id),
+            )
+        if status == 'failed':
+            self._remove_image(job_id)
+        return status
+
+    def set_callback_status(self, job_id: str, callback_status: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET callback_status = ? WHERE id = ?",
+                (callback_status, job_id),
+            )
+
+    def pending_callbacks(self) -> List[str]:
+        """Завершённые задачи, обратный вызов которых ещё не доставлялся (например, до перезапуска)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('done', 'failed') "
+                "AND callback_url IS NOT NULL AND callback_status IS NULL",
+            ).fetchall()
+        return [row['id'] for row in rows]
+
+    def expire(self) -> int:
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE created_at < ? AND status != 'running'",
+                (cutoff,),
+            ).fetchall()
+            self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(row['id'],) for row in rows])
+        for row in rows:
+            self._remove_image(row['id'])
+        return len(rows)
+
+    def depth(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()
+        return row[0]
+
+    def wake(self) -> None:
+        self._available.set()
+
+    def wait(self, timeout: float) -> None:
+        self._available.wait(timeout)
+        self._available.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _remove_image(self, job_id: str) -> None:
+        try:
+            (self.storage_dir / job_id).unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _row_to_job(row: sqlite3.Row) -> Dict:
+    return {
+        'id': row['id'],
+        'status': row['status'],
+        'image_path': row['image_path'],
+        'callback_url': row['callback_url'],
+        'attempts': row['attempts'],
+        'result': json.loads(row['result']) if row['result'] else None,
+        'error': row['error'],
+        'callback_status': row['callback_status'],
+        'created_at': row['created_at'],
+        'updated_at': row['updated_at'],
+    }
+
+
+def public_job(job: Dict) -> Dict:
+    return {
+        'id': job['id'],
+        'status': job['status'],
+        'result': job['result'],
+        'error': job['error'],
+        'attempts': job['attempts'],
+        'callback_status': job['callback_status'],
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at'],
+    }
+
+
+def _host_allowed(host: str) -> bool:
+    return any(
+        host == allowed or (allowed.startswith('.') and host.endswith(allowed))
+        for allowed in CALLBACK_HOSTS
+    )
+
+
+def validate_callback_url(url: str) -> str:
+    """
+    Проверка адреса обратного вызова: только http/https, хост из CALLBACK_HOSTS
+    или, без списка, хост, все адреса которого публичные. ValueError при отказе.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        raise ValueError("callback_url: допустимы только http и https")
+    host = (parts.hostname or '').lower()
+    if not host:
+        raise ValueError("callback_url: не указан хост")
+    if CALLBACK_HOSTS:
+        if not _host_allowed(host):
+            raise ValueError(f"callback_url: хост {host} не в списке разрешённых")
+        return url
+    if CALLBACK_ALLOW_PRIVATE:
+        return url
+    try:
+        addresses = _resolve(host, _port(parts))
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"callback_url: хост {host} не найден")
+    _check_public(addresses)
+    return url
+
+
+def _port(parts) -> int:
+    return parts.port or (443 if parts.scheme == 'https' else 80)
+
+
+def _resolve(host: str, port: int) -> List[str]:
+    return [info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)]
+
+
+def _check_public(addresses: List[str]) -> None:
+    if CALLBACK_HOSTS or CALLBACK_ALLOW_PRIVATE:
+        return
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split('%', 1)[0])
+        if not ip.is_global:
+            raise ValueError(f"callback_url: адрес {ip} во внутренней сети")
+
+
+class _PinnedHTTPConnection(http.client.HTTPConnection):
+    # Подключение к уже проверенному адресу; Host остаётся исходным
+    def __init__(self, host: str, port: int, address: str, timeout: float):
+        super().__init__(host, port, timeout=timeout)
+        self.address = address
+
+    def connect(self):
+        self.sock = socket.create_connection((self.address, self.port), self.timeout)
+
+
+class _PinnedHTTPSConnection(http.client.HTTPSConnection):
+    # Сертификат и SNI проверяются по имени хоста, подключение — к проверенному адресу
+    def __init__(self, host: str, port: int, address: str, timeout: float):
+        super().__init__(host, port, timeout=timeout, context=ssl.create_default_context())
+        self.address = address
+
+    def connect(self):
+        sock = socket.create_connection((self.address, self.port), self.timeout)
+        self.sock = self._context.wrap_socket(sock, server_hostname=self.host)
+
+
+def _post_callback(url: str, body: bytes) -> int:
+    """
+    POST на адрес обратного вызова. Адрес хоста разрешается один раз и проверяется
+    здесь же, подключение идёт именно к нему: повторное разрешение при подключении
+    (DNS rebinding) не может подменить его внутренним. Перенаправления не выполняются.
+    """
+    parts = urlsplit(url)
+    port = _port(parts)
+    address = _resolve(parts.hostname, port)[0]
+    _check_public([address])
+    connection_class = _PinnedHTTPSConnection if parts.scheme == 'https' else _PinnedHTTPConnection
+    connection = connection_class(parts.hostname, port, address, CALLBACK_TIMEOUT_SECONDS)
+    path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+    try:
+        connection.request('POST', path, body=body, headers={'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        response.read()
+    finally:
+        connection.close()
+    if response.status >= 300:
+        raise RuntimeError(f"HTTP {response.status}")
+    return response.status
+
+
+def _notify_callback(job: Dict) -> str:
+    try:
+        # Повторная проверка при доставке: список хостов мог смениться после приёма задачи
+        validate_callback_url(job['callback_url'])
+    except ValueError as e:
+        return f"rejected {e}"
+    body = json.dumps(public_job(job), ensure_ascii=False).encode('utf-8')
+    last_error = ''
+    for attempt in range(CALLBACK_ATTEMPTS):
+        try:
+            return f"delivered {_post_callback(job['callback_url'], body)}"
+        except ValueError as e:
+            return f"rejected {e}"
+        except Exception as e:
+            last_error = f"{type(e).__name__}: {e}"
+            if attempt + 1 < CALLBACK_ATTEMPTS:
+                time.sleep(2 ** attempt)
+    return f"failed {last_error}"
+
+
+class JobWorkers:
+    """
+    Потоки, которые разбирают очередь и прогоняют задачи через движок.
+    Обратные вызовы доставляет отдельный поток: недоступный адрес клиента
+    не задерживает распознавание следующих задач.
+    """
+
+    def __init__(self, queue: JobQueue, recognize: Callable[[str], Dict], workers: int = JOBS_WORKERS):
+        self.queue = queue
+        self.recognize = recognize
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = [
+            threading.Thread(target=self._run, name=f'ocr-jobs-{i}', daemon=True)
+            for i in range(max(1, workers))
+        ]
+        self._callbacks: Queue = Queue()
+        self._callback_thread = threading.Thread(target=self._deliver, name='ocr-jobs-callbacks', daemon=True)
+        self._last_expire = 0.0
+
+    def start(self) -> None:
+        for job_id in self.queue.pending_callbacks():
+            self._callbacks.put(job_id)
+        self._callback_thread.start()
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 30) -> bool:
+        """
+        Останавливает потоки; False — кто-то не успел завершиться за timeout
+        (например, задача ещё в движке), и очередь закрывать нельзя.
+        """
+        self._stop.set()
+        self.queue.wake()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        # Недоставленные вызовы остаются без callback_status и повторятся после запуска
+        self._callbacks.put(None)
+        self._callback_thread.join(timeout=timeout)
+        threads = self._threads + [self._callback_thread]
+        return not any(thread.is_alive() for thread in threads)
+
+    def _deliver(self) -> None:
+        while True:
+            job_id = self._callbacks.get()
+            if job_id is None or self._stop.is_set():
+                return
+            finished = self.queue.get(job_id)
+            if finished is not None and finished['callback_url']:
+                self.queue.set_callback_status(job_id, _notify_callback(finished))
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            now = time.time()
+            if now - self._last_expire > 60:
+                self._last_expire = now
+                self.queue.expire()
+
+            job = self.queue.claim()
+            if job is None:
+                self.queue.wait(timeout=1.0)
+                continue
+
+            try:
+                result = self.recognize(job['image_path'])
+            except Exception as e:
+                status = self.queue.fail(job['id'], f"{type(e).__name__}: {e}")
+                if status != 'failed':
+                    continue
+            else:
+                self.queue.complete(job['id'], result)
+
+            if job['callback_url']:
+                self._callbacks.put(job['id'])
@@ -0,0 +1,91 @@
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+MEMORY_PROFILE_ENABLED = os.environ.get('OCR_MEMORY_PROFILE', '0') == '1'
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MemoryProfiler:
+    """
+    Пиковая память по этапам конвейера: tracemalloc (Python и numpy-буферы)
+    плюс RSS процесса после этапа (учитывает память Pillow/Paddle/torch вне tracemalloc).
+
+    tracemalloc общий на процесс, поэтому пики точны, только пока этапы
+    не выполняются параллельно: для замеров запускайте запросы по одному
+    (engine.analyze), в конвейере движка этапы разных запросов перекрываются.
+    Включается OCR_MEMORY_PROFILE=1; выключенный профайлер ничего не стоит.
+    """
+
+    def __init__(self, enabled: bool = MEMORY_PROFILE_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, float]] = {}
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            yield
+            return
+
+        current_before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            self._record(name, max(0, peak - current_before), _rss_bytes())
+
+    def _record(self, name: str, peak_bytes: int, rss_bytes: Optional[int]) -> None:
+        with self._lock:
+            stats = self._stages.setdefault(name, {
+                'count': 0,
+                'peak_bytes_max': 0,
+                'peak_bytes_sum': 0,
+                'rss_bytes_max': 0,
+            })
+            stats['count'] += 1
+            stats['peak_bytes_max'] = max(stats['peak_bytes_max'], peak_bytes)
+            stats['peak_bytes_sum'] += peak_bytes
+            if rss_bytes is not None:
+                stats['rss_bytes_max'] = max(stats['rss_bytes_max'], rss_bytes)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stages = {
+                name: {
+                    'count': stats['count'],
+                    'peak_bytes_max': stats['peak_bytes_max'],
+                    'peak_bytes_mean': stats['peak_bytes_sum'] / stats['count'] if stats['count'] else 0,
+                    'rss_bytes_max': stats['rss_bytes_max'],
+                }
+                for name, stats in self._stages.items()
+            }
+        current, _ = tracemalloc.get_traced_memory() if self.enabled else (0, 0)
+        return {
+            'enabled': self.enabled,
+            'rss_bytes': _rss_bytes(),
+            'traced_bytes': current,
+            'stages': stages,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+
+
+memory_profiler = MemoryProfiler()
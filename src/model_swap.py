@@ -0,0 +1,341 @@
+import io
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.artifacts import snapshot_image
+from src.canary import service_seconds
+from src.image_to_crop import CAR_MODEL_DEFAULT_PATH, CONTAINER_MODEL_DEFAULT_PATH, load_yolo_model, warmup_yolo
+from src.image_to_text import create_ocr, warmup_ocr
+
+
+# Доля запросов для теневого прогона новой модели и ёмкость его очереди
+SHADOW_RATE = float(os.environ.get('OCR_SHADOW_RATE', 0.05))
+SHADOW_QUEUE_SIZE = 8
+# Интервал проверки файлов весов YOLO, сек (0 — без наблюдения)
+MODEL_WATCH_SECONDS = float(os.environ.get('OCR_MODEL_WATCH_SECONDS', 0))
+
+# Пробные прогоны новой модели перед подменой: реальный снимок плюс прогрев размеров
+WARMUP_SAMPLE = Path(__file__).resolve().parent / "MSKU8074094.jpg"
+WARMUP_RUNS = 3
+
+MODEL_KINDS = ('car', 'container', 'ocr')
+_MISMATCH_EXAMPLES = 20
+
+
+def _reopen(image):
+    # Снимок запроса: байты снова оборачиваются в поток для каждого прогона
+    if isinstance(image, bytes):
+        return io.BytesIO(image)
+    return image
+
+
+class ShadowRun:
+    """
+    Теневой прогон: выборка боевых запросов повторно распознаётся текущими
+    и новыми моделями в фоновом потоке, ответы и задержки сравниваются.
+    Клиенту всегда уходит результат текущей модели.
+
+    Оба прогона идут через общий конвейер с низким приоритетом и без памяти
+    областей камеры: боевые запросы их обгоняют, а задержка считается по времени
+    этапов без ожидания в очередях. При переполнении очереди запрос пропускается.
+    """
+
+    def __init__(self, baseline, candidate, rate: float = SHADOW_RATE, queue_size: int = SHADOW_QUEUE_SIZE):
+        self.baseline = baseline
+        self.candidate = candidate
+        self.rate = rate
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._stats = {'runs': 0, 'matches': 0, 'mismatches': 0, 'errors': 0, 'dropped': 0}
+        self._latency: Dict[str, List[float]] = {'baseline': [], 'candidate': []}
+        self._mismatches: deque = deque(maxlen=_MISMATCH_EXAMPLES)
+        self._thread = threading.Thread(target=self._run, name='ocr-shadow', daemon=True)
+        self._thread.start()
+
+    def maybe_submit(self, image, camera_id: Optional[str] = None) -> bool:
+        if random.random() >= self.rate:
+            return False
+        try:
+            self._queue.put_nowait((snapshot_image(image), camera_id))
+        except queue.Full:
+            with self._lock:
+                self._stats['dropped'] += 1
+            return False
+        return True
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            image, camera_id = item
+            try:
+                baseline = self.baseline.submit(_reopen(image), priority='low', synthetic=True).result()
+                candidate = self.candidate.submit(_reopen(image), priority='low', synthetic=True).result()
+            except Exception as e:
+                with self._lock:
+                    self._stats['errors'] += 1
+                print(f"⚠️ Ошибка теневого прогона: {e}")
+                continue
+            self._record(baseline, candidate, camera_id)
+
+    def _record(self, baseline: Dict, candidate: Dict, camera_id: Optional[str]) -> None:
+        match = baseline['info'] == candidate['info'] and baseline['detect'] == candidate['detect']
+        with self._lock:
+            self._stats['runs'] += 1
+            self._stats['matches' if match else 'mismatches'] += 1
+            self._latency['baseline'].append(service_seconds(baseline['timings']))
+            self._latency['candidate'].append(service_seconds(candidate['timings']))
+            if not match:
+                self._mismatches.append({
+                    'camera_id': camera_id,
+                    'baseline': {'detect': baseline['detect'], 'texts': baseline['texts'], 'info': baseline['info']},
+                    'candidate': {'detect': candidate['detect'], 'texts': candidate['texts'], 'info': candidate['info']},
+                })
+
+    def stats(self) -> Dict:
+        with self._lock:
+            latency = {
+                name: {
+                    'mean': float(np.mean(values)) if values else None,
+                    'p95': float(np.percentile(values, 95)) if values else None,
+                }
+                for name, values in self._latency.items()
+            }
+            return {
+                'rate': self.rate,
+                **self._stats,
+                'queued': self._queue.qsize(),
+                'latency': latency,
+                'mismatch_examples': list(self._mismatches),
+            }
+
+    def close(self) -> None:
+        # Прогон может быть общим для нескольких движков: повторный close ничего не делает
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+class ModelSwapper:
+    """
+    Замена моделей без перезапуска: новые веса загружаются и прогреваются
+    в фоне, затем атомарно подставляются во все движки, которые делят
+    заменяемую модель. Запросы, начатые до подмены, доходят до конца на старой.
+
+    С shadow_rate > 0 модель сначала работает в тени (ShadowRun) до promote()
+    или discard(). Одновременно идёт не больше одной замены.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._lock = threading.Lock()
+        self._status: Dict = {'state': 'idle'}
+        self._candidate: Optional[Dict] = None
+        self._shadow: Optional[ShadowRun] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _targets(self, kind: str, variant: Optional[str] = None) -> List:
+        # Движки, которые делят текущую модель этого вида (для OCR — того же варианта)
+        engines = self.registry.engines().values()
+        if kind == 'ocr':
+            variant = variant or self.registry.default.config.ocr_variant
+            engines = [engine for engine in engines if engine.config.ocr_variant == variant]
+            if not engines:
+                return []
+            current = engines[0].models['ocr']
+        else:
+            current = self.registry.default.models[kind]
+        return [engine for engine in engines if engine.models[kind] is current]
+
+    def start(
+        self,
+        kind: str,
+        path: Optional[str] = None,
+        variant: Optional[str] = None,
+        options: Optional[Dict] = None,
+        shadow_rate: float = 0.0,
+    ) -> Dict:
+        """
+        Запускает фоновую загрузку модели kind: путь к весам YOLO (car / container)
+        или вариант и параметры PaddleOCR (ocr). ValueError для неверных параметров,
+        RuntimeError, если другая замена ещё не завершена.
+        """
+        if kind not in MODEL_KINDS:
+            raise ValueError(f"Неизвестный вид модели: {kind}")
+        if kind != 'ocr' and not path:
+            raise ValueError("Для модели YOLO нужен путь к весам")
+        if kind != 'ocr' and not Path(path).exists():
+            raise ValueError(f"Файл весов не найден: {path}")
+
+        with self._lock:
+            if self._status['state'] in ('loading', 'warming', 'shadow'):
+                raise RuntimeError(f"Замена уже идёт: {self._status['kind']} ({self._status['state']})")
+            self._status = {
+                'state': 'loading',
+                'kind': kind,
+                'path': path,
+                'variant': variant,
+                'shadow_rate': shadow_rate,
+                'started_at': time.time(),
+            }
+        threading.Thread(
+            target=self._prepare,
+            args=(kind, path, variant, options or {}, shadow_rate),
+            name='ocr-model-swap',
+            daemon=True,
+        ).start()
+        return self.status()
+
+    def _set_state(self, state: str, **details) -> None:
+        with self._lock:
+            self._status.update({'state': state, **details})
+
+    def _prepare(self, kind: str, path: Optional[str], variant: Optional[str], options: Dict, shadow_rate: float) -> None:
+        try:
+            start = time.perf_counter()
+            if kind == 'ocr':
+                model = create_ocr(variant or self.registry.default.config.ocr_variant, **options)
+            else:
+                model = load_yolo_model(path, path)
+                if model is None:
+                    raise RuntimeError(f"Не удалось загрузить модель: {path}")
+            self._set_state('warming', load_seconds=round(time.perf_counter() - start, 3))
+
+            targets = self._targets(kind, variant)
+            if not targets:
+                raise RuntimeError(f"Нет движков с моделью {kind}")
+            start = time.perf_counter()
+            # Сама новая модель ещё ни с кем не разделена: прогрев размеров идёт
+            # без блокировок движка
+            config = targets[0].config
+            if kind == 'ocr':
+                if config.ocr_shape_buckets:
+                    warmup_ocr(model, config.ocr_shape_buckets)
+            else:
+                warmup_yolo(model, set().union(*(engine.detector_sizes() for engine in targets)), config.confidence)
+            baseline = targets[0].with_models()
+            candidate = targets[0].with_models(**{kind: model})
+            if WARMUP_SAMPLE.exists():
+                # Пробный движок делит с боевыми остальные модели и их блокировки:
+                # прогоны идут через конвейер с низким приоритетом, как фоновые задачи
+                for _ in range(WARMUP_RUNS):
+                    candidate.submit(WARMUP_SAMPLE, priority='low', synthetic=True).result()
+            self._set_state('warming', warmup_seconds=round(time.perf_counter() - start, 3))
+        except Exception as e:
+            self._set_state('failed', error=f"{type(e).__name__}: {e}")
+            print(f"⚠️ Замена модели {kind} не удалась: {e}")
+            return
+
+        with self._lock:
+            self._candidate = {'kind': kind, 'variant': variant, 'model': model}
+        if shadow_rate > 0:
+            shadow = ShadowRun(baseline, candidate, shadow_rate)
+            with self._lock:
+                self._shadow = shadow
+            for engine in targets:
+                engine.shadow = shadow
+            self._set_state('shadow')
+        else:
+            self.promote()
+
+    def promote(self) -> Dict:
+        """Подставляет подготовленную модель; RuntimeError, если подставлять нечего."""
+        with self._lock:
+            candidate = self._candidate
+            if candidate is None:
+                raise RuntimeError("Нет подготовленной модели")
+            self._candidate = None
+            shadow, self._shadow = self._shadow, None
+
+        kind = candidate['kind']
+        targets = self._targets(kind, candidate['variant'])
+        for engine in targets:
+            # Старая модель освобождается, когда её отпустят начатые запросы
+            engine.swap_models(**{kind: candidate['model']})
+            engine.shadow = None
+        if shadow is not None:
+            self._set_state('active', shadow=shadow.stats())
+            shadow.close()
+        else:
+            self._set_state('active')
+        print(f"✅ Модель {kind} заменена в движках: {len(targets)}")
+        return self.status()
+
+    def discard(self) -> Dict:
+        """Отказывается от подготовленной модели; текущие модели не меняются."""
+        with self._lock:
+            self._candidate = None
+            shadow, self._shadow = self._shadow, None
+        for engine in self.registry.engines().values():
+            if engine.shadow is shadow:
+                engine.shadow = None
+        if shadow is not None:
+            self._set_state('discarded', shadow=shadow.stats())
+            shadow.close()
+        else:
+            self._set_state('discarded')
+        return self.status()
+
+    def status(self) -> Dict:
+        with self._lock:
+            status = dict(self._status)
+            shadow = self._shadow
+        if shadow is not None:
+            status['shadow'] = shadow.stats()
+        return status
+
+    def watch(self, interval: float = MODEL_WATCH_SECONDS) -> None:
+        """
+        Следит за файлами весов YOLO текущего профиля: после изменения файла
+        новая модель загружается и подставляется без теневого прогона.
+        """
+        if interval <= 0 or self._watcher is not None:
+            return
+        config = self.registry.default.config
+        paths = {
+            'car': Path(config.car_model_path or CAR_MODEL_DEFAULT_PATH),
+            'container': Path(config.container_model_path or CONTAINER_MODEL_DEFAULT_PATH),
+        }
+
+        def mtimes() -> Dict[str, Optional[float]]:
+            return {kind: path.stat().st_mtime if path.exists() else None for kind, path in paths.items()}
+
+        def run() -> None:
+            seen = mtimes()
+            while not self._stop.wait(interval):
+                current = mtimes()
+                for kind, mtime in current.items():
+                    if mtime is None or mtime == seen[kind]:
+                        continue
+                    try:
+                        self.start(kind, str(paths[kind]))
+                    except RuntimeError:
+                        # Идёт другая замена: файл проверится на следующем круге
+                        continue
+                    except ValueError as e:
+                        # Файл удалён или ещё пишется: наблюдение продолжается
+                        print(f"⚠️ Наблюдение за весами {kind}: {e}")
+                        continue
+                    seen[kind] = mtime
+
+        self._watcher = threading.Thread(target=run, name='ocr-model-watch', daemon=True)
+        self._watcher.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+        with self._lock:
+            shadow, self._shadow = self._shadow, None
+        if shadow is not None:
+            shadow.close()
@@ -0,0 +1,148 @@
+import os
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.scheduler import DEFAULT_PRIORITY, PRIORITIES, DeadlineExceeded, PriorityScheduler
+
+
+def _parse_stage_workers(value: str) -> Tuple[Tuple[str, int], ...]:
+    # "decode=2,prepare=2" → (('decode', 2), ('prepare', 2))
+    items = []
+    for item in value.split(','):
+        if item.strip():
+            name, _, workers = item.partition('=')
+            items.append((name.strip(), int(workers)))
+    return tuple(items)
+
+
+# Потоки по этапам конвейера: CPU-этапы (декодирование, кроп и улучшение) можно
+# распараллелить, этапы с моделями выполняются по одному (модели не потокобезопасны)
+# (переопределение: OCR_STAGE_WORKERS="decode=4,prepare=4")
+_DEFAULT_STAGE_WORKERS = {
+    'decode': 2,
+    'detect': 1,
+    'prepare': 2,
+    'ocr': 1,
+    'info': 1,
+}
+STAGE_WORKERS: Tuple[Tuple[str, int], ...] = tuple({
+    **_DEFAULT_STAGE_WORKERS,
+    **dict(_parse_stage_workers(os.environ.get('OCR_STAGE_WORKERS', ''))),
+}.items())
+
+# Ёмкость очереди между этапами
+PIPELINE_QUEUE_SIZE = int(os.environ.get('OCR_PIPELINE_QUEUE_SIZE', 4))
+
+Stage = Tuple[str, Callable[[Dict], Dict], int]
+
+
+class StagedPipeline:
+    """
+    Этапы, соединённые очередями, у каждого свои потоки: пока запрос N
+    в OCR, запрос N+1 уже в детекции. Функция этапа получает словарь задачи
+    и возвращает его же (последний этап — результат).
+
+    Очереди после первого этапа ограничены: переполненный этап задерживает
+    предыдущий (обратное давление), а вход submit не блокирует и может
+    вызываться из цикла событий. Внутри каждой очереди работа выбирается
+    по приоритету и сроку, как в PriorityScheduler.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = PIPELINE_QUEUE_SIZE):
+        self.names = [name for name, _, _ in stages]
+        self._functions = [fn for _, fn, _ in stages]
+        self._schedulers = [
+            PriorityScheduler(workers, maxsize=queue_size if i else 0, name=f'ocr-{name}')
+            for i, (name, _, workers) in enumerate(stages)
+        ]
+        self._lock = threading.Lock()
+        self._closed = False
+        self._lanes = {
+            lane: {'served': 0, 'expired': 0, 'failed': 0, 'in_flight': 0}
+            for lane in PRIORITIES
+        }
+
+    def submit(
+        self,
+        job: Dict,
+        priority: str = DEFAULT_PRIORITY,
+        deadline: Optional[float] = None,
+    ) -> Future:
+        """Запускает job через все этапы; ValueError для неизвестного приоритета."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Неизвестный приоритет: {priority}")
+
+        result: Future = Future()
+        with self._lock:
+            self._lanes[priority]['in_flight'] += 1
+        self._advance(0, job, priority, deadline, result)
+        return result
+
+    def _advance(self, index: int, job: Dict, priority: str, deadline: Optional[float], result: Future) -> None:
+        fn = self._functions[index]
+        try:
+            future = self._schedulers[index].submit(lambda: fn(job), priority, deadline)
+        except Exception as e:
+            self._finish(priority, result, error=e)
+            return
+
+        def done(future: Future) -> None:
+            error = future.exception()
+            if error is not None:
+                self._finish(priority, result, error=error)
+            elif index + 1 < len(self._schedulers):
+                # Выполняется в потоке этапа index: при полной следующей очереди он ждёт
+                self._advance(index + 1, future.result(), priority, deadline, result)
+            else:
+                self._finish(priority, result, value=future.result())
+
+        future.add_done_callback(done)
+
+    def _finish(self, priority: str, result: Future, value=None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            lane = self._lanes[priority]
+            lane['in_flight'] -= 1
+            if error is None:
+                lane['served'] += 1
+            elif isinstance(error, DeadlineExceeded):
+                lane['expired'] += 1
+            else:
+                lane['failed'] += 1
+        if error is None:
+            result.set_result(value)
+        else:
+            result.set_exception(error)
+
+    def depth(self) -> int:
+        return sum(scheduler.depth() for scheduler in self._schedulers)
+
+    def capacity(self) -> int:
+        """Сколько запросов помещается в потоки этапов и ограниченные очереди между ними."""
+        return sum(scheduler.workers + scheduler.maxsize for scheduler in self._schedulers)
+
+    def pending(self) -> int:
+        """Запросы, принятые и ещё не завершённые (в очередях и в работе)."""
+        with self._lock:
+            return sum(lane['in_flight'] for lane in self._lanes.values())
+
+    def stats(self) -> Dict:
+        """Загрузка потоков и глубина очереди по этапам — узкое место видно по utilisation."""
+        with self._lock:
+            lanes = {lane: dict(stats) for lane, stats in self._lanes.items()}
+        return {
+            'stages': {
+                name: scheduler.utilisation()
+                for name, scheduler in zip(self.names, self._schedulers)
+            },
+            'lanes': lanes,
+        }
+
+    def close(self) -> None:
+        # По порядку этапов: остановленный этап дожимает свою очередь в ещё работающий следующий
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for scheduler in self._schedulers:
+            scheduler.close()
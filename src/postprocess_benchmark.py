@@ -0,0 +1,295 @@
+import json
+import random
+import string
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.get_info import (
+    _filter_by_length,
+    _get_car_number,
+    _get_container_number,
+    _get_container_type,
+    get_info,
+)
+from src.validate_container import calc_check_digit, validate_container, validate_partial_container
+
+
+_base_dir = Path(__file__).resolve().parent
+
+# Число кандидатов OCR на один вызов (шум добивается до этого размера)
+INPUT_SIZES = (2, 4, 8, 16, 32, 64, 128)
+SAMPLES_PER_SIZE = 200
+
+# Путаницы OCR на номерах: пары в обе стороны. О/0 и G/6 исправляет
+# normalize_container_number, остальные — ожидаемые промахи
+CONFUSIONS = {
+    'O': '0', '0': 'O',
+    'G': '6', '6': 'G',
+    'I': '1', '1': 'I',
+    'S': '5', '5': 'S',
+    'B': '8', '8': 'B',
+    'Z': '2', '2': 'Z',
+}
+# Надписи с контейнера, которые OCR возвращает вместе с номером
+DISTRACTORS = ('MAX GROSS', 'TARE', 'NET', 'PAYLOAD', 'CU.CAP.', 'KG', 'LB', 'CSC SAFETY APPROVAL')
+# Алфавит фаззинга: латиница, цифры, разделители и кириллица, похожая на латиницу
+_FUZZ_ALPHABET = string.ascii_uppercase + string.digits + ' .-?/' + 'АВЕКМНОРСТХ'
+
+
+def _load_keys(name: str) -> List[str]:
+    with (_base_dir / name).open('r', encoding='utf-8') as f:
+        return list(json.load(f))
+
+
+class NoisyOcrGenerator:
+    """
+    Синтетические ответы OCR с известной правильной разметкой: номер контейнера
+    разбит на части так, как его возвращает PaddleOCR, с путаницами символов
+    и посторонними надписями; номера машин — с суффиксом страны.
+    """
+
+    def __init__(self, seed: int = 0):
+        self.random = random.Random(seed)
+        self.type_codes = _load_keys('container_type.json')
+        self.countries = _load_keys('car_number_countries.json')
+
+    def container_number(self) -> str:
+        rnd = self.random
+        while True:
+            owner = ''.join(rnd.choice(string.ascii_uppercase) for _ in range(3)) + rnd.choice('UJZ')
+            serial = ''.join(rnd.choice(string.digits) for _ in range(6))
+            code = owner + serial
+            number = f"{code}{calc_check_digit(code)}"
+            # Остаток 10 даёт цифру 0, и такой номер не проходит проверку: владельцы его не выдают
+            if validate_container(number):
+                return number
+
+    def split(self, number: str) -> List[str]:
+        """Разбиение номера на строки OCR: как на дверях, в одну строку или по частям."""
+        owner, serial, check = number[:4], number[4:10], number[10]
+        return self.random.choice((
+            [number],
+            [f"{owner} {serial} {check}"],
+            [owner, f"{serial} {check}"],
+            [owner, serial + check],
+            [f"{owner} {serial}{check}"],
+            [f"{owner}.{serial}.{check}"],
+            [owner, serial, check],
+            [f"{owner}-{serial}-{check}"],
+        ))
+
+    def confuse(self, text: str, rate: float) -> str:
+        chars = list(text)
+        for i, char in enumerate(chars):
+            if char in CONFUSIONS and self.random.random() < rate:
+                chars[i] = CONFUSIONS[char]
+        return ''.join(chars)
+
+    def distractor(self) -> str:
+        rnd = self.random
+        kind = rnd.randrange(4)
+        if kind == 0:
+            return rnd.choice(DISTRACTORS)
+        if kind == 1:
+            # Масса: 4–5 цифр, часть попадает в кандидаты длины 4
+            return f"{rnd.randrange(1000, 99999)} {rnd.choice(('KG', 'LB'))}"
+        if kind == 2:
+            return ''.join(rnd.choice(string.ascii_uppercase) for _ in range(4))
+        return ''.join(rnd.choice(string.digits) for _ in range(rnd.choice((6, 7))))
+
+    def container_sample(self, size: int, confusion_rate: float) -> Tuple[List[str], Dict[str, str]]:
+        number = self.container_number()
+        type_code = self.random.choice(self.type_codes)
+        texts = [self.confuse(part, confusion_rate) for part in self.split(number)] + [type_code]
+        while len(texts) < size:
+            texts.insert(self.random.randrange(len(texts) + 1), self.distractor())
+        return texts, {'number': number, 'type_code': type_code}
+
+    def adversarial_sample(self, size: int) -> List[str]:
+        """Худший случай склейки в _filter_by_length: половина частей по 4, половина по 7."""
+        rnd = self.random
+        texts = []
+        for i in range(size):
+            if i % 2:
+                texts.append(''.join(rnd.choice(string.digits) for _ in range(7)))
+            else:
+                texts.append(''.join(rnd.choice(string.ascii_uppercase) for _ in range(4)))
+        return texts
+
+    def car_sample(self, size: int) -> Tuple[List[str], str]:
+        rnd = self.random
+        plate = (
+            rnd.choice('ABEKMHOPCTYX')
+            + ''.join(rnd.choice(string.digits) for _ in range(3))
+            + ''.join(rnd.choice('ABEKMHOPCTYX') for _ in range(2))
+            + ''.join(rnd.choice(string.digits) for _ in range(rnd.choice((2, 3))))
+        )
+        country = rnd.choice(self.countries)
+        text = rnd.choice((f"{plate} {country}", f"{plate}{country}", f"{plate[:4]} {plate[4:]} {country}"))
+        # Номер машины ищется в первом непустом тексте: шум идёт после него
+        texts = [text] + [self.distractor() for _ in range(size - 1)]
+        return texts, plate
+
+    def fuzz_sample(self, size: int) -> List[str]:
+        rnd = self.random
+        return [
+            ''.join(rnd.choice(_FUZZ_ALPHABET) for _ in range(rnd.choice((0, 1, 4, 7, 11, 40))))
+            for _ in range(size)
+        ]
+
+
+def _measure(fn: Callable, inputs: List) -> Tuple[List[float], List, int]:
+    durations = []
+    outputs = []
+    errors = 0
+    for item in inputs:
+        start = time.perf_counter()
+        try:
+            output = fn(item)
+        except Exception:
+            output = None
+            errors += 1
+        durations.append(time.perf_counter() - start)
+        outputs.append(output)
+    return durations, outputs, errors
+
+
+def _timing(durations: List[float]) -> Dict[str, float]:
+    total = sum(durations)
+    return {
+        'calls': len(durations),
+        'throughput_per_s': len(durations) / total if total else 0.0,
+        'mean_us': float(np.mean(durations)) * 1e6,
+        'p99_us': float(np.percentile(durations, 99)) * 1e6,
+        'max_us': max(durations) * 1e6,
+    }
+
+
+def benchmark_postprocess(
+    sizes: Tuple[int, ...] = INPUT_SIZES,
+    samples: int = SAMPLES_PER_SIZE,
+    seed: int = 0,
+    confusion_rate: float = 0.05,
+) -> Dict:
+    """
+    Замеры по размеру входа (число кандидатов OCR): пропускная способность,
+    среднее, p99 и худшее время вызова, плюс правильность ответа по сценариям.
+    Генератор детерминирован по seed: отчёты разных версий сравнимы.
+    """
+    generator = NoisyOcrGenerator(seed)
+    report: Dict[str, Dict] = {}
+
+    for size in sizes:
+        containers = [generator.container_sample(size, confusion_rate) for _ in range(samples)]
+        adversarial = [generator.adversarial_sample(size) for _ in range(samples)]
+        cars = [generator.car_sample(size) for _ in range(samples)]
+        fuzz = [generator.fuzz_sample(size) for _ in range(samples)]
+        texts = [sample for sample, _ in containers]
+        filtered = [_filter_by_length(sample) for sample in texts]
+        candidates = [text for sample in filtered for text in sample]
+
+        result: Dict[str, Dict] = {}
+
+        durations, outputs, errors = _measure(lambda sample: get_info(sample, detect='container'), texts)
+        exact = sum(
+            1 for output, (_, expected) in zip(outputs, containers)
+            if output and output['number'] == expected['number']
+        )
+        wrong = sum(
+            1 for output, (_, expected) in zip(outputs, containers)
+            if output and output['number'] and output['number'] != expected['number']
+        )
+        typed = sum(1 for output in outputs if output and output['type'])
+        result['get_info'] = {
+            **_timing(durations),
+            'errors': errors,
+            'number_exact': exact,
+            'number_wrong': wrong,
+            'number_empty': samples - exact - wrong - errors,
+            'type_found': typed,
+        }
+
+        durations, outputs, errors = _measure(lambda sample: get_info(sample, detect='container'), adversarial)
+        result['get_info_adversarial'] = {**_timing(durations), 'errors': errors}
+
+        durations, outputs, errors = _measure(_filter_by_length, texts)
+        result['filter_by_length'] = {
+            **_timing(durations),
+            'errors': errors,
+            'candidates_mean': float(np.mean([len(output) for output in outputs if output is not None])),
+        }
+
+        durations, _, errors = _measure(_filter_by_length, adversarial)
+        result['filter_by_length_adversarial'] = {**_timing(durations), 'errors': errors}
+
+        durations, _, errors = _measure(_get_container_number, filtered)
+        result['get_container_number'] = {**_timing(durations), 'errors': errors}
+
+        durations, _, errors = _measure(_get_container_type, filtered)
+        result['get_container_type'] = {**_timing(durations), 'errors': errors}
+
+        durations, outputs, errors = _measure(_get_car_number, [sample for sample, _ in cars])
+        result['get_car_number'] = {
+            **_timing(durations),
+            'errors': errors,
+            'exact': sum(1 for output, (_, plate) in zip(outputs, cars) if output == plate),
+        }
+
+        durations, _, errors = _measure(validate_partial_container, candidates or [''])
+        result['validate_partial_container'] = {**_timing(durations), 'errors': errors}
+
+        # Фаззинг: любой вход должен обрабатываться без исключений
+        durations, _, errors = _measure(lambda sample: get_info(sample, detect='container'), fuzz)
+        result['get_info_fuzz'] = {**_timing(durations), 'errors': errors}
+        durations, _, car_errors = _measure(lambda sample: get_info(sample, detect='car'), fuzz)
+        result['get_info_fuzz']['errors'] += car_errors
+
+        report[str(size)] = result
+
+    return {'seed': seed, 'samples': samples, 'confusion_rate': confusion_rate, 'sizes': report}
+
+
+def print_report(report: Dict, baseline: Optional[Dict] = None) -> None:
+    print(f"seed={report['seed']}, выборок на размер: {report['samples']}, путаницы: {report['confusion_rate']}")
+    for size, result in report['sizes'].items():
+        accuracy = result['get_info']
+        print(
+            f"\nКандидатов: {size} — номер верно {accuracy['number_exact']}, "
+            f"неверно {accuracy['number_wrong']}, пусто {accuracy['number_empty']}, тип найден {accuracy['type_found']}"
+        )
+        for name, stats in result.items():
+            line = (
+                f"  {name:<30}{stats['throughput_per_s']:>12.0f}/с  "
+                f"mean {stats['mean_us']:>9.1f} мкс  p99 {stats['p99_us']:>9.1f}  max {stats['max_us']:>9.1f}"
+            )
+            if stats['errors']:
+                line += f"  ОШИБОК: {stats['errors']}"
+            if baseline and size in baseline['sizes'] and name in baseline['sizes'][size]:
+                previous = baseline['sizes'][size][name]
+                line += f"  (×{stats['mean_us'] / previous['mean_us']:.2f} к базовому)" if previous['mean_us'] else ''
+            print(line)
+
+
+def regressions(report: Dict, baseline: Dict) -> List[str]:
+    """Ухудшения правильности или новые исключения относительно базового отчёта (тот же seed)."""
+    problems = []
+    for size, result in report['sizes'].items():
+        previous = baseline['sizes'].get(size)
+        if previous is None:
+            continue
+        for key in ('number_exact', 'type_found'):
+            if result['get_info'][key] < previous['get_info'][key]:
+                problems.append(f"{size}: get_info {key} {previous['get_info'][key]} → {result['get_info'][key]}")
+        if result['get_info']['number_wrong'] > previous['get_info']['number_wrong']:
+            problems.append(
+                f"{size}: get_info number_wrong {previous['get_info']['number_wrong']} → {result['get_info']['number_wrong']}"
+            )
+        if result['get_car_number']['exact'] < previous['get_car_number']['exact']:
+            problems.append(f"{size}: get_car_number exact {previous['get_car_number']['exact']} → {result['get_car_number']['exact']}")
+        for name, stats in result.items():
+            if stats['errors'] > previous.get(name, {}).get('errors', 0):
+                problems.append(f"{size}: {name} errors {previous.get(name, {}).get('errors', 0)} → {stats['errors']}")
+    return problems
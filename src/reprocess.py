@@ -0,0 +1,386 @@
+import csv
+import io
+import json
+import multiprocessing
+import os
+import sqlite3
+import tarfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
+STAGES = ('decode', 'detect', 'crop', 'compress', 'enhance', 'ocr', 'info', 'total')
+COLUMNS = (
+    ('key', 'detect', 'found', 'number', 'type', 'car', 'texts', 'error')
+    + tuple(f't_{stage}' for stage in STAGES)
+)
+# Пакет ключей при досинхронизации индекса готовых ключей
+_INDEX_BATCH = 10000
+
+# Источник изображения для воркера: путь к файлу, член zip-архива или байты (из tar)
+Source = Union[str, Tuple[str, str], bytes]
+
+
+def _walk(directory: Path) -> Iterator[Path]:
+    # В памяти только записи текущего каталога (по порядку имён), а не всё дерево
+    with os.scandir(directory) as entries:
+        entries = sorted(entries, key=lambda entry: entry.name)
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from _walk(Path(entry.path))
+        elif entry.is_file() and Path(entry.name).suffix.lower() in IMAGE_EXTENSIONS:
+            yield Path(entry.path)
+
+
+def iter_sources(
+    root: Union[str, Path],
+    skip: Optional[Callable[[str], bool]] = None,
+) -> Iterator[Tuple[str, Source]]:
+    """
+    Лениво перечисляет изображения каталога (рекурсивно), zip- или tar-архива.
+    Ключ — путь относительно корня или имя в архиве; по нему возобновляется обработка.
+    Ключи, для которых skip(key) истинно, пропускаются без чтения файла.
+    """
+    root = Path(root)
+    skip = skip or (lambda key: False)
+    if root.is_dir():
+        for path in _walk(root):
+            key = str(path.relative_to(root))
+            if not skip(key):
+                yield key, str(path)
+    elif zipfile.is_zipfile(root):
+        with zipfile.ZipFile(root) as archive:
+            for info in archive.infolist():
+                name = info.filename
+                if not info.is_dir() and Path(name).suffix.lower() in IMAGE_EXTENSIONS and not skip(name):
+                    # Воркер сам читает член архива: zip допускает произвольный доступ
+                    yield name, (str(root), name)
+    elif tarfile.is_tarfile(root):
+        # tar (в том числе сжатый) читается только последовательно: байты передаются воркеру
+        with tarfile.open(root, 'r:*') as archive:
+            for member in archive:
+                if not member.isfile() or Path(member.name).suffix.lower() not in IMAGE_EXTENSIONS:
+                    continue
+                if not skip(member.name):
+                    yield member.name, archive.extractfile(member).read()
+    else:
+        raise ValueError(f"Не каталог и не архив: {root}")
+
+
+_worker_engines: Dict[Optional[str], object] = {}
+_worker_archives: Dict[str, zipfile.ZipFile] = {}
+
+
+def _get_worker_engine(profile: Optional[str]):
+    # Импорт внутри воркера: модели загружаются один раз в каждом процессе пула
+    engine = _worker_engines.get(profile)
+    if engine is None:
+        from src.config import get_config
+        from src.engine import OcrEngine
+        engine = _worker_engines[profile] = OcrEngine(get_config(profile))
+    return engine
+
+
+def open_source(source: Source):
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    if isinstance(source, tuple):
+        archive_path, name = source
+        archive = _worker_archives.get(archive_path)
+        if archive is None:
+            archive = _worker_archives[archive_path] = zipfile.ZipFile(archive_path)
+        return io.BytesIO(archive.read(name))
+    return source
+
+
+def _process_one(key: str, source: Source, profile: Optional[str]) -> Dict:
+    row = {column: None for column in COLUMNS}
+    row['key'] = key
+    try:
+        result = _get_worker_engine(profile).analyze(open_source(source))
+    except Exception as e:
+        # Одна строка: запись CSV занимает ровно одну строку файла (см. _drop_torn_tail)
+        row['error'] = ' '.join(f"{type(e).__name__}: {e}".split())
+        return row
+
+    info = result['info']
+    row.update({
+        'detect': result['detect'],
+        'found': int(result['found']),
+        'number': info.get('number', ''),
+        'type': info.get('type', ''),
+        'car': info.get('car', ''),
+        'texts': json.dumps(result['texts'], ensure_ascii=False),
+    })
+    for stage in STAGES:
+        row[f't_{stage}'] = round(result['timings'].get(stage, 0.0), 4)
+    return row
+
+
+def _succeeded(row: Dict) -> bool:
+    # Строки с ошибкой не считаются готовыми: при возобновлении ключ обрабатывается снова
+    return not row['error']
+
+
+class _KeyIndex:
+    """
+    Готовые ключи CSV/Parquet в соседней базе SQLite (<вывод>.keys.sqlite3):
+    проверка при возобновлении идёт по индексу на диске, память не растёт с
+    размером архива. В meta хранится, до какого места вывода индекс досинхронизирован;
+    хвост, записанный перед падением, дочитывается при открытии.
+    """
+
+    def __init__(self, path: Path):
+        self._conn = sqlite3.connect(str(path))
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS keys (key TEXT PRIMARY KEY)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)')
+        self._conn.commit()
+
+    def position(self, name: str) -> int:
+        row = self._conn.execute('SELECT value FROM meta WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else 0
+
+    def add(self, keys: Iterable[str], name: str, position: int) -> None:
+        self._conn.executemany('INSERT OR IGNORE INTO keys (key) VALUES (?)', ((key,) for key in keys))
+        self._conn.execute('INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)', (name, position))
+        self._conn.commit()
+
+    def done(self, key: str) -> bool:
+        return self._conn.execute('SELECT 1 FROM keys WHERE key = ?', (key,)).fetchone() is not None
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def _index_path(path: Path) -> Path:
+    return path.with_name(path.name + '.keys.sqlite3')
+
+
+def _drop_torn_tail(path: Path, block: int = 65536) -> None:
+    # Строка, оборванная падением посреди записи, отбрасывается: её ключ обработается заново
+    with path.open('rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b'\n':
+            return
+        position = end
+        while position > 0:
+            start = max(0, position - block)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b'\n')
+            if newline >= 0:
+                f.truncate(start + newline + 1)
+                return
+            position = start
+        f.truncate(0)
+
+
+class CsvResults:
+    """
+    CSV только дописывается: строка с ошибкой остаётся в файле, а после повтора
+    ниже появляется строка того же ключа с результатом — актуальна последняя.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._index = _KeyIndex(_index_path(path))
+        if path.exists():
+            _drop_torn_tail(path)
+        exists = path.exists() and path.stat().st_size > 0
+        if exists:
+            self._sync_index()
+        self._file = path.open('a', encoding='utf-8', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=COLUMNS)
+        if not exists:
+            self._writer.writeheader()
+
+    def _sync_index(self) -> None:
+        synced = self._index.position('csv_bytes')
+        size = self.path.stat().st_size
+        if synced > size:
+            # Файл заменён или обрезан: индекс строится заново по всему файлу
+            synced = 0
+        if synced == size:
+            return
+        with self.path.open('r', encoding='utf-8', newline='') as f:
+            if synced:
+                f.seek(synced)
+                reader = csv.DictReader(f, fieldnames=COLUMNS)
+            else:
+                reader = csv.DictReader(f)
+            batch = []
+            for row in reader:
+                if not _succeeded(row):
+                    continue
+                batch.append(row['key'])
+                if len(batch) >= _INDEX_BATCH:
+                    self._index.add(batch, 'csv_bytes', synced)
+                    batch = []
+            self._index.add(batch, 'csv_bytes', size)
+
+    def done(self, key: str) -> bool:
+        return self._index.done(key)
+
+    def write(self, rows: List[Dict]) -> None:
+        self._writer.writerows(rows)
+        self._file.flush()
+        self._index.add(
+            (row['key'] for row in rows if _succeeded(row)),
+            'csv_bytes',
+            os.fstat(self._file.fileno()).st_size,
+        )
+
+    def close(self) -> None:
+        self._file.close()
+        self._index.close()
+
+
+class SqliteResults:
+    # Проверка готовности идёт по индексу базы: память не растёт с размером архива
+    def __init__(self, path: Path):
+        self._conn = sqlite3.connect(str(path))
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        columns = ', '.join(f'{column} TEXT' if column == 'key' else column for column in COLUMNS)
+        self._conn.execute(f'CREATE TABLE IF NOT EXISTS results ({columns}, PRIMARY KEY (key))')
+        self._conn.commit()
+
+    def done(self, key: str) -> bool:
+        row = self._conn.execute('SELECT 1 FROM results WHERE key = ? AND error IS NULL', (key,)).fetchone()
+        return row is not None
+
+    def write(self, rows: List[Dict]) -> None:
+        placeholders = ', '.join('?' for _ in COLUMNS)
+        self._conn.executemany(
+            f'INSERT OR REPLACE INTO results ({", ".join(COLUMNS)}) VALUES ({placeholders})',
+            [tuple(row[column] for column in COLUMNS) for row in rows],
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class ParquetResults:
+    # Каталог part-NNNNN.parquet: каждый сброс — отдельный файл, запись только дописыванием
+    def __init__(self, path: Path):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Для вывода в Parquet нужен pyarrow: pip install pyarrow")
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.path = path
+        path.mkdir(parents=True, exist_ok=True)
+        self._index = _KeyIndex(path / 'keys.sqlite3')
+        parts = sorted(path.glob('part-*.parquet'))
+        # Части, записанные после последней синхронизации индекса (например, перед падением)
+        for number, part in enumerate(parts[self._index.position('parts'):], self._index.position('parts')):
+            rows = self._pq.read_table(part, columns=['key', 'error']).to_pylist()
+            self._index.add((row['key'] for row in rows if _succeeded(row)), 'parts', number + 1)
+        self._next_part = len(parts)
+
+    def done(self, key: str) -> bool:
+        return self._index.done(key)
+
+    def write(self, rows: List[Dict]) -> None:
+        table = self._pa.Table.from_pylist([{column: row[column] for column in COLUMNS} for row in rows])
+        part = self.path / f'part-{self._next_part:05d}.parquet'
+        tmp_part = part.with_suffix('.tmp')
+        self._pq.write_table(table, tmp_part)
+        tmp_part.replace(part)
+        self._next_part += 1
+        self._index.add((row['key'] for row in rows if _succeeded(row)), 'parts', self._next_part)
+
+    def close(self) -> None:
+        self._index.close()
+
+
+def open_results(output: Union[str, Path]):
+    output = Path(output)
+    suffix = output.suffix.lower()
+    if suffix == '.csv':
+        return CsvResults(output)
+    if suffix in ('.db', '.sqlite', '.sqlite3'):
+        return SqliteResults(output)
+    if suffix == '.parquet':
+        return ParquetResults(output)
+    raise ValueError(f"Неизвестный формат вывода: {output} (.csv, .sqlite, .parquet)")
+
+
+def reprocess(
+    source: Union[str, Path],
+    output: Union[str, Path],
+    workers: Optional[int] = None,
+    profile: Optional[str] = None,
+    flush_every: int = 100,
+    flush_interval: float = 10.0,
+    verbose: bool = True,
+) -> Dict[str, int]:
+    """
+    Повторно распознаёт все изображения источника и дописывает результаты в output.
+    Уже записанные ключи пропускаются, поэтому прерванный запуск продолжается с места остановки.
+    В работе не больше workers * 4 изображений: память не зависит от размера архива.
+    """
+    workers = workers or multiprocessing.cpu_count() or 1
+    max_inflight = workers * 4
+    results = open_results(output)
+    counters = {'processed': 0, 'skipped': 0, 'errors': 0}
+
+    def skip(key: str) -> bool:
+        if results.done(key):
+            counters['skipped'] += 1
+            return True
+        return False
+
+    pending: List[Dict] = []
+    last_flush = time.monotonic()
+    started = time.monotonic()
+
+    def flush() -> None:
+        nonlocal last_flush
+        if pending:
+            results.write(pending)
+            pending.clear()
+        last_flush = time.monotonic()
+
+    def collect(futures) -> None:
+        for future in futures:
+            row = future.result()
+            pending.append(row)
+            counters['processed'] += 1
+            if row['error']:
+                counters['errors'] += 1
+        if len(pending) >= flush_every or time.monotonic() - last_flush >= flush_interval:
+            flush()
+            if verbose:
+                rate = counters['processed'] / max(time.monotonic() - started, 1e-6)
+                print(
+                    f"Обработано: {counters['processed']}, пропущено: {counters['skipped']}, "
+                    f"ошибок: {counters['errors']} ({rate:.1f} изобр./сек)"
+                )
+
+    # spawn вместо fork: torch/paddle плохо переживают fork после инициализации
+    context = multiprocessing.get_context('spawn')
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            inflight = set()
+            for key, item in iter_sources(source, skip):
+                if len(inflight) >= max_inflight:
+                    finished, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                inflight.add(executor.submit(_process_one, key, item, profile))
+            collect(inflight)
+    finally:
+        # Прерывание (Ctrl+C): уже полученные результаты сохраняются
+        flush()
+        results.close()
+
+    return counters
@@ -0,0 +1,189 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+_base_dir = Path(__file__).resolve().parent.parent
+
+ROI_MEMORY_PATH = os.environ.get('OCR_ROI_MEMORY_PATH', str(_base_dir / "roi_memory.json"))
+# Сколько камер помнится; сверх этого забывается камера, дольше всех не присылавшая кадры
+ROI_MAX_CAMERAS = int(os.environ.get('OCR_ROI_MAX_CAMERAS', 256))
+# Камеры, для которых выучивается область: "gate-1,gate-2" (пусто — любой camera_id допустимого вида)
+ROI_CAMERAS = frozenset(camera.strip() for camera in os.environ.get('OCR_ROI_CAMERAS', '').split(',') if camera.strip())
+
+_CAMERA_ID = re.compile(r'[A-Za-z0-9._:-]{1,64}')
+
+Box = Tuple[float, float, float, float]
+
+
+class RoiMemory:
+    """
+    Выученная по каждой камере область, где обычно появляются номера
+    (отдельно для 'car' и 'container'). Рамки хранятся в долях кадра
+    и сглаживаются экспоненциально, поэтому медленно следуют за сдвигом камеры.
+
+    Область используется только после min_hits попаданий; после max_misses
+    промахов подряд она сбрасывается и выучивается заново по полному кадру.
+
+    camera_id приходит от клиента, поэтому память ограничена: запоминаются только
+    идентификаторы допустимого вида (и из cameras, если список задан), не больше
+    max_cameras, давно не встречавшиеся вытесняются первыми.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = ROI_MEMORY_PATH,
+        alpha: float = 0.2,
+        margin: float = 0.5,
+        min_margin: float = 0.05,
+        min_hits: int = 3,
+        max_misses: int = 5,
+        save_interval: float = 30.0,
+        max_cameras: int = ROI_MAX_CAMERAS,
+        cameras: frozenset = ROI_CAMERAS,
+    ):
+        self.path = Path(path) if path else None
+        self.max_cameras = max_cameras
+        self.cameras = cameras
+        self.alpha = alpha
+        self.margin = margin
+        self.min_margin = min_margin
+        self.min_hits = min_hits
+        self.max_misses = max_misses
+        self.save_interval = save_interval
+
+        self._lock = threading.Lock()
+        self._cameras: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._dirty = False
+        self._last_save = 0.0
+        self.roi_hits = 0
+        self.roi_misses = 0
+        self._load()
+
+    def _load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with self.path.open('r', encoding='utf-8') as f:
+                cameras = json.load(f)
+        except Exception:
+            return
+        # Файл записан в порядке давности использования: при меньшем пределе остаются последние
+        accepted = [(camera_id, camera) for camera_id, camera in cameras.items() if self.accepts(camera_id)]
+        self._cameras = OrderedDict(accepted[-self.max_cameras:] if self.max_cameras > 0 else [])
+
+    def accepts(self, camera_id: Optional[str]) -> bool:
+        if not camera_id or not _CAMERA_ID.fullmatch(camera_id):
+            return False
+        return not self.cameras or camera_id in self.cameras
+
+    def _camera(self, camera_id: str, create: bool = False) -> Optional[Dict]:
+        # Под self._lock: обращение делает камеру самой свежей, новая вытесняет самую давнюю
+        camera = self._cameras.get(camera_id)
+        if camera is not None:
+            self._cameras.move_to_end(camera_id)
+            return camera
+        if not create or not self.accepts(camera_id) or self.max_cameras <= 0:
+            return None
+        camera = self._cameras[camera_id] = {}
+        while len(self._cameras) > self.max_cameras:
+            self._cameras.popitem(last=False)
+        return camera
+
+    def prior(self, camera_id: str) -> Optional[Box]:
+        """Область для детекции (с запасом), объединяющая выученные рамки камеры."""
+        with self._lock:
+            camera = self._camera(camera_id)
+            if not camera:
+                return None
+
+            boxes = [
+                entry['box'] for entry in camera.values()
+                if entry['hits'] >= self.min_hits
+            ]
+            if not boxes:
+                return None
+
+            x1 = min(box[0] for box in boxes)
+            y1 = min(box[1] for box in boxes)
+            x2 = max(box[2] for box in boxes)
+            y2 = max(box[3] for box in boxes)
+
+        margin_x = max(self.min_margin, (x2 - x1) * self.margin)
+        margin_y = max(self.min_margin, (y2 - y1) * self.margin)
+        return (
+            max(0.0, x1 - margin_x),
+            max(0.0, y1 - margin_y),
+            min(1.0, x2 + margin_x),
+            min(1.0, y2 + margin_y),
+        )
+
+    def update(self, camera_id: str, detect: str, box: Tuple[int, int, int, int], size: Tuple[int, int]) -> None:
+        width, height = size
+        normalized = (box[0] / width, box[1] / height, box[2] / width, box[3] / height)
+
+        with self._lock:
+            camera = self._camera(camera_id, create=True)
+            if camera is None:
+                return
+            entry = camera.get(detect)
+            if entry is None:
+                camera[detect] = {'box': list(normalized), 'hits': 1, 'misses': 0}
+            else:
+                entry['box'] = [
+                    old * (1 - self.alpha) + new * self.alpha
+                    for old, new in zip(entry['box'], normalized)
+                ]
+                entry['hits'] += 1
+                entry['misses'] = 0
+            self._dirty = True
+        self._maybe_save()
+
+    def record(self, camera_id: str, found: bool) -> None:
+        """Учитывает результат детекции по выученной области."""
+        with self._lock:
+            if found:
+                self.roi_hits += 1
+                return
+
+            self.roi_misses += 1
+            camera = self._cameras.get(camera_id, {})
+            for entry in camera.values():
+                entry['misses'] += 1
+                if entry['misses'] >= self.max_misses:
+                    entry['hits'] = 0
+                    entry['misses'] = 0
+            self._dirty = True
+
+    def _maybe_save(self) -> None:
+        if time.time() - self._last_save >= self.save_interval:
+            self.save()
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._cameras, ensure_ascii=False)
+            self._dirty = False
+            self._last_save = time.time()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with tmp_path.open('w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'cameras': len(self._cameras),
+                'roi_hits': self.roi_hits,
+                'roi_misses': self.roi_misses,
+            }
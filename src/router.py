@@ -0,0 +1,236 @@
+import asyncio
+import hashlib
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, File, HTTPException, Request, Response, UploadFile
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from src.singleflight import content_hash
+from src.upload import MaxBodySizeMiddleware
+
+
+# Узлы OCR за маршрутизатором: "http://127.0.0.1:8082,http://127.0.0.1:8083"
+ROUTER_BACKENDS = [url.strip().rstrip('/') for url in os.environ.get('OCR_BACKENDS', '').split(',') if url.strip()]
+HEALTH_INTERVAL_SECONDS = float(os.environ.get('OCR_ROUTER_HEALTH_SECONDS', 2))
+HEALTH_TIMEOUT_SECONDS = 1.0
+REQUEST_TIMEOUT_SECONDS = float(os.environ.get('OCR_ROUTER_TIMEOUT_SECONDS', 30))
+# Сколько раз повторить запрос на другом узле, если узел перегружен или недоступен
+ROUTER_RETRIES = int(os.environ.get('OCR_ROUTER_RETRIES', 2))
+# Насколько узел по хешу может быть загружен сильнее самого свободного, прежде чем
+# запрос уйдёт на свободный (0 — всегда наименее загруженный)
+AFFINITY_SLACK = int(os.environ.get('OCR_ROUTER_AFFINITY_SLACK', 2))
+
+# Ответы перегруженного узла: запрос повторяется на другом
+_RETRY_STATUSES = {429, 503}
+
+
+class Backend:
+    def __init__(self, url: str):
+        self.url = url
+        # ready / overloaded / down; до первой проверки узел считается недоступным
+        self.state = 'down'
+        # Запросы этого маршрутизатора, ещё не получившие ответ
+        self.outstanding = 0
+        # Незавершённые запросы узла по последнему /readyz (от всех маршрутизаторов)
+        self.pending = 0
+        self.served = 0
+        self.retried = 0
+        self.last_error: Optional[str] = None
+
+    def load(self) -> int:
+        # pending устаревает до следующей проверки, outstanding точен для своих запросов
+        return max(self.outstanding, self.pending)
+
+    def stats(self) -> Dict:
+        return {
+            'state': self.state,
+            'outstanding': self.outstanding,
+            'pending': self.pending,
+            'served': self.served,
+            'retried': self.retried,
+            'last_error': self.last_error,
+        }
+
+
+def _rank(key: str, url: str) -> int:
+    # Rendezvous-хеширование: при выпадении узла переезжают только его ключи
+    return int.from_bytes(hashlib.blake2b(f'{key}|{url}'.encode(), digest_size=8).digest(), 'big')
+
+
+class BackendPool:
+    """
+    Выбор узла для запроса: предпочтительный узел определяется хешем содержимого
+    (повтор того же снимка попадает в кеш и singleflight того же узла), но если
+    он загружен сильнее самого свободного больше чем на slack запросов, запрос
+    уходит на наименее загруженный. Остальные узлы — запасные для повтора.
+    """
+
+    def __init__(self, urls: List[str], slack: int = AFFINITY_SLACK):
+        self.backends = [Backend(url) for url in urls]
+        self.slack = slack
+
+    def candidates(self, key: str) -> List[Backend]:
+        ready = [backend for backend in self.backends if backend.state == 'ready']
+        if not ready:
+            return []
+        ranked = sorted(ready, key=lambda backend: _rank(key, backend.url), reverse=True)
+        least = min(backend.load() for backend in ranked)
+        if ranked[0].load() - least <= self.slack:
+            return ranked
+        # Устойчивая сортировка: при равной загрузке сохраняется порядок по хешу
+        return sorted(ranked, key=lambda backend: backend.load())
+
+    async def check(self, client, backend: Backend) -> None:
+        try:
+            response = await client.get(f'{backend.url}/readyz', timeout=HEALTH_TIMEOUT_SECONDS)
+            data = response.json()
+        except Exception as e:
+            backend.state = 'down'
+            backend.last_error = f"{type(e).__name__}: {e}"
+            return
+        backend.pending = int(data.get('pending', 0))
+        if response.status_code == 200:
+            backend.state = 'ready'
+        elif response.status_code in _RETRY_STATUSES:
+            backend.state = 'overloaded'
+        else:
+            backend.state = 'down'
+            backend.last_error = f"/readyz: HTTP {response.status_code}"
+
+    async def check_all(self, client) -> None:
+        await asyncio.gather(*(self.check(client, backend) for backend in self.backends))
+
+    async def run_health_checks(self, client, interval: float = HEALTH_INTERVAL_SECONDS) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.check_all(client)
+
+    def stats(self) -> Dict:
+        return {backend.url: backend.stats() for backend in self.backends}
+
+
+def _deadline_ms(request: Request, deadline_ms: Optional[float]) -> Optional[float]:
+    if deadline_ms is not None or 'x-deadline-ms' not in request.headers:
+        return deadline_ms
+    try:
+        return float(request.headers['x-deadline-ms'])
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid X-Deadline-Ms header")
+
+
+def create_router_app(backends: List[str], allowed_origins: List[str]) -> FastAPI:
+    """
+    Режим маршрутизатора (OCR_MODE=router): /ocr пересылается на узлы OCR,
+    сами модели здесь не загружаются.
+    """
+    try:
+        import httpx
+    except ImportError:
+        raise RuntimeError("Для режима маршрутизатора нужен httpx: pip install httpx")
+    if not backends:
+        raise ValueError("Не заданы узлы OCR (OCR_BACKENDS)")
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        app.state.client = httpx.AsyncClient(timeout=REQUEST_TIMEOUT_SECONDS)
+        await app.state.pool.check_all(app.state.client)
+        health = asyncio.create_task(app.state.pool.run_health_checks(app.state.client))
+        yield
+        health.cancel()
+        await app.state.client.aclose()
+
+    app = FastAPI(title="Tezport OCR Router", lifespan=lifespan)
+    app.state.pool = BackendPool(backends)
+
+    app.add_middleware(MaxBodySizeMiddleware)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=allowed_origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    @app.get("/")
+    async def root():
+        return {"status": "ok", "message": "Tezport OCR Router is running"}
+
+    @app.get("/readyz")
+    async def readyz(request: Request):
+        ready = [backend for backend in request.app.state.pool.backends if backend.state == 'ready']
+        return JSONResponse(
+            {'status': 'ready' if ready else 'unavailable', 'backends': len(ready)},
+            status_code=200 if ready else 503,
+        )
+
+    @app.get("/stats")
+    async def stats(request: Request):
+        return {'backends': request.app.state.pool.stats()}
+
+    @app.post("/ocr")
+    async def ocr_image(
+        request: Request,
+        image: UploadFile = File(...),
+        camera_id: Optional[str] = None,
+        profile: Optional[str] = None,
+        priority: Optional[str] = None,
+        deadline_ms: Optional[float] = None,
+    ):
+        pool: BackendPool = request.app.state.pool
+        client = request.app.state.client
+        deadline_ms = _deadline_ms(request, deadline_ms)
+        deadline = time.monotonic() + deadline_ms / 1000.0 if deadline_ms is not None else None
+
+        data = await image.read()
+        # Хеш большого кадра — в пуле потоков: цикл событий обслуживает остальные запросы
+        key = f"{profile or ''}:{await run_in_threadpool(content_hash, image.file)}"
+        params = {name: value for name, value in (('camera_id', camera_id), ('profile', profile)) if value is not None}
+        headers = {}
+        if priority or 'x-priority' in request.headers:
+            headers['X-Priority'] = priority or request.headers['x-priority']
+        files = {'image': (image.filename or 'image', data, image.content_type or 'application/octet-stream')}
+
+        for attempt, backend in enumerate(pool.candidates(key)[:ROUTER_RETRIES + 1]):
+            if deadline is not None:
+                # Узел получает остаток срока, а не исходный: часть ушла на прошлые попытки
+                remaining_ms = (deadline - time.monotonic()) * 1000.0
+                if remaining_ms <= 0:
+                    raise HTTPException(status_code=504, detail="Deadline exceeded")
+                headers['X-Deadline-Ms'] = f'{remaining_ms:.0f}'
+            if attempt:
+                backend.retried += 1
+
+            backend.outstanding += 1
+            try:
+                response = await client.post(f'{backend.url}/ocr', params=params, files=files, headers=headers)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                # Запрос до узла не дошёл: узел недоступен до следующей удачной проверки /readyz
+                backend.state = 'down'
+                backend.last_error = f"{type(e).__name__}: {e}"
+                continue
+            except httpx.TransportError as e:
+                # Запрос уже у узла (таймаут чтения/записи, обрыв ответа): повтор посчитал бы
+                # снимок второй раз, а узел, скорее всего, просто занят и остаётся в ротации
+                backend.last_error = f"{type(e).__name__}: {e}"
+                raise HTTPException(status_code=504, detail="OCR backend did not respond in time")
+            finally:
+                backend.outstanding -= 1
+
+            if response.status_code in _RETRY_STATUSES:
+                backend.state = 'overloaded'
+                continue
+            backend.served += 1
+            return Response(
+                content=response.content,
+                status_code=response.status_code,
+                media_type=response.headers.get('content-type'),
+            )
+
+        raise HTTPException(status_code=503, detail="No OCR backend is available", headers={'Retry-After': '1'})
+
+    return app
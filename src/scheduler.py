@@ -0,0 +1,151 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+
+# Классы приоритета: меньшее число обслуживается раньше.
+# high — полосы въезда (ответ нужен за ~1 с), low — повторная обработка в бэк-офисе
+PRIORITIES = {
+    'high': 0,
+    'normal': 1,
+    'low': 2,
+}
+DEFAULT_PRIORITY = 'normal'
+
+
+class DeadlineExceeded(Exception):
+    """Срок запроса истёк: результат уже никто не ждёт, работа прекращена."""
+
+
+def deadline_after(ms: Optional[float]) -> Optional[float]:
+    """Абсолютный срок (time.monotonic) через ms миллисекунд; None — без срока."""
+    if ms is None:
+        return None
+    return time.monotonic() + float(ms) / 1000.0
+
+
+def check_deadline(deadline: Optional[float], stage: str = '') -> None:
+    if deadline is not None and time.monotonic() > deadline:
+        raise DeadlineExceeded(stage)
+
+
+class PriorityScheduler:
+    """
+    Очередь работы движка: задачи выбираются по приоритету, внутри приоритета —
+    по ближайшему сроку, затем по порядку поступления. Задача с истёкшим сроком
+    не запускается; если срок истекает между этапами конвейера, задача сама
+    бросает DeadlineExceeded и тоже считается просроченной.
+
+    maxsize > 0 ограничивает очередь: submit ждёт свободного места (обратное давление).
+    """
+
+    def __init__(self, workers: int = 1, maxsize: int = 0, name: str = 'ocr-scheduler'):
+        self.workers = max(1, workers)
+        self.maxsize = maxsize
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._stats = {
+            lane: {'served': 0, 'expired': 0, 'failed': 0, 'queued': 0}
+            for lane in PRIORITIES
+        }
+        self._started_at = time.monotonic()
+        self._busy_seconds = 0.0
+        self._threads = [
+            threading.Thread(target=self._run, name=f'{name}-{i}', daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(
+        self,
+        fn: Callable,
+        priority: str = DEFAULT_PRIORITY,
+        deadline: Optional[float] = None,
+    ) -> Future:
+        """Ставит fn() в очередь; ValueError для неизвестного приоритета."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Неизвестный приоритет: {priority}")
+
+        future: Future = Future()
+        key = (PRIORITIES[priority], deadline if deadline is not None else math.inf, next(self._sequence))
+        with self._condition:
+            while self.maxsize and len(self._heap) >= self.maxsize and not self._closed:
+                self._condition.wait()
+            if self._closed:
+                raise RuntimeError("Планировщик остановлен")
+            heapq.heappush(self._heap, (key, priority, deadline, fn, future))
+            self._stats[priority]['queued'] += 1
+            self._condition.notify()
+        return future
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._heap and not self._closed:
+                    self._condition.wait()
+                if not self._heap:
+                    return
+                _, priority, deadline, fn, future = heapq.heappop(self._heap)
+                self._stats[priority]['queued'] -= 1
+                # Освободилось место: будим ждущих в submit
+                self._condition.notify_all()
+
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            start = time.monotonic()
+            try:
+                check_deadline(deadline, 'queue')
+                result = fn()
+            except DeadlineExceeded as e:
+                self._count(priority, 'expired')
+                future.set_exception(e)
+            except BaseException as e:
+                self._count(priority, 'failed')
+                future.set_exception(e)
+            else:
+                self._count(priority, 'served', time.monotonic() - start)
+                future.set_result(result)
+                continue
+            self._count(priority, None, time.monotonic() - start)
+
+    def _count(self, priority: str, key: Optional[str], busy_seconds: float = 0.0) -> None:
+        with self._condition:
+            if key is not None:
+                self._stats[priority][key] += 1
+            self._busy_seconds += busy_seconds
+
+    def depth(self) -> int:
+        with self._condition:
+            return len(self._heap)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._condition:
+            return {lane: dict(stats) for lane, stats in self._stats.items()}
+
+    def utilisation(self) -> Dict[str, float]:
+        """Доля времени, которую воркеры были заняты, с момента создания."""
+        with self._condition:
+            elapsed = max(time.monotonic() - self._started_at, 1e-6)
+            return {
+                'workers': self.workers,
+                'busy_seconds': round(self._busy_seconds, 3),
+                'utilisation': round(self._busy_seconds / (elapsed * self.workers), 4),
+                'depth': len(self._heap),
+            }
+
+    def close(self) -> None:
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
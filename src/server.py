@@ -0,0 +1,311 @@
+import asyncio
+import io
+import os
+from contextlib import asynccontextmanager
+from typing import BinaryIO, Callable, Dict, List, Optional
+
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from src.canary import Canary
+from src.engine import EngineRegistry, OcrEngine
+from src.frame_ingest import start_frame_server, stop_frame_server
+from src.jobs import JobQueue, JobWorkers, public_job, validate_callback_url
+from src.memory_profile import memory_profiler
+from src.model_swap import ModelSwapper
+from src.scheduler import PRIORITIES, DeadlineExceeded, deadline_after
+from src.singleflight import SingleFlight, content_hash
+from src.stack_profile import stack_profiler
+from src.test_speed import speed_report
+from src.upload import MaxBodySizeMiddleware, validate_upload
+
+
+# Предел незавершённых запросов узла: сверх него /ocr отвечает 503, и маршрутизатор
+# повторяет запрос на другом узле (0 — без ограничения). Вход конвейера не ограничен,
+# поэтому по умолчанию предел — вдвое больше, чем вмещают потоки и очереди этапов
+MAX_PENDING = int(os.environ['OCR_MAX_PENDING']) if os.environ.get('OCR_MAX_PENDING') else None
+
+# Токен административных методов (заголовок X-Admin-Token); пусто — методы выключены
+ADMIN_TOKEN = os.environ.get('OCR_ADMIN_TOKEN', '')
+
+
+class ModelSwapRequest(BaseModel):
+    # Путь к весам YOLO (car / container) или вариант и параметры PaddleOCR (ocr)
+    path: Optional[str] = None
+    variant: Optional[str] = None
+    options: Dict = {}
+    # > 0 — сначала теневой прогон на этой доле запросов, подмена через /promote
+    shadow_rate: float = 0.0
+
+
+def _max_pending(pipeline) -> int:
+    return MAX_PENDING if MAX_PENDING is not None else 2 * pipeline.capacity()
+
+
+def _require_admin(request: Request) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin API is disabled")
+    if request.headers.get('x-admin-token') != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def _upload_hash(image: UploadFile) -> str:
+    # Проверка заголовка и хеш содержимого читают весь файл: только в пуле потоков
+    return content_hash(validate_upload(image))
+
+
+def _take_upload(image: UploadFile) -> BinaryIO:
+    # Спул-буфер переходит к задаче: UploadFile закрывается вместе с запросом,
+    # а общая задача singleflight может его пережить. Вместо буфера у UploadFile
+    # остаётся пустой, его и закроет фреймворк
+    buffer = image.file
+    image.file = io.BytesIO()
+    buffer.seek(0)
+    return buffer
+
+
+def create_app(
+    allowed_origins: List[str],
+    engine_factory: Optional[Callable[..., OcrEngine]] = None,
+) -> FastAPI:
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Движок профиля по умолчанию (OCR_PROFILE) создаётся и прогревается сразу,
+        # остальные — при первом запросе с ?profile=
+        app.state.engines = EngineRegistry(
+            engine_factory=engine_factory,
+            warmup=os.environ.get('OCR_WARMUP', '1') != '0',
+        )
+        app.state.engine = app.state.engines.default
+        # Замена моделей на лету: /admin/models и наблюдение за файлами весов (OCR_MODEL_WATCH_SECONDS)
+        app.state.models = ModelSwapper(app.state.engines)
+        app.state.models.watch()
+        # Приём сырых кадров от граббера на этом же хосте (OCR_FRAME_SOCKET)
+        frame_server = start_frame_server(app.state.engine)
+        app.state.jobs = JobQueue()
+        # Фоновые задачи идут с низким приоритетом и не задерживают запросы полос въезда
+        job_workers = JobWorkers(
+            app.state.jobs,
+            lambda image: app.state.engine.submit(image, priority='low').result()['info'],
+        )
+        job_workers.start()
+        # Эталонные снимки в фоне с низким приоритетом: задержка и ответы для /readyz и /test-speed
+        app.state.canary = Canary(lambda: app.state.engine)
+        app.state.canary.start()
+        yield
+        app.state.canary.close()
+        if job_workers.stop():
+            app.state.jobs.close()
+        else:
+            # Зависшие потоки ещё могут писать в базу: соединение остаётся открытым до выхода процесса
+            print("⚠️ Потоки фоновых задач не завершились, очередь задач не закрыта")
+        stop_frame_server(frame_server)
+        app.state.models.close()
+        app.state.engines.close()
+
+    app = FastAPI(title="Tezport OCR API", lifespan=lifespan)
+    app.state.singleflight = SingleFlight()
+
+    app.add_middleware(MaxBodySizeMiddleware)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=allowed_origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    @app.get("/")
+    async def root():
+        return {"status": "ok", "message": "Tezport OCR API is running"}
+
+    @app.get("/readyz")
+    async def readyz(request: Request):
+        # Готовность и загрузка узла для маршрутизатора (src.router)
+        pipeline = request.app.state.engine.pipeline
+        pending = pipeline.pending()
+        max_pending = _max_pending(pipeline)
+        overloaded = bool(max_pending) and pending >= max_pending
+        # Деградация по канарейке тоже выводит узел из ротации балансировщика и маршрутизатора;
+        # прямые запросы /ocr узел по-прежнему обслуживает
+        degraded = request.app.state.canary.degraded()
+        return JSONResponse(
+            {
+                'status': 'overloaded' if overloaded else 'degraded' if degraded else 'ready',
+                'pending': pending,
+                'max_pending': max_pending,
+                'degraded': bool(degraded),
+                'degraded_reasons': degraded,
+            },
+            status_code=503 if overloaded or degraded else 200,
+        )
+
+    @app.get("/test-speed")
+    async def test_speed_local(request: Request):
+        # Последний прогон канарейки: сам запрос ничего не распознаёт
+        canary = request.app.state.canary
+        last = canary.last_result()
+        report = speed_report(last) if last is not None else {}
+        return {**report, 'canary': canary.stats()}
+
+    @app.post("/ocr")
+    async def ocr_image(
+        request: Request,
+        image: UploadFile = File(...),
+        camera_id: Optional[str] = None,
+        profile: Optional[str] = None,
+        priority: Optional[str] = None,
+        deadline_ms: Optional[float] = None,
+    ):
+        # Приоритет и срок ответа: query-параметры или заголовки X-Priority / X-Deadline-Ms
+        priority = priority or request.headers.get('x-priority', 'normal')
+        if priority not in PRIORITIES:
+            raise HTTPException(status_code=400, detail=f"Unknown priority: {priority}")
+        if deadline_ms is None and 'x-deadline-ms' in request.headers:
+            try:
+                deadline_ms = float(request.headers['x-deadline-ms'])
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid X-Deadline-Ms header")
+        deadline = deadline_after(deadline_ms)
+
+        pipeline = request.app.state.engine.pipeline
+        max_pending = _max_pending(pipeline)
+        if max_pending and pipeline.pending() >= max_pending:
+            raise HTTPException(status_code=503, detail="Node is overloaded", headers={'Retry-After': '1'})
+
+        upload_hash = await run_in_threadpool(_upload_hash, image)
+        # Профилирование стеков: доля запросов (OCR_STACK_PROFILE_RATE) или заголовок с токеном администратора
+        profiled = stack_profiler.should_profile(
+            bool(ADMIN_TOKEN) and request.headers.get('x-debug-profile') == ADMIN_TOKEN
+        )
+        try:
+            engine = await run_in_threadpool(request.app.state.engines.get, profile)
+        except KeyError:
+            raise HTTPException(status_code=400, detail=f"Unknown profile: {profile}")
+
+        def recognize() -> asyncio.Future:
+            # Вызывается синхронно только у запроса, запустившего расчёт: буфер забирается
+            # до того, как этот запрос может завершиться, и закрывается по готовности задачи
+            buffer = _take_upload(image)
+            future = engine.submit(buffer, camera_id, priority, deadline, profiled)
+            future.add_done_callback(lambda _: buffer.close())
+            return asyncio.wrap_future(future)
+
+        # Повтор клиента после таймаута присоединяется к уже идущему расчёту
+        try:
+            # Камера (её память областей) и приоритет — часть ключа: чужой расчёт не подходит
+            analysis = await request.app.state.singleflight.do(
+                f"{profile or request.app.state.engines.default_profile}:{camera_id or ''}:{priority}:{upload_hash}",
+                recognize,
+                deadline,
+            )
+        except DeadlineExceeded:
+            raise HTTPException(status_code=504, detail="Deadline exceeded")
+        return dict(analysis['info'])
+
+    @app.get("/stats")
+    async def stats(request: Request):
+        engine = request.app.state.engine
+        return {
+            'profiles': sorted(request.app.state.engines.engines()),
+            'singleflight': request.app.state.singleflight.stats(),
+            'jobs': {'depth': request.app.state.jobs.depth()},
+            # Загрузка и очередь по этапам: узкое место — этап с utilisation около 1
+            'pipeline': engine.pipeline.stats(),
+            'roi_memory': engine.roi_memory.stats() if engine.roi_memory else None,
+            'artifacts': engine.artifacts.stats() if engine.artifacts else None,
+        }
+
+    @app.post("/jobs", status_code=202)
+    def create_job(
+        request: Request,
+        image: UploadFile = File(...),
+        callback_url: Optional[str] = Form(None),
+    ):
+        if callback_url:
+            try:
+                validate_callback_url(callback_url)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        buffer = validate_upload(image)
+        job_id = request.app.state.jobs.submit(buffer, callback_url)
+        return {'id': job_id, 'status': 'queued'}
+
+    @app.get("/jobs/{job_id}")
+    def get_job(request: Request, job_id: str):
+        job = request.app.state.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return public_job(job)
+
+    @app.get("/debug/memory")
+    async def debug_memory():
+        # Включается OCR_MEMORY_PROFILE=1
+        if not memory_profiler.enabled:
+            raise HTTPException(status_code=404, detail="Memory profiling is disabled")
+        return memory_profiler.stats()
+
+    @app.get("/admin/models")
+    async def model_status(request: Request):
+        _require_admin(request)
+        return request.app.state.models.status()
+
+    @app.post("/admin/models/promote")
+    async def promote_model(request: Request):
+        _require_admin(request)
+        try:
+            return await run_in_threadpool(request.app.state.models.promote)
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+
+    @app.post("/admin/models/discard")
+    async def discard_model(request: Request):
+        _require_admin(request)
+        return await run_in_threadpool(request.app.state.models.discard)
+
+    @app.post("/admin/models/{kind}", status_code=202)
+    async def swap_model(request: Request, kind: str, body: ModelSwapRequest):
+        # Загрузка и прогрев идут в фоне; состояние — GET /admin/models
+        _require_admin(request)
+        try:
+            return request.app.state.models.start(
+                kind, body.path, body.variant, body.options, body.shadow_rate,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+
+    @app.get("/admin/profiles")
+    async def download_profiles(request: Request, format: str = 'json', reset: bool = False):
+        # collapsed — текст для flamegraph.pl / speedscope; json — стеки, горячие функции и время этапов запросов
+        _require_admin(request)
+        if format == 'collapsed':
+            response = PlainTextResponse(
+                stack_profiler.collapsed(),
+                headers={'Content-Disposition': 'attachment; filename="ocr-stacks.txt"'},
+            )
+        elif format == 'json':
+            response = {
+                **stack_profiler.stats(),
+                'top': stack_profiler.top(),
+                'collapsed': stack_profiler.collapsed(),
+            }
+        else:
+            raise HTTPException(status_code=400, detail=f"Unknown format: {format}")
+        if reset:
+            stack_profiler.reset()
+        return response
+
+    @app.post("/admin/canary/reset")
+    async def reset_canary(request: Request):
+        # После намеренной замены модели: ожидаемые ответы и базовая задержка снимаются заново
+        _require_admin(request)
+        request.app.state.canary.reset()
+        return request.app.state.canary.stats()
+
+    return app
@@ -0,0 +1,77 @@
+import asyncio
+import hashlib
+import time
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, Optional, Tuple
+
+from src.scheduler import DeadlineExceeded
+
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def content_hash(buffer: BinaryIO) -> str:
+    """Хеш содержимого файла по частям, без копирования всего буфера в память."""
+    digest = hashlib.blake2b(digest_size=16)
+    buffer.seek(0)
+    for chunk in iter(lambda: buffer.read(_HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    buffer.seek(0)
+    return digest.hexdigest()
+
+
+def _covers(running: Optional[float], deadline: Optional[float]) -> bool:
+    # Идущая задача без срока подходит всем; со сроком — только тем, кто готов ждать не дольше
+    if running is None:
+        return True
+    return deadline is not None and running >= deadline
+
+
+class SingleFlight:
+    """
+    Таблица выполняющихся запросов по ключу: одновременные вызовы с тем же
+    ключом не запускают работу заново, а ждут результат уже идущей задачи.
+    Задача не отменяется, если отменён запрос, который её запустил.
+
+    deadline — срок по time.monotonic(). Вызов присоединяется к идущей задаче,
+    только если её срок не раньше его собственного (иначе задача могла бы
+    прерваться раньше, чем нужно ему), и ждёт её не дольше своего срока.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, Tuple[asyncio.Task, Optional[float]]] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], deadline: Optional[float] = None) -> Any:
+        entry = self._inflight.get(key)
+        if entry is not None and _covers(entry[1], deadline):
+            task = entry[0]
+            self.coalesced += 1
+        else:
+            self.started += 1
+            task = asyncio.ensure_future(fn())
+            if entry is None:
+                self._inflight[key] = (task, deadline)
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+
+        if deadline is None:
+            return await asyncio.shield(task)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("singleflight")
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        entry = self._inflight.get(key)
+        if entry is not None and entry[0] is task:
+            del self._inflight[key]
+        # Исключение забираем, даже если ждавших уже не осталось
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'started': self.started,
+            'coalesced': self.coalesced,
+            'inflight': len(self._inflight),
+        }
@@ -0,0 +1,167 @@
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, List, Optional
+
+
+# Доля запросов /ocr, которые профилируются (0 — только по заголовку X-Debug-Profile)
+STACK_PROFILE_RATE = float(os.environ.get('OCR_STACK_PROFILE_RATE', 0))
+# Период снятия стеков, сек
+STACK_PROFILE_INTERVAL_SECONDS = float(os.environ.get('OCR_STACK_PROFILE_INTERVAL_SECONDS', 0.005))
+# Сколько последних профилированных запросов хранится вместе с их временем этапов
+STACK_PROFILE_REQUESTS = 200
+
+
+def _frame_name(frame) -> str:
+    # Модуль и функция без номера строки: вызовы одной функции сливаются в один кадр графа
+    module = frame.f_globals.get('__name__', '?')
+    return f"{module}:{frame.f_code.co_name}"
+
+
+class _Tracked:
+    def __init__(self, profiler: 'StackProfiler', stage: str, key: int):
+        self.profiler = profiler
+        self.stage = stage
+        self.key = key
+
+    def __enter__(self):
+        # Корень стека — функция, вызвавшая этап: кадры потока-воркера ниже неё не нужны
+        self.profiler._enter(self.stage, self.key, sys._getframe(1))
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._exit()
+        return False
+
+
+class StackProfiler:
+    """
+    Статистический профайлер выбранных запросов: фоновый поток раз в interval
+    снимает стеки (sys._current_frames) только тех потоков, что сейчас выполняют
+    этап профилируемого запроса, и считает одинаковые стеки. Результат —
+    collapsed-формат для flamegraph.pl / speedscope: «этап;модуль:функция;... N».
+
+    Поток работает только пока идёт хотя бы один профилируемый этап; запросы
+    без профилирования ничего не платят. Код в C (Paddle, torch, Pillow) виден
+    как вызвавшая его функция Python.
+    """
+
+    def __init__(
+        self,
+        rate: float = STACK_PROFILE_RATE,
+        interval: float = STACK_PROFILE_INTERVAL_SECONDS,
+        max_requests: int = STACK_PROFILE_REQUESTS,
+    ):
+        self.rate = rate
+        self.interval = interval
+        self._lock = threading.Condition()
+        # Поток → (этап, ключ запроса, корневой кадр)
+        self._active: Dict[int, tuple] = {}
+        self._stacks: Counter = Counter()
+        self._samples = 0
+        self._request_samples: Counter = Counter()
+        self._requests: deque = deque(maxlen=max_requests)
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def should_profile(self, forced: bool = False) -> bool:
+        return forced or (self.rate > 0 and random.random() < self.rate)
+
+    def track(self, stage: str, key: int) -> _Tracked:
+        """Контекст этапа профилируемого запроса в текущем потоке; key — идентификатор запроса."""
+        return _Tracked(self, stage, key)
+
+    def _enter(self, stage: str, key: int, root) -> None:
+        with self._lock:
+            self._active[threading.get_ident()] = (stage, key, root)
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name='ocr-stack-profiler', daemon=True)
+                self._thread.start()
+            self._lock.notify_all()
+
+    def _exit(self) -> None:
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._active and not self._closed:
+                    self._lock.wait()
+                if self._closed:
+                    return
+            time.sleep(self.interval)
+            self._sample()
+
+    def _sample(self) -> None:
+        frames = sys._current_frames()
+        with self._lock:
+            for ident, (stage, key, root) in self._active.items():
+                frame = frames.get(ident)
+                names = []
+                while frame is not None and frame is not root:
+                    names.append(_frame_name(frame))
+                    frame = frame.f_back
+                names.append(stage)
+                self._stacks[';'.join(reversed(names))] += 1
+                self._request_samples[key] += 1
+                self._samples += 1
+
+    def record_request(self, key: int, details: Dict) -> None:
+        """Время этапов завершённого профилируемого запроса и число снятых с него стеков."""
+        with self._lock:
+            samples = self._request_samples.pop(key, 0)
+            self._requests.append({'at': time.time(), 'samples': samples, **details})
+
+    def discard(self, key: int) -> None:
+        """Забывает несведённые стеки запроса: он снят с очереди по сроку или завершён."""
+        with self._lock:
+            self._request_samples.pop(key, None)
+
+    def collapsed(self) -> str:
+        with self._lock:
+            stacks = sorted(self._stacks.items(), key=lambda item: item[1], reverse=True)
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'interval_seconds': self.interval,
+                'samples': self._samples,
+                'stacks': len(self._stacks),
+                'requests': list(self._requests),
+            }
+
+    def top(self, limit: int = 20) -> List[Dict]:
+        """Самые частые функции по числу стеков, где они на вершине (собственное время)."""
+        leaves: Counter = Counter()
+        with self._lock:
+            for stack, count in self._stacks.items():
+                leaves[stack.rsplit(';', 1)[-1]] += count
+            total = self._samples
+        return [
+            {'frame': frame, 'samples': count, 'share': count / total if total else 0.0}
+            for frame, count in leaves.most_common(limit)
+        ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stacks.clear()
+            self._request_samples.clear()
+            self._requests.clear()
+            self._samples = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+
+stack_profiler = StackProfiler()
@@ -0,0 +1,119 @@
+import os
+from typing import BinaryIO
+
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+
+MAX_UPLOAD_BYTES = int(float(os.environ.get('OCR_MAX_UPLOAD_MB', 20)) * 1024 * 1024)
+MAX_IMAGE_PIXELS = int(os.environ.get('OCR_MAX_IMAGE_PIXELS', 50_000_000))
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'WEBP', 'BMP'}
+
+# Защита от decompression bomb и для путей, которые не проходят через validate_upload
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+
+class MaxBodySizeMiddleware:
+    """
+    ASGI middleware: отклоняет запросы больше max_bytes до разбора multipart.
+    Проверяет Content-Length, а для chunked-загрузок считает байты на лету.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] not in ('POST', 'PUT'):
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get('headers', []):
+            if name == b'content-length':
+                try:
+                    too_large = int(value) > self.max_bytes
+                except ValueError:
+                    too_large = False
+                if too_large:
+                    await _send_too_large(send, self.max_bytes)
+                    return
+                break
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > self.max_bytes:
+                    raise _BodyTooLarge()
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            if message['type'] == 'http.response.start':
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except _BodyTooLarge:
+            if not response_started:
+                await _send_too_large(send, self.max_bytes)
+
+
+class _BodyTooLarge(HTTPException):
+    # HTTPException, чтобы FastAPI не превратил её в 400 при разборе формы
+    def __init__(self):
+        super().__init__(status_code=413, detail="Request body is too large")
+
+
+async def _send_too_large(send, max_bytes: int) -> None:
+    body = f'{{"detail":"Request body exceeds {max_bytes} bytes"}}'.encode()
+    await send({
+        'type': 'http.response.start',
+        'status': 413,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def validate_upload(image: UploadFile) -> BinaryIO:
+    """
+    Проверяет загруженный файл по заголовку (формат, размеры) без декодирования
+    пикселей и возвращает спул-буфер UploadFile без копирования.
+    """
+    buffer = image.file
+
+    size = image.size
+    if size is None:
+        buffer.seek(0, os.SEEK_END)
+        size = buffer.tell()
+    if size == 0:
+        raise HTTPException(status_code=400, detail="Empty image")
+    if size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image exceeds {MAX_UPLOAD_BYTES} bytes")
+
+    buffer.seek(0)
+    try:
+        # Image.open читает только заголовок; пиксели декодируются позже
+        with Image.open(buffer) as img:
+            image_format = img.format
+            width, height = img.size
+    except Image.DecompressionBombError:
+        raise HTTPException(status_code=413, detail="Image dimensions are too large")
+    except Exception:
+        raise HTTPException(status_code=415, detail="Unsupported or corrupted image")
+
+    if image_format not in ALLOWED_FORMATS:
+        raise HTTPException(status_code=415, detail=f"Unsupported image format: {image_format}")
+    if width * height > MAX_IMAGE_PIXELS:
+        raise HTTPException(status_code=413, detail="Image dimensions are too large")
+
+    buffer.seek(0)
+    return buffer
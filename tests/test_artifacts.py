@@ -0,0 +1,63 @@
+import io
+import json
+import os
+import time
+
+from src.artifacts import ArtifactWriter, sample_reason
+from src.get_info import has_check_digit_failure
+
+
+def _analysis(texts, info, detect='container'):
+    return {'detect': detect, 'found': True, 'texts': texts, 'scores': [0.9] * len(texts), 'info': info, 'timings': {}}
+
+
+def test_check_digit_failure_needs_a_wrong_check_digit():
+    assert has_check_digit_failure(['MSKU 807409 5'])
+    # Правильный номер, который get_info не вернул, — не ошибка контрольной цифры
+    assert not has_check_digit_failure(['MSKU 807409 4'])
+    assert not has_check_digit_failure(['TARE', '2200 KG'])
+
+
+def test_sample_reason():
+    assert sample_reason('container', ['MSKU8074094'], {'number': 'MSKU8074094'}) == 'success'
+    assert sample_reason('container', ['MSKU8074095'], {'number': ''}) == 'check_digit'
+    assert sample_reason('container', ['MSKU8074094'], {'number': ''}) == 'empty'
+    assert sample_reason('car', ['A123BC77'], {'car': ''}) == 'empty'
+
+
+def test_sampled_request_is_written(tmp_path):
+    writer = ArtifactWriter(str(tmp_path), sample_rates={'check_digit': 1.0, 'empty': 0.0})
+    reason = writer.maybe_submit(
+        io.BytesIO(b'\xff\xd8jpeg'),
+        _analysis(['MSKU8074095'], {'number': ''}),
+        {'camera_id': 'gate-1', 'crops': [io.BytesIO(b'\x89PNGcrop')], 'enhanced': []},
+    )
+    assert writer.maybe_submit(io.BytesIO(b'x'), _analysis(['TARE'], {'number': ''}), {}) is None
+    writer.close()
+
+    assert reason == 'check_digit'
+    (entry,) = tmp_path.iterdir()
+    assert sorted(item.name for item in entry.iterdir()) == ['crop_0.png', 'meta.json', 'original.jpg']
+    meta = json.loads((entry / 'meta.json').read_text(encoding='utf-8'))
+    assert meta['reason'] == 'check_digit' and meta['camera_id'] == 'gate-1'
+    assert writer.stats()['written'] == 1
+
+
+def test_retention_by_size_and_age(tmp_path):
+    old = tmp_path / 'old'
+    old.mkdir()
+    (old / 'original.jpg').write_bytes(b'x' * 10)
+    stale = time.time() - 7200
+    os.utime(old, (stale, stale))
+
+    writer = ArtifactWriter(str(tmp_path), sample_rates={'success': 1.0}, max_bytes=1000, max_age_seconds=3600)
+    for _ in range(3):
+        writer.maybe_submit(io.BytesIO(b'\xff\xd8' + b'x' * 100), _analysis(['MSKU8074094'], {'number': 'MSKU8074094'}), {})
+    writer.close()
+
+    # Старый каталог удалён по возрасту, из новых остались самые свежие в пределах бюджета
+    assert not old.exists()
+    stats = writer.stats()
+    assert stats['written'] == 3
+    assert 0 < stats['stored'] < 3
+    assert stats['stored_bytes'] <= 1000
@@ -0,0 +1,92 @@
+from concurrent.futures import Future
+
+from fastapi.testclient import TestClient
+
+from src.canary import CANARY_BASELINE_RUNS, Canary
+from src.pipeline import StagedPipeline
+from src.server import create_app
+
+
+class FakeEngine:
+    def __init__(self):
+        self.info = {'number': 'MSKU8074094', 'type': '22G1'}
+        self.seconds = 0.1
+        self.error = None
+        self.submitted = []
+        self.pipeline = StagedPipeline([('info', lambda job: job, 1)])
+
+    def submit(self, image, priority='normal', synthetic=False):
+        self.submitted.append((priority, synthetic))
+        future = Future()
+        if self.error is not None:
+            future.set_exception(self.error)
+        else:
+            future.set_result({'info': dict(self.info), 'timings': {'ocr': self.seconds, 'total': 5.0}})
+        return future
+
+
+def _canary(tmp_path, engine):
+    image = tmp_path / 'reference.jpg'
+    image.write_bytes(b'\xff\xd8jpeg')
+    return Canary(lambda: engine, images=[image], interval=0, latency_factor=2.0)
+
+
+def test_healthy_after_baseline(tmp_path):
+    engine = FakeEngine()
+    canary = _canary(tmp_path, engine)
+    for _ in range(CANARY_BASELINE_RUNS + 2):
+        canary.run_once()
+
+    assert canary.degraded() == []
+    # Служебный прогон с низким приоритетом, не попадает в артефакты и теневой прогон
+    assert set(engine.submitted) == {('low', True)}
+    stats = canary.stats()['images']['reference.jpg']
+    assert stats['matches'] == stats['runs'] == CANARY_BASELINE_RUNS + 2
+    # Задержка — время этапов без ожидания в очереди
+    assert stats['baseline_seconds'] == 0.1
+
+
+def test_degraded_on_changed_answer_latency_and_error(tmp_path):
+    engine = FakeEngine()
+    canary = _canary(tmp_path, engine)
+    for _ in range(CANARY_BASELINE_RUNS):
+        canary.run_once()
+
+    engine.info = {'number': 'MSKU8074095', 'type': '22G1'}
+    canary.run_once()
+    assert canary.degraded() == ['reference.jpg: ответ изменился']
+
+    engine.info = {'number': 'MSKU8074094', 'type': '22G1'}
+    engine.seconds = 1.0
+    for _ in range(CANARY_BASELINE_RUNS * 2):
+        canary.run_once()
+    assert canary.degraded()[0].startswith('reference.jpg: задержка')
+
+    engine.error = RuntimeError("CUDA error")
+    canary.run_once()
+    assert canary.degraded() == ['reference.jpg: ошибка прогона']
+
+    canary.reset()
+    assert canary.degraded() == []
+
+
+def test_readyz_is_503_when_degraded(tmp_path):
+    engine = FakeEngine()
+    canary = _canary(tmp_path, engine)
+    app = create_app(['*'])
+    # Без lifespan: состояние узла подставляется напрямую
+    app.state.engine = engine
+    app.state.canary = canary
+    client = TestClient(app)
+
+    canary.run_once()
+    response = client.get('/readyz')
+    assert response.status_code == 200 and response.json()['status'] == 'ready'
+
+    engine.error = RuntimeError("CUDA error")
+    canary.run_once()
+    response = client.get('/readyz')
+    assert response.status_code == 503
+    assert response.json()['status'] == 'degraded'
+    assert response.json()['degraded_reasons'] == ['reference.jpg: ошибка прогона']
+    engine.pipeline.close()
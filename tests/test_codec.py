@@ -0,0 +1,109 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src import codec
+
+
+class _TrackingCodec(codec.PillowCodec):
+    """Кодек «не Pillow»: считает вызовы, декодирует тем же Pillow."""
+    name = 'tracking'
+
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+
+    def decode_jpeg(self, data, reduction=1):
+        self.calls += 1
+        if self.fail:
+            raise ValueError("CMYK")
+        return super().decode_jpeg(data, reduction)
+
+
+def _jpeg(width=320, height=240, orientation=None):
+    array = np.zeros((height, width, 3), dtype=np.uint8)
+    array[:, : width // 2] = (200, 30, 30)
+    img = Image.fromarray(array)
+    buffer = io.BytesIO()
+    if orientation is None:
+        img.save(buffer, "JPEG", quality=90)
+    else:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        img.save(buffer, "JPEG", quality=90, exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+def test_select_codec_by_name_and_auto():
+    assert isinstance(codec.select_codec('pillow'), codec.PillowCodec)
+    assert 'pillow' in codec.available_codecs()
+    # auto берёт первый установленный по CODEC_PREFERENCE
+    expected = next(name for name in codec.CODEC_PREFERENCE if name in codec.available_codecs())
+    assert codec.select_codec('auto').name == expected
+    with pytest.raises(ValueError):
+        codec.select_codec('gif')
+
+
+def test_pillow_round_trip_and_draft_reduction():
+    pillow = codec.PillowCodec()
+    array = pillow.decode_jpeg(_jpeg())
+    assert array.shape == (240, 320, 3)
+    assert array[0, 0, 0] > 150 and array[0, -1, 0] < 50
+
+    reduced = pillow.decode_jpeg(_jpeg(), reduction=4)
+    assert reduced.shape == (60, 80, 3)
+
+    encoded = pillow.encode_jpeg(array, quality=80)
+    assert Image.open(io.BytesIO(encoded)).size == (320, 240)
+
+
+def test_jpeg_reduction_keeps_long_side_above_target():
+    assert codec.jpeg_reduction((4000, 3000), None) == 1
+    assert codec.jpeg_reduction((4000, 3000), 1280) == 2
+    assert codec.jpeg_reduction((4000, 3000), 500) == 8
+    assert codec.jpeg_reduction((640, 480), 1280) == 1
+
+
+def test_read_source_accepts_bytes_buffers_files_and_paths(tmp_path):
+    data = _jpeg()
+    path = tmp_path / 'frame.jpg'
+    path.write_bytes(data)
+
+    assert codec.read_source(io.BytesIO(data)) == data
+    assert codec.read_source(path) == data
+    assert codec.read_source(str(path)) == data
+    with open(path, 'rb') as handle:
+        handle.read(10)
+        assert codec.read_source(handle) == data
+        assert handle.tell() == 0
+
+
+def test_decode_falls_back_to_pillow_when_codec_fails(monkeypatch):
+    failing = _TrackingCodec(fail=True)
+    monkeypatch.setattr(codec, 'jpeg_codec', failing)
+
+    array = codec.decode_jpeg(_jpeg())
+    assert failing.calls == 1
+    assert array.shape == (240, 320, 3)
+
+
+def test_open_image_uses_codec_unless_exif_rotates(monkeypatch):
+    tracking = _TrackingCodec()
+    monkeypatch.setattr(codec, 'jpeg_codec', tracking)
+
+    plain = codec.open_image(io.BytesIO(_jpeg()))
+    assert tracking.calls == 1
+    assert plain.size == (320, 240)
+
+    # С поворотом в EXIF снимок остаётся в Pillow, чтобы exif_transpose его развернул
+    rotated = codec.open_image(io.BytesIO(_jpeg(orientation=6)))
+    assert tracking.calls == 1
+    assert rotated.format == 'JPEG'
+    assert rotated.getexif().get(0x0112) == 6
+
+    png = io.BytesIO()
+    Image.new('RGB', (10, 10)).save(png, "PNG")
+    assert codec.open_image(png).format == 'PNG'
+    assert tracking.calls == 1
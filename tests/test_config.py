@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+from src.config import DEFAULT_PROFILE, get_config, load_overrides, save_overrides
+
+
+def test_save_overrides_round_trip(tmp_path):
+    path = tmp_path / 'ocr_config.json'
+    path.write_text(json.dumps({'note': 'оставить', 'profiles': {DEFAULT_PROFILE: {'confidence': 0.4}}}), encoding='utf-8')
+
+    save_overrides(DEFAULT_PROFILE, {'car_input_size': 512, 'container_input_size': 768}, path)
+
+    data = json.loads(path.read_text(encoding='utf-8'))
+    assert data['note'] == 'оставить'
+    assert load_overrides(path)[DEFAULT_PROFILE] == {'confidence': 0.4, 'car_input_size': 512, 'container_input_size': 768}
+    config = get_config(DEFAULT_PROFILE, path)
+    assert (config.confidence, config.car_input_size, config.container_input_size) == (0.4, 512, 768)
+    assert not path.with_name(path.name + '.tmp').exists()
+
+
+def test_save_overrides_creates_file(tmp_path):
+    path = tmp_path / 'ocr_config.json'
+    save_overrides(DEFAULT_PROFILE, {'car_input_size': 448}, path)
+    assert get_config(DEFAULT_PROFILE, path).car_input_size == 448
+
+
+def test_save_overrides_rejects_unknown(tmp_path):
+    path = tmp_path / 'ocr_config.json'
+    with pytest.raises(KeyError):
+        save_overrides('nope', {'car_input_size': 448}, path)
+    with pytest.raises(ValueError):
+        save_overrides(DEFAULT_PROFILE, {'imgsz': 448}, path)
+    assert not path.exists()
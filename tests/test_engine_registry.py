@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+from src.engine import EngineRegistry
+
+
+class FakeEngine:
+    def __init__(self, config, **shared):
+        self.config = config
+        self.shared = shared
+        self.pipeline = shared.get('pipeline', object())
+        self.roi_memory = None
+        self.artifacts = None
+        self.car_model = self.container_model = self.ocr = object()
+        self._detector_lock = self._ocr_lock = threading.Lock()
+
+    def close(self):
+        pass
+
+
+def _registry(slow_profile=None, release=None, fail=None):
+    built = []
+
+    def factory(config, **shared):
+        name = 'fast' if config.ocr_variant == 'mobile' else 'accurate' if config.top_k_regions == 2 else 'balanced'
+        built.append(name)
+        if name == slow_profile:
+            release.wait(5)
+        if name == fail and built.count(name) == 1:
+            raise RuntimeError("модель не загрузилась")
+        return FakeEngine(config, **shared)
+
+    return EngineRegistry('balanced', factory, warmup=False), built
+
+
+def test_built_engine_is_returned_while_another_profile_loads():
+    release = threading.Event()
+    registry, built = _registry('accurate', release)
+    default = registry.default
+
+    results = []
+    loaders = [threading.Thread(target=lambda: results.append(registry.get('accurate'))) for _ in range(3)]
+    for thread in loaders:
+        thread.start()
+    time.sleep(0.1)
+
+    start = time.monotonic()
+    assert registry.get() is default
+    assert time.monotonic() - start < 0.05
+
+    release.set()
+    for thread in loaders:
+        thread.join(5)
+    # Профиль загружен один раз, все ждавшие получили тот же движок
+    assert built == ['balanced', 'accurate']
+    assert len(results) == 3 and all(engine is results[0] for engine in results)
+    assert results[0].pipeline is default.pipeline
+
+
+def test_failed_build_is_reported_and_retried():
+    registry, built = _registry(fail='fast')
+    registry.default
+    with pytest.raises(RuntimeError):
+        registry.get('fast')
+    assert registry.get('fast').config.ocr_variant == 'mobile'
+    assert built == ['balanced', 'fast', 'fast']
+
+
+def test_unknown_profile():
+    registry, _ = _registry()
+    with pytest.raises(KeyError):
+        registry.get('nope')
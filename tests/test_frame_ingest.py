@@ -0,0 +1,124 @@
+import json
+import os
+import socket
+import stat
+import threading
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from src.frame_ingest import FrameClient, FrameIngestServer, start_frame_server, stop_frame_server
+
+
+class _FakeEngine:
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, frame, camera_id, priority, deadline):
+        self.calls.append((frame.shape, camera_id, priority, deadline))
+        future = Future()
+        future.set_result({'info': {'sum': str(int(frame.sum()))}})
+        return future
+
+
+@pytest.fixture
+def server(tmp_path):
+    calls = []
+
+    def recognize(frame, camera_id, priority, deadline):
+        calls.append((camera_id, priority, deadline))
+        return {'shape': list(frame.shape), 'sum': int(frame.sum())}
+
+    server = FrameIngestServer(str(tmp_path / 'frames.sock'), recognize)
+    server.calls = calls
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _send(socket_path, *messages):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        reader = sock.makefile('rb')
+        responses = []
+        for message in messages:
+            payload = message if isinstance(message, bytes) else json.dumps(message).encode()
+            sock.sendall(payload + b'\n')
+            responses.append(json.loads(reader.readline()))
+        reader.close()
+        return responses
+
+
+def test_socket_is_owner_only(server):
+    mode = stat.S_IMODE(os.stat(server.socket_path).st_mode)
+    assert mode == 0o600
+
+
+def test_client_round_trip_through_ring_slots(server):
+    client = FrameClient(server.socket_path, width=4, height=2, slots=2, camera_id='gate-1')
+    try:
+        first = client.recognize(np.ones((2, 4, 3), dtype=np.uint8))
+        assert first == {'shape': [2, 4, 3], 'sum': 24}
+
+        # Кадр пишется прямо в слот без промежуточной копии
+        client.slot(1)[...] = 2
+        assert client.recognize(index=1) == {'shape': [2, 4, 3], 'sum': 48}
+        assert server.calls[0] == ('gate-1', 'high', None)
+    finally:
+        client.close()
+
+
+def test_framing_errors_do_not_drop_connection(server):
+    client = FrameClient(server.socket_path, width=2, height=2, slots=1)
+    try:
+        too_large = {'shm': client.segment.name, 'width': 100, 'height': 100}
+        responses = _send(
+            server.socket_path,
+            b'{not json',
+            too_large,
+            {'shm': client.segment.name, 'width': 2, 'height': 2, 'priority': 'low', 'deadline_ms': 500},
+        )
+    finally:
+        client.close()
+
+    assert 'error' in responses[0]
+    assert 'does not fit' in responses[1]['error']
+    assert responses[2] == {'shape': [2, 2, 3], 'sum': 0}
+    _, priority, deadline = server.calls[-1]
+    assert priority == 'low' and deadline is not None
+
+
+def test_rejects_foreign_segments(server):
+    foreign = shared_memory.SharedMemory(create=True, size=64)
+    try:
+        responses = _send(
+            server.socket_path,
+            {'shm': foreign.name, 'width': 1, 'height': 1},
+            {'shm': 'tezport-frames-../../etc', 'width': 1, 'height': 1},
+        )
+    finally:
+        foreign.close()
+        foreign.unlink()
+
+    assert all('tezport-frames-' in response['error'] for response in responses)
+    assert server.calls == []
+
+
+def test_start_frame_server_submits_to_engine(tmp_path):
+    assert start_frame_server(_FakeEngine(), socket_path=None) is None
+
+    engine = _FakeEngine()
+    socket_path = str(tmp_path / 'engine.sock')
+    server = start_frame_server(engine, socket_path)
+    client = FrameClient(socket_path, width=3, height=1, camera_id='gate-2')
+    try:
+        assert client.recognize(np.full((1, 3, 3), 5, dtype=np.uint8)) == {'sum': '45'}
+    finally:
+        client.close()
+        stop_frame_server(server)
+
+    assert engine.calls == [((1, 3, 3), 'gate-2', 'high', None)]
+    assert not os.path.exists(socket_path)
@@ -0,0 +1,164 @@
+import http.server
+import io
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from src import jobs
+from src.jobs import JobQueue
+
+
+def test_failed_job_is_retried_with_backoff(tmp_path):
+    queue = JobQueue(tmp_path, max_attempts=2, ttl_seconds=3600)
+    job_id = queue.submit(io.BytesIO(b'image'))
+
+    job = queue.claim()
+    assert job['id'] == job_id and job['attempts'] == 1
+    assert queue.fail(job_id, 'сбой') == 'queued'
+    # Повтор доступен только после задержки
+    assert queue.claim() is None
+
+    with queue._lock, queue._conn:
+        queue._conn.execute("UPDATE jobs SET available_at = 0 WHERE id = ?", (job_id,))
+    job = queue.claim()
+    assert job['attempts'] == 2
+    assert queue.fail(job_id, 'сбой') == 'failed'
+
+    job = queue.get(job_id)
+    assert job['status'] == 'failed' and job['error'] == 'сбой'
+    assert not (queue.storage_dir / job_id).exists()
+    queue.close()
+
+
+def test_completed_job_keeps_result(tmp_path):
+    queue = JobQueue(tmp_path)
+    job_id = queue.submit(io.BytesIO(b'image'))
+    queue.claim()
+    queue.complete(job_id, {'number': 'MSKU8074094'})
+
+    job = queue.get(job_id)
+    assert job['status'] == 'done' and job['result'] == {'number': 'MSKU8074094'}
+    assert queue.depth() == 0
+    queue.close()
+
+
+def test_running_jobs_survive_restart(tmp_path):
+    queue = JobQueue(tmp_path)
+    job_id = queue.submit(io.BytesIO(b'image'))
+    queue.claim()
+    queue.close()
+
+    queue = JobQueue(tmp_path)
+    assert queue.get(job_id)['status'] == 'queued'
+    queue.close()
+
+
+def test_expire_removes_old_jobs_but_not_running(tmp_path):
+    queue = JobQueue(tmp_path, ttl_seconds=60)
+    old_id = queue.submit(io.BytesIO(b'old'))
+    running_id = queue.submit(io.BytesIO(b'running'))
+    fresh_id = queue.submit(io.BytesIO(b'fresh'))
+    with queue._lock, queue._conn:
+        queue._conn.execute(
+            "UPDATE jobs SET created_at = ? WHERE id IN (?, ?)",
+            (time.time() - 120, old_id, running_id),
+        )
+        queue._conn.execute("UPDATE jobs SET status = 'running' WHERE id = ?", (running_id,))
+
+    assert queue.expire() == 1
+    assert queue.get(old_id) is None
+    assert not (queue.storage_dir / old_id).exists()
+    assert queue.get(running_id) is not None
+    assert queue.get(fresh_id) is not None
+    queue.close()
+
+
+def _resolver(*answers):
+    # Каждый вызов getaddrinfo отдаёт следующий адрес (так выглядит DNS rebinding), затем последний
+    answers = list(answers)
+
+    def getaddrinfo(host, port, *args, **kwargs):
+        address = answers.pop(0) if len(answers) > 1 else answers[0]
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (address, port))]
+
+    return getaddrinfo
+
+
+def test_callback_url_rejects_private_addresses(monkeypatch):
+    monkeypatch.setattr(jobs.socket, 'getaddrinfo', _resolver('10.0.0.5'))
+    with pytest.raises(ValueError):
+        jobs.validate_callback_url('http://erp.example.com/hook')
+    with pytest.raises(ValueError):
+        jobs.validate_callback_url('file:///etc/passwd')
+
+
+def test_callback_connects_to_the_checked_address(monkeypatch):
+    monkeypatch.setattr(jobs.socket, 'getaddrinfo', _resolver('93.184.216.34', '127.0.0.1'))
+    connected = []
+    monkeypatch.setattr(jobs.socket, 'create_connection', lambda address, timeout: connected.append(address) or _closed())
+    # Проверка видит публичный адрес, а доставка разрешает имя заново и получает внутренний
+    status = jobs._notify_callback({**_finished_job(), 'callback_url': 'http://erp.example.com/hook'})
+    assert status.startswith('rejected')
+    assert connected == []
+
+
+def test_callback_delivery_keeps_host_header(monkeypatch):
+    received = {}
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            received['host'] = self.headers['Host']
+            received['body'] = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    port = server.server_address[1]
+    monkeypatch.setattr(jobs, 'CALLBACK_HOSTS', ['erp.example.com'])
+    monkeypatch.setattr(jobs.socket, 'getaddrinfo', _resolver('127.0.0.1'))
+
+    status = jobs._notify_callback({**_finished_job(), 'callback_url': f'http://erp.example.com:{port}/hook?x=1'})
+    server.shutdown()
+    assert status == 'delivered 204'
+    assert received['host'] == f'erp.example.com:{port}'
+    assert received['body']['id'] == 'job'
+
+
+def _finished_job():
+    return {
+        'id': 'job', 'status': 'done', 'result': {'number': 'MSKU8074094'}, 'error': None,
+        'attempts': 1, 'callback_status': None, 'created_at': 0.0, 'updated_at': 0.0,
+    }
+
+
+def _closed():
+    raise ConnectionRefusedError()
+
+
+def test_stop_reports_stuck_worker(tmp_path):
+    queue = JobQueue(tmp_path)
+    queue.submit(io.BytesIO(b'image'))
+    release = threading.Event()
+    started = threading.Event()
+
+    def recognize(path):
+        started.set()
+        release.wait(5)
+        return {}
+
+    workers = jobs.JobWorkers(queue, recognize)
+    workers.start()
+    assert started.wait(5)
+    # Задача ещё в движке: очередь закрывать нельзя
+    assert workers.stop(timeout=0.1) is False
+    release.set()
+    assert workers.stop(timeout=5) is True
+    queue.close()
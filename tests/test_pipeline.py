@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+from src.pipeline import StagedPipeline
+from src.scheduler import DeadlineExceeded, deadline_after
+
+
+def _stage(name, trace):
+    def run(job):
+        trace.append((name, job['id']))
+        return job
+    return run
+
+
+def test_job_goes_through_stages_in_order():
+    trace = []
+    pipeline = StagedPipeline([
+        ('first', _stage('first', trace), 1),
+        ('second', _stage('second', trace), 1),
+    ])
+    result = pipeline.submit({'id': 1}).result(5)
+    pipeline.close()
+
+    assert result == {'id': 1}
+    assert trace == [('first', 1), ('second', 1)]
+    assert pipeline.stats()['lanes']['normal']['served'] == 1
+
+
+def test_stage_error_fails_job():
+    def broken(job):
+        raise RuntimeError("сбой этапа")
+
+    pipeline = StagedPipeline([('first', lambda job: job, 1), ('second', broken, 1)])
+    with pytest.raises(RuntimeError):
+        pipeline.submit({}).result(5)
+    pipeline.close()
+    assert pipeline.stats()['lanes']['normal']['failed'] == 1
+    assert pipeline.pending() == 0
+
+
+def test_deadline_expires_between_stages():
+    def slow(job):
+        time.sleep(0.1)
+        return job
+
+    ran = []
+    pipeline = StagedPipeline([('slow', slow, 1), ('next', lambda job: ran.append(job) or job, 1)])
+    with pytest.raises(DeadlineExceeded):
+        pipeline.submit({}, 'high', deadline_after(20)).result(5)
+    pipeline.close()
+    assert ran == []
+    assert pipeline.stats()['lanes']['high']['expired'] == 1
+
+
+def test_full_stage_holds_back_previous_stage():
+    release = threading.Event()
+    first_done = []
+
+    def first(job):
+        first_done.append(job['id'])
+        return job
+
+    def blocked(job):
+        release.wait(5)
+        return job
+
+    pipeline = StagedPipeline([('first', first, 1), ('blocked', blocked, 1)], queue_size=1)
+    futures = [pipeline.submit({'id': i}) for i in range(5)]
+    time.sleep(0.2)
+    # Один в работе второго этапа, один в его очереди, третий ждёт места в потоке
+    # первого этапа; остальные не начаты, хотя submit не блокировался
+    assert len(first_done) == 3
+    assert pipeline.pending() == 5
+
+    release.set()
+    assert [future.result(5)['id'] for future in futures] == list(range(5))
+    pipeline.close()
+
+
+def test_capacity_counts_workers_and_bounded_queues():
+    pipeline = StagedPipeline([('decode', lambda job: job, 2), ('detect', lambda job: job, 1), ('ocr', lambda job: job, 1)], queue_size=4)
+    # Вход не ограничен и в ёмкость не входит
+    assert pipeline.capacity() == 2 + (1 + 4) + (1 + 4)
+    pipeline.close()
@@ -0,0 +1,88 @@
+import copy
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from src.postprocess_benchmark import benchmark_postprocess, regressions
+
+
+ROOT = Path(__file__).resolve().parent.parent
+_TIMING_KEYS = {'throughput_per_s', 'mean_us', 'p99_us', 'max_us'}
+
+
+def _correctness(report):
+    """Отчёт без замеров времени: остаётся то, что зависит только от seed."""
+    return {
+        size: {name: {k: v for k, v in stats.items() if k not in _TIMING_KEYS} for name, stats in result.items()}
+        for size, result in report['sizes'].items()
+    }
+
+
+@pytest.fixture(scope='module')
+def report():
+    return benchmark_postprocess(sizes=(2, 4), samples=20, seed=3)
+
+
+def test_report_is_deterministic_per_seed(report):
+    again = benchmark_postprocess(sizes=(2, 4), samples=20, seed=3)
+    assert _correctness(again) == _correctness(report)
+    assert set(report['sizes']) == {'2', '4'}
+
+    accuracy = report['sizes']['4']['get_info']
+    assert accuracy['calls'] == 20
+    assert accuracy['number_exact'] + accuracy['number_wrong'] + accuracy['number_empty'] + accuracy['errors'] == 20
+
+
+def test_fuzz_and_adversarial_inputs_raise_nothing(report):
+    for result in report['sizes'].values():
+        for stats in result.values():
+            assert stats['errors'] == 0
+
+
+def test_regressions_flag_only_worse_correctness(report):
+    assert regressions(report, report) == []
+
+    # Базовый отчёт лучше текущего — это ухудшение
+    better = copy.deepcopy(report)
+    accuracy = better['sizes']['2']['get_info']
+    accuracy['number_exact'] += 1
+    accuracy['number_wrong'] -= 1
+    better['sizes']['4']['get_car_number']['exact'] += 1
+    problems = regressions(report, better)
+    assert any('2: get_info number_exact' in problem for problem in problems)
+    assert any('2: get_info number_wrong' in problem for problem in problems)
+    assert any('4: get_car_number exact' in problem for problem in problems)
+
+    broken = copy.deepcopy(report)
+    broken['sizes']['4']['get_info_fuzz']['errors'] = 2
+    assert regressions(broken, report) == ['4: get_info_fuzz errors 0 → 2']
+
+    # Размеры, которых нет в базовом отчёте, не сравниваются
+    assert regressions(broken, {'sizes': {}}) == []
+
+
+def _run_cli(*args):
+    return subprocess.run(
+        [sys.executable, 'main-benchmark-postprocess.py', '--sizes', '2', '--samples', '10', *args],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+
+
+def test_cli_exits_nonzero_on_regression(tmp_path):
+    baseline_path = tmp_path / 'baseline.json'
+    result = _run_cli('--report', str(baseline_path))
+    assert result.returncode == 0, result.stderr
+
+    assert _run_cli('--baseline', str(baseline_path)).returncode == 0
+
+    baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+    baseline['sizes']['2']['get_info']['number_exact'] += 1
+    baseline_path.write_text(json.dumps(baseline), encoding='utf-8')
+    result = _run_cli('--baseline', str(baseline_path))
+    assert result.returncode == 1
+    assert 'number_exact' in result.stdout
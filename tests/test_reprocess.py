@@ -0,0 +1,90 @@
+import csv
+import zipfile
+
+import pytest
+
+from src import reprocess
+from src.reprocess import COLUMNS, CsvResults, SqliteResults, iter_sources
+
+
+def _row(key, error=None):
+    row = {column: None for column in COLUMNS}
+    row.update({'key': key, 'number': '' if error else 'MSKU8074094', 'error': error})
+    return row
+
+
+def test_iter_sources_directory_in_name_order_with_skip(tmp_path):
+    for name in ('b/2.jpg', 'a/1.JPG', 'a/notes.txt', 'c.png'):
+        path = tmp_path / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(b'x')
+
+    keys = [key for key, _ in iter_sources(tmp_path, skip=lambda key: key == 'c.png')]
+    assert keys == ['a/1.JPG', 'b/2.jpg']
+
+
+def test_iter_sources_zip(tmp_path):
+    archive = tmp_path / 'photos.zip'
+    with zipfile.ZipFile(archive, 'w') as f:
+        f.writestr('gate/1.jpg', b'one')
+        f.writestr('gate/readme.md', b'')
+    ((key, source),) = list(iter_sources(archive))
+    assert key == 'gate/1.jpg'
+    assert reprocess.open_source(source).read() == b'one'
+
+
+@pytest.mark.parametrize('results_class, name', [(CsvResults, 'out.csv'), (SqliteResults, 'out.sqlite')])
+def test_failed_rows_are_retried_on_resume(tmp_path, results_class, name):
+    results = results_class(tmp_path / name)
+    results.write([_row('ok.jpg'), _row('broken.jpg', 'OSError: timeout')])
+    results.close()
+
+    results = results_class(tmp_path / name)
+    assert results.done('ok.jpg')
+    assert not results.done('broken.jpg')
+    results.write([_row('broken.jpg')])
+    assert results.done('broken.jpg')
+    results.close()
+
+
+def test_torn_csv_line_is_dropped_on_resume(tmp_path):
+    path = tmp_path / 'out.csv'
+    results = CsvResults(path)
+    results.write([_row('a.jpg'), _row('b.jpg')])
+    results.close()
+    # Падение посреди записи: строка без конца и индекс, не успевший её учесть
+    with path.open('a', encoding='utf-8') as f:
+        f.write('c.jpg,container,1,MSKU80')
+
+    results = CsvResults(path)
+    assert results.done('a.jpg') and results.done('b.jpg')
+    assert not results.done('c.jpg')
+    results.write([_row('c.jpg')])
+    results.close()
+
+    with path.open(encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['key'] for row in rows] == ['a.jpg', 'b.jpg', 'c.jpg']
+    assert rows[-1]['number'] == 'MSKU8074094'
+
+
+def test_index_is_rebuilt_from_csv(tmp_path):
+    path = tmp_path / 'out.csv'
+    results = CsvResults(path)
+    results.write([_row('a.jpg'), _row('b.jpg', 'RuntimeError: boom')])
+    results.close()
+    reprocess._index_path(path).unlink()
+
+    results = CsvResults(path)
+    assert results.done('a.jpg') and not results.done('b.jpg')
+    results.close()
+
+
+def test_process_one_error_is_a_single_line(monkeypatch):
+    class Broken:
+        def analyze(self, image):
+            raise RuntimeError("первая строка\nвторая строка")
+
+    monkeypatch.setitem(reprocess._worker_engines, None, Broken())
+    row = reprocess._process_one('a.jpg', b'x', None)
+    assert row['error'] == 'RuntimeError: первая строка вторая строка'
@@ -0,0 +1,67 @@
+import json
+
+from src.roi_memory import RoiMemory
+
+
+def _learn(memory, camera_id, times=3, box=(100, 200, 300, 260)):
+    for _ in range(times):
+        memory.update(camera_id, 'container', box, (1000, 1000))
+
+
+def test_region_is_used_after_min_hits():
+    memory = RoiMemory(path=None, min_hits=3)
+    _learn(memory, 'gate-1', times=2)
+    assert memory.prior('gate-1') is None
+    _learn(memory, 'gate-1', times=1)
+
+    x1, y1, x2, y2 = memory.prior('gate-1')
+    assert x1 < 0.1 and y1 < 0.2 and x2 > 0.3 and y2 > 0.26
+    assert 0.0 <= x1 and x2 <= 1.0
+
+
+def test_misses_reset_the_region():
+    memory = RoiMemory(path=None, min_hits=1, max_misses=2)
+    _learn(memory, 'gate-1', times=1)
+    memory.record('gate-1', found=False)
+    assert memory.prior('gate-1') is not None
+    memory.record('gate-1', found=False)
+    assert memory.prior('gate-1') is None
+
+
+def test_persist_and_reload(tmp_path):
+    path = tmp_path / 'roi.json'
+    memory = RoiMemory(str(path), min_hits=1)
+    _learn(memory, 'gate-1', times=1)
+    memory.save()
+
+    reloaded = RoiMemory(str(path), min_hits=1)
+    assert reloaded.prior('gate-1') == memory.prior('gate-1')
+
+
+def test_camera_ids_are_validated():
+    memory = RoiMemory(path=None, min_hits=1)
+    for camera_id in ('', '../../etc', 'x' * 65, 'gate 1'):
+        _learn(memory, camera_id, times=1)
+    assert memory.stats()['cameras'] == 0
+
+    allowlisted = RoiMemory(path=None, min_hits=1, cameras=frozenset({'gate-1'}))
+    _learn(allowlisted, 'gate-2', times=1)
+    _learn(allowlisted, 'gate-1', times=1)
+    assert allowlisted.stats()['cameras'] == 1
+
+
+def test_least_recently_seen_camera_is_forgotten(tmp_path):
+    path = tmp_path / 'roi.json'
+    memory = RoiMemory(str(path), min_hits=1, max_cameras=2)
+    _learn(memory, 'gate-1', times=1)
+    _learn(memory, 'gate-2', times=1)
+    memory.prior('gate-1')
+    _learn(memory, 'gate-3', times=1)
+
+    assert memory.prior('gate-2') is None
+    assert memory.prior('gate-1') is not None and memory.prior('gate-3') is not None
+    memory.save()
+    assert sorted(json.loads(path.read_text(encoding='utf-8'))) == ['gate-1', 'gate-3']
+
+    # Файл с большим числом камер, чем позволяет предел, обрезается при загрузке
+    assert RoiMemory(str(path), max_cameras=1).stats()['cameras'] == 1
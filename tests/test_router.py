@@ -0,0 +1,103 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from src.router import BackendPool, create_router_app
+
+
+def _pool(urls, slack=2):
+    pool = BackendPool(urls, slack)
+    for backend in pool.backends:
+        backend.state = 'ready'
+    return pool
+
+
+def _preferred(pool, keys):
+    return {key: pool.candidates(key)[0].url for key in keys}
+
+
+def test_same_key_goes_to_same_backend():
+    urls = [f'http://ocr-{i}:8000' for i in range(4)]
+    keys = [f'hash-{i}' for i in range(200)]
+    assert _preferred(_pool(urls), keys) == _preferred(_pool(list(reversed(urls))), keys)
+    # Ключи распределены по всем узлам
+    assert set(_preferred(_pool(urls), keys).values()) == set(urls)
+
+
+def test_only_keys_of_dropped_backend_move():
+    urls = [f'http://ocr-{i}:8000' for i in range(4)]
+    keys = [f'hash-{i}' for i in range(200)]
+    pool = _pool(urls)
+    before = _preferred(pool, keys)
+
+    pool.backends[1].state = 'down'
+    after = _preferred(pool, keys)
+    for key in keys:
+        if before[key] != urls[1]:
+            assert after[key] == before[key]
+        else:
+            assert after[key] != urls[1]
+
+
+def test_overloaded_preferred_backend_is_skipped():
+    pool = _pool(['http://ocr-0:8000', 'http://ocr-1:8000'], slack=2)
+    preferred = pool.candidates('hash')[0]
+    preferred.outstanding = 3
+    assert pool.candidates('hash')[0] is not preferred
+
+    preferred.outstanding = 2
+    assert pool.candidates('hash')[0] is preferred
+
+
+def test_no_ready_backends():
+    pool = BackendPool(['http://ocr-0:8000'])
+    assert pool.candidates('hash') == []
+
+
+def _router(monkeypatch, handler):
+    httpx = pytest.importorskip('httpx')
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(httpx, 'AsyncClient', lambda **kwargs: real_client(transport=httpx.MockTransport(handler), **kwargs))
+    return create_router_app(['http://ocr-0:8000', 'http://ocr-1:8000'], ['*'])
+
+
+def test_connect_error_is_retried_on_another_backend(monkeypatch):
+    import httpx
+
+    posted = []
+
+    def handler(request):
+        if request.url.path == '/readyz':
+            return httpx.Response(200, json={'pending': 0})
+        posted.append(request.url.host)
+        if len(posted) == 1:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, json={'number': 'MSKU8074094'})
+
+    with TestClient(_router(monkeypatch, handler)) as client:
+        response = client.post('/ocr', files={'image': ('a.jpg', b'frame')})
+        stats = client.get('/stats').json()['backends']
+
+    assert response.json() == {'number': 'MSKU8074094'}
+    assert len(posted) == 2 and posted[0] != posted[1]
+    assert stats[f'http://{posted[0]}:8000']['state'] == 'down'
+
+
+def test_read_timeout_is_not_retried(monkeypatch):
+    import httpx
+
+    posted = []
+
+    def handler(request):
+        if request.url.path == '/readyz':
+            return httpx.Response(200, json={'pending': 0})
+        posted.append(request.url.host)
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    with TestClient(_router(monkeypatch, handler)) as client:
+        response = client.post('/ocr', files={'image': ('a.jpg', b'frame')})
+        stats = client.get('/stats').json()['backends']
+
+    # Узел уже получил снимок: повтор посчитал бы его второй раз
+    assert response.status_code == 504
+    assert len(posted) == 1
+    assert stats[f'http://{posted[0]}:8000']['state'] == 'ready'
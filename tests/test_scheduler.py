@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+
+from src.scheduler import DeadlineExceeded, PriorityScheduler, deadline_after
+
+
+def _blocked(scheduler: PriorityScheduler) -> threading.Event:
+    # Занимает единственный поток, пока тест ставит задачи в очередь
+    release = threading.Event()
+    started = threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+
+    scheduler.submit(hold)
+    assert started.wait(5)
+    return release
+
+
+def test_priority_then_deadline_then_fifo():
+    scheduler = PriorityScheduler(workers=1)
+    release = _blocked(scheduler)
+    order = []
+    now = time.monotonic()
+    futures = [
+        scheduler.submit(lambda: order.append('low'), 'low'),
+        scheduler.submit(lambda: order.append('normal-1'), 'normal'),
+        scheduler.submit(lambda: order.append('normal-2'), 'normal'),
+        scheduler.submit(lambda: order.append('normal-soon'), 'normal', now + 60),
+        scheduler.submit(lambda: order.append('high'), 'high'),
+    ]
+    release.set()
+    for future in futures:
+        future.result(5)
+    scheduler.close()
+
+    assert order == ['high', 'normal-soon', 'normal-1', 'normal-2', 'low']
+
+
+def test_expired_task_is_not_run():
+    scheduler = PriorityScheduler(workers=1)
+    release = _blocked(scheduler)
+    ran = []
+    future = scheduler.submit(lambda: ran.append(True), 'high', deadline_after(10))
+    time.sleep(0.05)
+    release.set()
+
+    with pytest.raises(DeadlineExceeded):
+        future.result(5)
+    scheduler.close()
+    assert ran == []
+    assert scheduler.stats()['high']['expired'] == 1
+
+
+def test_unknown_priority():
+    scheduler = PriorityScheduler(workers=1)
+    with pytest.raises(ValueError):
+        scheduler.submit(lambda: None, 'urgent')
+    scheduler.close()
+
+
+def test_bounded_queue_blocks_submit():
+    scheduler = PriorityScheduler(workers=1, maxsize=1)
+    release = _blocked(scheduler)
+    scheduler.submit(lambda: None)
+
+    submitted = threading.Event()
+    thread = threading.Thread(target=lambda: (scheduler.submit(lambda: None), submitted.set()))
+    thread.start()
+    # Очередь полна: второй submit ждёт, пока поток не освободит место
+    assert not submitted.wait(0.2)
+    release.set()
+    assert submitted.wait(5)
+    thread.join()
+    scheduler.close()
@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+import pytest
+
+from src.scheduler import DeadlineExceeded
+from src.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_run():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(True)
+        await asyncio.sleep(0.05)
+        return {'number': 'MSKU8074094'}
+
+    async def main():
+        return await asyncio.gather(*(flight.do('key', work) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(result == {'number': 'MSKU8074094'} for result in results)
+    assert flight.stats() == {'started': 1, 'coalesced': 4, 'inflight': 0}
+
+
+def test_error_reaches_every_waiter_and_is_not_cached():
+    flight = SingleFlight()
+    calls = []
+
+    async def broken():
+        calls.append(True)
+        await asyncio.sleep(0.05)
+        raise RuntimeError("сбой")
+
+    async def main():
+        results = await asyncio.gather(*(flight.do('key', broken) for _ in range(3)), return_exceptions=True)
+        # После ошибки ключ свободен: следующий вызов запускает работу заново
+        with pytest.raises(RuntimeError):
+            await flight.do('key', broken)
+        return results
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(calls) == 2
+
+
+def test_caller_with_earlier_deadline_runs_its_own_task():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(True)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def main():
+        now = time.monotonic()
+        return await asyncio.gather(
+            flight.do('key', work, now + 10),
+            flight.do('key', work, now + 1),
+            flight.do('key', work, now + 20),
+        )
+
+    asyncio.run(main())
+    # Второй присоединиться не может (его срок раньше), третий может
+    assert len(calls) == 2
+    assert flight.stats()['coalesced'] == 1
+
+
+def test_waiter_gives_up_at_its_deadline():
+    flight = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.3)
+        return 'ok'
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do('key', slow))
+        await asyncio.sleep(0)
+        with pytest.raises(DeadlineExceeded):
+            await flight.do('key', slow, time.monotonic() + 0.05)
+        # Задача не отменяется из-за ушедшего ждущего
+        return await leader
+
+    assert asyncio.run(main()) == 'ok'
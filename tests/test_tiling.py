@@ -0,0 +1,125 @@
+import numpy as np
+
+from src.image_to_crop import _nms, _predict, tiled_frame
+
+
+class _Tensor:
+    def __init__(self, values):
+        self.values = np.asarray(values, dtype=np.float32)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.values
+
+
+class _Boxes:
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = _Tensor(xyxy)
+        self.conf = _Tensor(conf)
+        self.cls = _Tensor(cls)
+
+    def __len__(self):
+        return len(self.xyxy.values)
+
+
+class _Result:
+    def __init__(self, detections):
+        if detections:
+            xyxy, conf, cls = zip(*detections)
+            self.boxes = _Boxes(xyxy, conf, cls)
+        else:
+            self.boxes = None
+
+
+class _TileDetector:
+    """Детектор-заглушка: находит рамку plate (в координатах кадра) в каждой плитке, где она видна целиком."""
+
+    def __init__(self, frame, plates):
+        self.frame = frame
+        self.plates = plates
+        self.inputs = None
+
+    def __call__(self, inputs, **kwargs):
+        self.inputs = inputs
+        results = []
+        for x1, y1, x2, y2 in self.frame['tiles']:
+            detections = []
+            for (px1, py1, px2, py2), conf, cls in self.plates:
+                if px1 >= x1 and py1 >= y1 and px2 <= x2 and py2 <= y2:
+                    detections.append(((px1 - x1, py1 - y1, px2 - x1, py2 - y1), conf, cls))
+            results.append(_Result(detections))
+        return results
+
+
+def _frame(width, height):
+    return {
+        'array': np.zeros((height, width, 3), dtype=np.uint8),
+        'size': (width, height),
+        'scale': (1.0, 1.0),
+    }
+
+
+def test_tiles_cover_frame_with_overlap():
+    frame = tiled_frame(_frame(1500, 700), tile_size=640, overlap=0.2)
+    tiles = frame['tiles']
+
+    xs = sorted({x1 for x1, _, _, _ in tiles})
+    ys = sorted({y1 for _, y1, _, _ in tiles})
+    assert xs == [0, 512, 860]
+    assert ys == [0, 60]
+    assert all(x2 - x1 == 640 and y2 - y1 == 640 for x1, y1, x2, y2 in tiles)
+    assert max(x2 for _, _, x2, _ in tiles) == 1500
+    assert max(y2 for _, _, _, y2 in tiles) == 700
+
+
+def test_small_frame_is_a_single_tile():
+    frame = tiled_frame(_frame(400, 300), tile_size=640)
+    assert frame['tiles'] == [(0, 0, 400, 300)]
+
+
+def test_nms_keeps_best_of_overlapping_boxes():
+    boxes = np.array([
+        [0, 0, 100, 50],
+        [5, 2, 104, 52],
+        [300, 300, 400, 350],
+    ], dtype=np.float32)
+    scores = np.array([0.6, 0.9, 0.7], dtype=np.float32)
+
+    keep = _nms(boxes, scores)
+    assert list(keep) == [1, 2]
+    assert list(_nms(boxes, scores, iou_threshold=0.99)) == [1, 2, 0]
+
+
+def test_predict_merges_duplicates_from_overlapping_tiles():
+    frame = tiled_frame(_frame(1500, 700), tile_size=640, overlap=0.2)
+    # Номер в зоне перекрытия первых двух плиток и ещё один с другим классом на том же месте
+    plates = [
+        ((560, 100, 620, 130), 0.8, 0),
+        ((560, 100, 620, 130), 0.7, 1),
+        ((1400, 600, 1480, 640), 0.9, 0),
+    ]
+    model = _TileDetector(frame, plates)
+
+    boxes, confidences, classes = _predict(model, frame, confidence=0.25, imgsz=640)
+
+    assert len(model.inputs) == len(frame['tiles'])
+    assert all(tile.shape[:2] == (640, 640) for tile in model.inputs)
+    assert len(boxes) == 3
+    found = {(tuple(box.astype(int)), int(cls)) for box, cls in zip(boxes, classes)}
+    assert found == {
+        ((560, 100, 620, 130), 0),
+        ((560, 100, 620, 130), 1),
+        ((1400, 600, 1480, 640), 0),
+    }
+    assert sorted(confidences.round(2)) == [0.7, 0.8, 0.9]
+
+
+def test_predict_maps_tiles_back_to_full_resolution():
+    frame = tiled_frame(_frame(1500, 700), tile_size=640)
+    frame['scale'] = (2.0, 2.0)
+    model = _TileDetector(frame, [((100, 100, 200, 150), 0.9, 0)])
+
+    boxes, _, _ = _predict(model, frame, confidence=0.25, imgsz=640)
+    assert boxes.tolist() == [[200, 200, 400, 300]]
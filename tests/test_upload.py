@@ -0,0 +1,96 @@
+import io
+
+import pytest
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from src import upload
+from src.upload import MaxBodySizeMiddleware, validate_upload
+
+
+def _image(image_format='JPEG', size=(64, 48)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (10, 20, 30)).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def _upload(data):
+    return UploadFile(file=io.BytesIO(data), filename='frame')
+
+
+def _status(data):
+    with pytest.raises(HTTPException) as error:
+        validate_upload(_upload(data))
+    return error.value.status_code
+
+
+def test_valid_upload_returns_spooled_buffer_at_start():
+    image = _upload(_image())
+    buffer = validate_upload(image)
+    assert buffer is image.file
+    assert buffer.tell() == 0
+
+
+def test_rejects_empty_and_oversized(monkeypatch):
+    assert _status(b'') == 400
+    monkeypatch.setattr(upload, 'MAX_UPLOAD_BYTES', 100)
+    assert _status(_image()) == 413
+
+
+def test_rejects_non_images_and_disallowed_formats():
+    assert _status(b'not an image at all') == 415
+    assert _status(_image('GIF')) == 415
+    assert validate_upload(_upload(_image('PNG'))).tell() == 0
+
+
+def test_rejects_too_many_pixels(monkeypatch):
+    monkeypatch.setattr(upload, 'MAX_IMAGE_PIXELS', 1000)
+    assert _status(_image(size=(100, 100))) == 413
+
+
+def _app(max_bytes):
+    app = FastAPI()
+    app.add_middleware(MaxBodySizeMiddleware, max_bytes=max_bytes)
+
+    @app.post('/upload')
+    async def receive(image: UploadFile = File(...)):
+        return {'size': len(await image.read())}
+
+    @app.post('/raw')
+    async def raw(request: Request):
+        return {'size': len(await request.body())}
+
+    @app.get('/health')
+    async def health():
+        return {'status': 'ok'}
+
+    return app
+
+
+def test_middleware_rejects_by_content_length():
+    client = TestClient(_app(max_bytes=1024))
+
+    response = client.post('/upload', files={'image': ('frame.jpg', b'x' * 4096, 'image/jpeg')})
+    assert response.status_code == 413
+
+    response = client.post('/upload', files={'image': ('frame.jpg', b'x' * 100, 'image/jpeg')})
+    assert response.status_code == 200
+    assert response.json() == {'size': 100}
+    assert client.get('/health').status_code == 200
+
+
+def test_middleware_counts_chunked_body():
+    client = TestClient(_app(max_bytes=1024))
+
+    def chunks():
+        for _ in range(8):
+            yield b'x' * 512
+
+    # Без Content-Length: лимит проверяется по мере чтения тела
+    response = client.post('/raw', content=chunks())
+    assert response.status_code == 413
+    assert 'content-length' not in response.request.headers
+
+    response = client.post('/raw', content=iter([b'x' * 512, b'x' * 512]))
+    assert response.json() == {'size': 1024}